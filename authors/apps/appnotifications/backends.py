@@ -0,0 +1,30 @@
+from rest_framework import authentication, exceptions
+
+from authors.apps.authentication.models import User
+
+from .stream import get_stream_token_user_id
+
+
+class StreamTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates notification streams opened with a stream token in
+    the query string (?token=), since EventSource cannot send an
+    Authorization header
+    """
+
+    def authenticate(self, request):
+        token = request.query_params.get('token')
+        if token is None:
+            return None
+
+        user_id = get_stream_token_user_id(token)
+        if user_id is None:
+            raise exceptions.AuthenticationFailed(
+                'The stream token is invalid or has expired!')
+
+        user = User.objects.filter(pk=user_id).first()
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'Your account is not active!')
+
+        return user, token
@@ -0,0 +1,68 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+
+from authors.utils.mailer import DigestMail
+from authors.utils.notification_handlers import get_opt_out_link
+
+from .models import DigestEntry, UserNotification
+
+
+def send_batch(user_ids):
+    """
+    Queues the digest of each of the users and removes their entries.
+    The entries are locked so a digest is only sent once when two runs
+    overlap. Users who stopped email notifications since the entries
+    were collected get none. Returns the number of digests queued.
+    """
+    with transaction.atomic():
+        entries = list(DigestEntry.objects.select_for_update(
+            skip_locked=True, of=('self',)
+        ).filter(user_id__in=user_ids).order_by('user_id', 'id').values_list(
+            'id',
+            'user_id',
+            'user__username',
+            'user__email',
+            'user__notification_preferences__email_notifications',
+            'description',
+            'resource_url',
+        ))
+        recipients = []
+        for user_id, rows in groupby(entries, key=lambda row: row[1]):
+            rows = list(rows)
+            _, _, username, email, by_email, _, _ = rows[0]
+            if by_email:
+                recipients.append((
+                    username, email, get_opt_out_link(user_id),
+                    [(description, url) for *_, description, url in rows]))
+        DigestMail(recipients).send_mail()
+        DigestEntry.objects.filter(
+            id__in=[row[0] for row in entries]).delete()
+    return len(recipients)
+
+
+def send_notification_digests(period, batch_size=None):
+    """
+    Emails each user on the given digest period one message of the
+    notifications collected since their last digest. Users are taken
+    batch_size at a time in id order and the digests of a batch are
+    queued in one insert, for send_queued_emails to send over one
+    connection. Returns the number of digests queued.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_DIGEST_BATCH_SIZE
+    periods = [period]
+    if period == UserNotification.HOURLY:
+        # users who went back to immediate emails get what was left
+        periods.append(UserNotification.IMMEDIATE)
+    waiting = DigestEntry.objects.filter(
+        user__notification_preferences__email_digest__in=periods
+    ).order_by('user_id').values_list('user_id', flat=True).distinct()
+    cursor = 0
+    sent = 0
+    while True:
+        user_ids = list(waiting.filter(user_id__gt=cursor)[:batch_size])
+        if not user_ids:
+            return sent
+        sent += send_batch(user_ids)
+        cursor = user_ids[-1]
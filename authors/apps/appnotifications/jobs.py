@@ -0,0 +1,67 @@
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from authors.utils.notification_handlers import (article_fan_out,
+                                                 comment_fan_out)
+
+from .models import NotificationJob
+
+JOB_HANDLERS = {
+    NotificationJob.ARTICLE_CREATED: article_fan_out,
+    NotificationJob.ARTICLE_UPDATED: article_fan_out,
+    NotificationJob.COMMENT_CREATED: comment_fan_out,
+}
+
+
+def claim_job():
+    """
+    Locks the next due job for this worker. Jobs left running by a
+    worker that died are picked up again after the lock timeout.
+    """
+    now = timezone.now()
+    stale = now - timezone.timedelta(
+        seconds=settings.NOTIFICATION_JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        job = NotificationJob.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            Q(status=NotificationJob.PENDING, run_after__lte=now) |
+            Q(status=NotificationJob.RUNNING, locked_at__lt=stale)
+        ).order_by('run_after', 'id').first()
+        if job is not None:
+            job.status = NotificationJob.RUNNING
+            job.locked_at = now
+            job.save(update_fields=['status', 'locked_at', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    """
+    Runs a claimed job, scheduling a retry when it fails
+    """
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception:
+        job.retry(traceback.format_exc())
+        return False
+    job.finish()
+    return True
+
+
+def run_notification_jobs(limit=None):
+    """
+    Runs due jobs until there are none left or `limit` jobs have run,
+    and returns the number of jobs that ran
+    """
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
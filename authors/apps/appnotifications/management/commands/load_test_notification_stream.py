@@ -0,0 +1,141 @@
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from notifications.signals import notify
+
+from authors.apps.authentication.models import User
+
+
+class StreamClient(threading.Thread):
+    """
+    Holds one notification stream open and records when each
+    notification event arrives
+    """
+
+    def __init__(self, url, token, duration):
+        super().__init__(daemon=True)
+        self.url = urlsplit(url)
+        self.token = token
+        self.duration = duration
+        self.connected = None
+        self.received = {}
+        self.error = None
+
+    def run(self):
+        connection_class = (HTTPSConnection if self.url.scheme == 'https'
+                            else HTTPConnection)
+        connection = connection_class(
+            self.url.netloc, timeout=self.duration + 30)
+        started = time.monotonic()
+        try:
+            path = self.url.path + ('?' + self.url.query
+                                    if self.url.query else '')
+            connection.request('GET', path, headers={
+                'Authorization': 'Bearer ' + self.token,
+                'Accept': 'text/event-stream'})
+            response = connection.getresponse()
+            if response.status != 200:
+                raise CommandError(
+                    'Stream returned {}'.format(response.status))
+            self.connected = time.monotonic() - started
+            deadline = started + self.duration
+            event = None
+            while time.monotonic() < deadline:
+                line = response.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8').rstrip('\n')
+                if line.startswith('id: '):
+                    event = int(line[4:])
+                elif not line and event is not None:
+                    self.received[event] = time.time()
+                    event = None
+        except Exception as error:
+            self.error = error
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Opens many concurrent notification streams against a running server
+    and measures how long notifications take to reach them
+    """
+    help = 'Load tests the notification stream of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/api/notifications/stream/',
+            help='URL of the notification stream')
+        parser.add_argument(
+            '--username', required=True,
+            help='User whose stream the clients open and who is notified')
+        parser.add_argument(
+            '--clients', type=int, default=100,
+            help='Number of concurrent streams')
+        parser.add_argument(
+            '--notifications', type=int, default=10,
+            help='Number of notifications created during the test')
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Seconds the streams are held open')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('No user named {}'.format(
+                options['username']))
+        clients = [
+            StreamClient(options['url'], user.token(), options['duration'])
+            for _ in range(options['clients'])
+        ]
+        for client in clients:
+            client.start()
+        # give the streams time to connect before notifying
+        time.sleep(min(5, options['duration'] / 4))
+
+        created = {}
+        interval = options['duration'] / 2 / max(options['notifications'], 1)
+        for number in range(options['notifications']):
+            created_at = time.time()
+            for _, notifications in notify.send(
+                    user, recipient=user, verb='load_test',
+                    description='Load test {}'.format(number)):
+                for notification in notifications:
+                    created[notification.id] = created_at
+            time.sleep(interval)
+        for client in clients:
+            client.join()
+
+        connected = [client for client in clients
+                     if client.connected is not None]
+        latencies = sorted(
+            client.received[notification_id] - created_at
+            for client in connected
+            for notification_id, created_at in created.items()
+            if notification_id in client.received)
+        expected = len(connected) * len(created)
+        self.stdout.write('Connected {} of {} stream(s)'.format(
+            len(connected), len(clients)))
+        errors = [client.error for client in clients if client.error]
+        if errors:
+            self.stdout.write('{} error(s), first: {!r}'.format(
+                len(errors), errors[0]))
+        if connected:
+            self.stdout.write('Median connect time {:.3f}s'.format(
+                sorted(client.connected for client in connected)[
+                    len(connected) // 2]))
+        self.stdout.write('Delivered {} of {} notification event(s)'.format(
+            len(latencies), expected))
+        if latencies:
+            self.stdout.write(
+                'Delivery latency median {:.3f}s, p95 {:.3f}s, '
+                'max {:.3f}s'.format(
+                    latencies[len(latencies) // 2],
+                    latencies[int(len(latencies) * 0.95)],
+                    latencies[-1]))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from notifications.models import Notification
+
+from authors.apps.appnotifications.retention import prune_notifications
+
+
+class Command(BaseCommand):
+    """
+    Moves old read and deleted notifications to the archive, or drops
+    them
+    """
+    help = 'Archives or drops old read and deleted notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Age in days past which notifications are removed')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of notifications removed per transaction')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between batches')
+        parser.add_argument(
+            '--drop', action='store_true',
+            help='Delete the notifications instead of archiving them')
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='Vacuum the notifications table afterwards so the '
+                 'space is reused straight away')
+
+    def handle(self, *args, **options):
+        stats = prune_notifications(
+            options['days'], options['batch_size'], options['drop'],
+            options['pause'])
+        self.stdout.write(str(stats))
+        if options['vacuum'] and stats.rows:
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM ANALYZE {}'.format(
+                    connection.ops.quote_name(Notification._meta.db_table)))
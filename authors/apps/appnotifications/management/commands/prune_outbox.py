@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from authors.apps.appnotifications.outbox import purge_emails
+
+
+class Command(BaseCommand):
+    """
+    Deletes old sent and dead emails from the outbox
+    """
+    help = 'Deletes sent and dead emails past their retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Age in days past which emails are deleted')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of emails deleted per transaction')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        deleted = purge_emails(
+            options['days'], options['batch_size'], options['pause'])
+        self.stdout.write('Deleted {} email(s)'.format(deleted))
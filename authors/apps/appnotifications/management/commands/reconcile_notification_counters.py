@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from notifications.models import Notification
+
+from authors.apps.appnotifications.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the unread notification counters of users from the
+    notifications table
+    """
+    help = 'Recomputes the unread notification counters of users'
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        tables = {
+            'notifications': quote(Notification._meta.db_table),
+            'counters': quote(NotificationCounter._meta.db_table),
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {counters} (user_id, unread, version) '
+                'SELECT recipient_id, count(*), 1 FROM {notifications} '
+                'WHERE unread AND NOT deleted GROUP BY recipient_id '
+                'ON CONFLICT (user_id) DO UPDATE '
+                'SET unread = EXCLUDED.unread, '
+                'version = {counters}.version + 1 '
+                'WHERE {counters}.unread <> EXCLUDED.unread'
+                .format(**tables))
+            fixed = cursor.rowcount
+            cursor.execute(
+                'UPDATE {counters} SET unread = 0, version = version + 1 '
+                'WHERE unread <> 0 '
+                'AND NOT EXISTS (SELECT 1 FROM {notifications} '
+                'WHERE recipient_id = {counters}.user_id '
+                'AND unread AND NOT deleted)'.format(**tables))
+            fixed += cursor.rowcount
+        self.stdout.write(
+            'Fixed the unread counters of {} user(s)'.format(fixed))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authors.apps.appnotifications.jobs import run_notification_jobs
+
+
+class Command(BaseCommand):
+    """
+    Runs queued notification jobs
+    """
+    help = 'Runs queued notification fan-out jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of jobs to run in one pass')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new jobs instead of exiting')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between polls when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_notification_jobs(options['limit'])
+            if count:
+                self.stdout.write('Ran {} notification job(s)'.format(count))
+            if not options['loop']:
+                break
+            if not count:
+                time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from authors.apps.appnotifications.digests import send_notification_digests
+from authors.apps.appnotifications.models import UserNotification
+
+
+class Command(BaseCommand):
+    """
+    Queues the notification digests of the users on a digest period
+    """
+    help = 'Queues the hourly or daily notification digest emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'period',
+            choices=[UserNotification.HOURLY, UserNotification.DAILY],
+            help='Digest period whose users are emailed')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of users whose digests are queued at a time')
+
+    def handle(self, *args, **options):
+        sent = send_notification_digests(
+            options['period'], options['batch_size'])
+        self.stdout.write('Queued {} {} digest(s)'.format(
+            sent, options['period']))
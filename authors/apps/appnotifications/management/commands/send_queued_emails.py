@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from authors.apps.appnotifications.models import OutboxEmail
+from authors.apps.appnotifications.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    """
+    Sends the emails queued in the outbox
+    """
+    help = 'Sends queued emails in batches over one connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of emails sent per connection')
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of batches to send in one pass')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new emails instead of exiting')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between polls when looping')
+        parser.add_argument(
+            '--requeue-dead', action='store_true',
+            help='Queue the dead emails again before sending')
+        parser.add_argument(
+            '--status', action='store_true',
+            help='Only show the number of emails in each status')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            counts = OutboxEmail.objects.values('status').annotate(
+                count=Count('id')).order_by('status')
+            for row in counts:
+                self.stdout.write('{status}: {count}'.format(**row))
+            return
+        if options['requeue_dead']:
+            requeued = OutboxEmail.objects.filter(
+                status=OutboxEmail.DEAD
+            ).update(status=OutboxEmail.PENDING, attempts=0,
+                     run_after=timezone.now())
+            self.stdout.write('Requeued {} dead email(s)'.format(requeued))
+        while True:
+            stats = send_queued_emails(
+                options['batch_size'], options['limit'])
+            if stats.batches:
+                self.stdout.write(str(stats))
+            if not options['loop']:
+                break
+            if not stats.sent:
+                time.sleep(options['interval'])
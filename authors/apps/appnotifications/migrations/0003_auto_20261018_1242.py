@@ -0,0 +1,22 @@
+# Generated by Django 2.2 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appnotifications', '0002_auto_20261018_1240'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationjob',
+            name='kind',
+            field=models.CharField(choices=[('article_created', 'Article created'), ('article_updated', 'Article updated')], max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('attempts', 0), ('status', 'pending')), fields=('article', 'kind'), name='unique_waiting_notification_job'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appnotifications', '0004_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjob',
+            name='comments_from',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationjob',
+            name='comments_to',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationjob',
+            name='kind',
+            field=models.CharField(choices=[('article_created', 'Article created'), ('article_updated', 'Article updated'), ('comment_created', 'Comment created')], max_length=30),
+        ),
+    ]
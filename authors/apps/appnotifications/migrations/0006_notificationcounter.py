@@ -0,0 +1,35 @@
+# Generated by Django 2.2 on 2026-10-18 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('appnotifications', '0005_comment_jobs'),
+        ('notifications', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            'INSERT INTO appnotifications_notificationcounter '
+            '(user_id, unread) SELECT recipient_id, count(*) '
+            'FROM notifications_notification '
+            'WHERE unread AND NOT deleted GROUP BY recipient_id',
+            migrations.RunSQL.noop),
+        # notification lists are paged by id within a recipient
+        migrations.RunSQL(
+            'CREATE INDEX notification_recipient_id_idx '
+            'ON notifications_notification (recipient_id, id)',
+            'DROP INDEX notification_recipient_id_idx'),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appnotifications', '0006_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usernotification',
+            name='email_digest',
+            field=models.CharField(choices=[('immediate', 'Immediate'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='DigestEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('resource_url', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2 on 2026-10-18 13:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appnotifications', '0007_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('verb', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('unread', models.BooleanField()),
+                ('deleted', models.BooleanField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        # finds where the notifications past their retention end
+        migrations.RunSQL(
+            'CREATE INDEX notification_timestamp_idx '
+            'ON notifications_notification (timestamp)',
+            'DROP INDEX notification_timestamp_idx'),
+        migrations.AddIndex(
+            model_name='archivednotification',
+            index=models.Index(fields=['recipient', 'id'], name='archived_recipient_id_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2 on 2026-10-18 13:33
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0006_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('appnotifications', '0008_archivednotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationGroup',
+            fields=[
+                ('notification', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='group', serialize=False, to='notifications.Notification')),
+                ('verb', models.CharField(max_length=255)),
+                ('target_object_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('action', models.CharField(max_length=255)),
+                ('actor_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('latest_actors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=150), size=None)),
+                ('closes_at', models.DateTimeField()),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('target_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notificationgroup',
+            index=models.Index(fields=['recipient', 'verb', 'closes_at'], name='notification_group_key_idx'),
+        ),
+    ]
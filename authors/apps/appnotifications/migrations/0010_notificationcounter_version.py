@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appnotifications', '0009_notificationgroup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,23 +1,406 @@
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import post_save
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, models
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from notifications.models import Notification
 
+from authors.apps.articles.models import Article
 from authors.apps.authentication.models import User
 
 from ...utils import notification_handlers
+from .stream import publish_on_commit
 
 
 class UserNotification(models.Model):
     """
     User Notification model stores user's preferences for notifications.
-    By default all users are "opted in" to notifications
+    By default all users are "opted in" to notifications, emailed as
+    they happen
     """
+    IMMEDIATE = 'immediate'
+    HOURLY = 'hourly'
+    DAILY = 'daily'
+    EMAIL_DIGESTS = (
+        (IMMEDIATE, 'Immediate'),
+        (HOURLY, 'Hourly digest'),
+        (DAILY, 'Daily digest'),
+    )
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, unique=True,
                                 related_name='notification_preferences')
     email_notifications = models.BooleanField(default=True)
     in_app_notifications = models.BooleanField(default=True)
+    email_digest = models.CharField(
+        max_length=10, choices=EMAIL_DIGESTS, default=IMMEDIATE)
+
+
+class DigestEntry(models.Model):
+    """
+    A notification waiting to be emailed in its recipient's hourly or
+    daily digest by the send_notification_digests command
+    """
+    user = models.ForeignKey(
+        User, related_name='digest_entries', on_delete=models.CASCADE)
+    description = models.TextField()
+    resource_url = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '{} for {}'.format(self.description, self.user_id)
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread and undeleted notifications of a user, kept up to
+    date as notifications are added, read and deleted so the unread
+    badge is a primary key lookup. Changes wake the user's notification
+    streams.
+    """
+    user = models.OneToOneField(
+        User, primary_key=True, related_name='notification_counter',
+        on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+    # moves on with every change, so polling streams notice new
+    # notifications even when reads leave the count as it was
+    version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def record(cls, changes):
+        """
+        Applies changes in unread counts, given as {user id: change},
+        to the counters of the users in one statement. Counters of users
+        that have none yet are created.
+        """
+        changes = {user_id: change for user_id, change in changes.items()
+                   if change}
+        if not changes:
+            return
+        sql = (
+            'WITH changes (user_id, change) AS ('
+            'SELECT * FROM unnest(%s::integer[], %s::integer[])), '
+            'updated AS ('
+            'UPDATE {counters} SET unread = GREATEST('
+            '{counters}.unread + changes.change, 0), '
+            'version = {counters}.version + 1 FROM changes '
+            'WHERE {counters}.user_id = changes.user_id '
+            'RETURNING {counters}.user_id) '
+            'INSERT INTO {counters} (user_id, unread, version) '
+            'SELECT user_id, change, 1 FROM changes WHERE change > 0 '
+            'AND user_id NOT IN (SELECT user_id FROM updated) '
+            'ON CONFLICT (user_id) DO UPDATE SET unread = '
+            '{counters}.unread + EXCLUDED.unread, '
+            'version = {counters}.version + 1'
+        ).format(counters=connection.ops.quote_name(cls._meta.db_table))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [list(changes), list(changes.values())])
+        publish_on_commit(changes)
+
+    @classmethod
+    def touch(cls, user_ids):
+        """
+        Moves the counters of the users on without changing their
+        counts, so their streams look for notifications updated in place
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        cls.objects.filter(user_id__in=user_ids).update(
+            version=models.F('version') + 1)
+        publish_on_commit(user_ids)
+
+    @classmethod
+    def unread_count(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list(
+            'unread', flat=True).first() or 0
+
+    @classmethod
+    def state(cls, user_id):
+        """
+        The unread count and version of a user's counter
+        """
+        return cls.objects.filter(user_id=user_id).values_list(
+            'unread', 'version').first() or (0, 0)
+
+
+class NotificationGroup(models.Model):
+    """
+    The actors of a notification standing for all the events of its
+    verb and target for its recipient within NOTIFICATION_GROUP_WINDOW
+    seconds of the first ("jim and 4 others commented on ..."). Later
+    events update the group and its notification in place instead of
+    adding notifications.
+    """
+    notification = models.OneToOneField(
+        Notification, primary_key=True, related_name='group',
+        on_delete=models.CASCADE)
+    recipient = models.ForeignKey(
+        User, related_name='+', db_index=False, on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    target_content_type = models.ForeignKey(
+        ContentType, null=True, blank=True, related_name='+',
+        on_delete=models.CASCADE)
+    target_object_id = models.CharField(
+        max_length=255, null=True, blank=True)
+    # what the actors did, after their names in the grouped text
+    action = models.CharField(max_length=255)
+    # every actor of the group, the newest first
+    actor_ids = ArrayField(models.IntegerField())
+    latest_actors = ArrayField(models.CharField(max_length=150))
+    closes_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'verb', 'closes_at'],
+                         name='notification_group_key_idx'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def actor_count(self):
+        return len(self.actor_ids)
+
+    @property
+    def text(self):
+        """
+        The grouped text, naming the latest actor and counting the rest
+        """
+        if self.actor_count <= 2:
+            actors = ' and '.join(self.latest_actors[:self.actor_count])
+        else:
+            actors = '{} and {} others'.format(
+                self.latest_actors[0], self.actor_count - 1)
+        return '{} {}'.format(actors, self.action)
+
+    def add_actors(self, actors):
+        """
+        Puts the given (id, username) actors first, newest first
+        """
+        ids = [actor_id for actor_id, _ in actors]
+        names = [username for _, username in actors]
+        self.actor_ids = ids + [
+            actor_id for actor_id in self.actor_ids if actor_id not in ids]
+        self.latest_actors = (names + [
+            username for username in self.latest_actors
+            if username not in names
+        ])[:settings.NOTIFICATION_GROUP_LATEST_ACTORS]
+
+    @classmethod
+    def actor_names(cls, groups):
+        """
+        Usernames of the actors of the groups, looked up in one query
+        """
+        ids = {actor_id for group in groups for actor_id in group.actor_ids}
+        return dict(User.objects.filter(id__in=ids).values_list(
+            'id', 'username'))
+
+
+class ArchivedNotification(models.Model):
+    """
+    A read or deleted notification moved out of the notifications table
+    by the prune_notifications command once it is older than
+    NOTIFICATION_RETENTION_DAYS. Only what the notification list shows
+    is kept, under the notification's original id.
+    """
+    id = models.IntegerField(primary_key=True)
+    recipient = models.ForeignKey(
+        User, related_name='archived_notifications', db_index=False,
+        on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    timestamp = models.DateTimeField()
+    unread = models.BooleanField()
+    deleted = models.BooleanField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'id'],
+                         name='archived_recipient_id_idx'),
+        ]
+
+    def __str__(self):
+        return '{} for {}'.format(self.verb, self.recipient_id)
+
+
+class NotificationJob(models.Model):
+    """
+    A notification fan-out queued by a request and carried out by the
+    run_notification_jobs command. The cursor and processed count record
+    progress, so a failed job is retried from the last finished chunk.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    ARTICLE_CREATED = 'article_created'
+    ARTICLE_UPDATED = 'article_updated'
+    COMMENT_CREATED = 'comment_created'
+    KINDS = (
+        (ARTICLE_CREATED, 'Article created'),
+        (ARTICLE_UPDATED, 'Article updated'),
+        (COMMENT_CREATED, 'Comment created'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KINDS)
+    article = models.ForeignKey(
+        Article, related_name='notification_jobs', on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING)
+    cursor = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    # ids of the first and last comment of a burst of comments notified
+    # by a COMMENT_CREATED job
+    comments_from = models.PositiveIntegerField(null=True, blank=True)
+    comments_to = models.PositiveIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            # at most one job per article and kind that has not started,
+            # which later changes are coalesced into
+            models.UniqueConstraint(
+                fields=['article', 'kind'],
+                condition=models.Q(status='pending', attempts=0),
+                name='unique_waiting_notification_job'),
+        ]
+
+    def __str__(self):
+        return '{} {} ({})'.format(self.kind, self.article_id, self.status)
+
+    def record_progress(self, cursor, processed):
+        """
+        Saves the position reached after a finished chunk
+        """
+        self.cursor = cursor
+        self.processed += processed
+        self.save(update_fields=['cursor', 'processed', 'updated_at'])
+
+    def finish(self):
+        self.status = self.DONE
+        self.locked_at = None
+        self.save(update_fields=['status', 'locked_at', 'updated_at'])
+
+    def retry(self, error):
+        """
+        Schedules the job again with an exponential backoff, or marks it
+        failed once it has used up its attempts
+        """
+        self.attempts += 1
+        self.last_error = error
+        self.locked_at = None
+        if self.attempts >= settings.NOTIFICATION_JOB_MAX_ATTEMPTS:
+            self.status = self.FAILED
+        else:
+            self.status = self.PENDING
+            self.run_after = timezone.now() + timezone.timedelta(
+                seconds=settings.NOTIFICATION_JOB_RETRY_DELAY *
+                2 ** (self.attempts - 1))
+        self.save()
+
+
+class OutboxEmail(models.Model):
+    """
+    An email queued by a request and sent by the send_queued_emails
+    command, which sends the due emails in batches over one connection.
+    Emails that keep failing are retried with a backoff and then left
+    dead for inspection. The body of an email is blanked once it is
+    sent, and sent and dead emails are deleted by the prune_outbox
+    command after EMAIL_OUTBOX_RETENTION_DAYS.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = ArrayField(models.CharField(max_length=254))
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return '{} to {} ({})'.format(
+            self.subject, ', '.join(self.to), self.status)
+
+    @classmethod
+    def from_message(cls, message):
+        """
+        Builds an unsaved outbox email out of an EmailMessage
+        """
+        html_body = ''
+        for content, mimetype in getattr(message, 'alternatives', []):
+            if mimetype == 'text/html':
+                html_body = content
+        return cls(
+            subject=message.subject, body=message.body, html_body=html_body,
+            from_email=message.from_email, to=list(message.to))
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject, body=self.body,
+            from_email=self.from_email, to=self.to, connection=connection)
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+    def retry(self, error):
+        """
+        Schedules the email again with an exponential backoff, or marks it
+        dead once it has used up its attempts
+        """
+        self.attempts += 1
+        self.last_error = error
+        self.locked_at = None
+        if self.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            self.status = self.DEAD
+        else:
+            self.status = self.PENDING
+            self.run_after = timezone.now() + timezone.timedelta(
+                seconds=settings.EMAIL_OUTBOX_RETRY_DELAY *
+                2 ** (self.attempts - 1))
+        self.save(update_fields=[
+            'attempts', 'last_error', 'locked_at', 'status', 'run_after'])
 
 
 @receiver(post_save, sender=User)
@@ -32,3 +415,19 @@ def setup_notification_permissions(sender, **kwargs):
             'in_app_notifications': True
         }
         UserNotification.objects.create(**data)
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and instance.unread and not instance.deleted:
+        NotificationCounter.record({instance.recipient_id: 1})
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    """
+    Takes hard deleted unread notifications off the counter; soft
+    deletes are counted where they are made
+    """
+    if instance.unread and not instance.deleted:
+        NotificationCounter.record({instance.recipient_id: -1})
@@ -0,0 +1,153 @@
+import time
+import traceback
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def claim_emails(batch_size):
+    """
+    Locks the next due emails for this worker. Emails left sending by a
+    worker that died are picked up again after the lock timeout.
+    """
+    now = timezone.now()
+    stale = now - timezone.timedelta(
+        seconds=settings.EMAIL_OUTBOX_LOCK_TIMEOUT)
+    with transaction.atomic():
+        emails = list(OutboxEmail.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            Q(status=OutboxEmail.PENDING, run_after__lte=now) |
+            Q(status=OutboxEmail.SENDING, locked_at__lt=stale)
+        ).order_by('run_after', 'id')[:batch_size])
+        OutboxEmail.objects.filter(
+            id__in=[email.id for email in emails]
+        ).update(status=OutboxEmail.SENDING, locked_at=now)
+    return emails
+
+
+def reopen(connection):
+    """
+    (Re)opens a mail connection, returning the error if it fails
+    """
+    try:
+        connection.close()
+        connection.open()
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def send_batch(emails, connection):
+    """
+    Sends claimed emails over one connection, reopening it after a
+    failed email since the server may have dropped it. Once it cannot
+    be opened, the rest of the batch is retried later. Returns the
+    number of emails sent, retried and dead.
+    """
+    sent = []
+    failed = []
+    error = reopen(connection)
+    for email in emails:
+        if error is not None:
+            failed.append((email, error))
+            continue
+        try:
+            connection.send_messages([email.to_message(connection)])
+        except Exception:
+            failed.append((email, traceback.format_exc()))
+            error = reopen(connection)
+        else:
+            sent.append(email.id)
+    # the bodies may hold live links (confirmation, password reset), so
+    # they are not kept once sent
+    OutboxEmail.objects.filter(id__in=sent).update(
+        status=OutboxEmail.SENT, sent_at=timezone.now(), locked_at=None,
+        body='', html_body='')
+    for email, reason in failed:
+        email.retry(reason)
+    dead = sum(1 for email, _ in failed if email.status == OutboxEmail.DEAD)
+    return len(sent), len(failed) - dead, dead
+
+
+class OutboxStats:
+    """
+    Throughput of one pass over the outbox
+    """
+
+    def __init__(self):
+        self.sent = self.retried = self.dead = self.batches = 0
+        self.started = time.monotonic()
+
+    def add(self, sent, retried, dead):
+        self.sent += sent
+        self.retried += retried
+        self.dead += dead
+        self.batches += 1
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def __str__(self):
+        elapsed = self.elapsed
+        rate = self.sent / elapsed if elapsed else 0
+        return (
+            'Sent {} email(s) in {} batch(es), {} to retry, {} dead '
+            '({:.2f}s, {:.1f} emails/s)'.format(
+                self.sent, self.batches, self.retried, self.dead,
+                elapsed, rate))
+
+
+def send_queued_emails(batch_size=None, limit=None):
+    """
+    Sends due emails in batches, each over one connection, until there
+    are none left, `limit` batches were sent or a whole batch failed.
+    Returns the OutboxStats of the pass.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    stats = OutboxStats()
+    while limit is None or stats.batches < limit:
+        emails = claim_emails(batch_size)
+        if not emails:
+            break
+        connection = get_connection()
+        try:
+            sent, retried, dead = send_batch(emails, connection)
+        finally:
+            connection.close()
+        stats.add(sent, retried, dead)
+        if not sent:
+            # the mail server is down; leave the rest for the next pass
+            break
+    return stats
+
+
+def purge_emails(days=None, batch_size=None, pause=0):
+    """
+    Deletes the emails sent, or queued and dead, more than `days` ago,
+    EMAIL_OUTBOX_RETENTION_DAYS by default, batch_size at a time, each
+    batch in its own short transaction. `pause` seconds are slept
+    between batches. Returns the number of emails deleted.
+    """
+    days = settings.EMAIL_OUTBOX_RETENTION_DAYS if days is None else days
+    batch_size = batch_size or settings.EMAIL_OUTBOX_RETENTION_BATCH_SIZE
+    cutoff = timezone.now() - timezone.timedelta(days=days)
+    expired = OutboxEmail.objects.filter(
+        Q(status=OutboxEmail.SENT, sent_at__lt=cutoff) |
+        Q(status=OutboxEmail.DEAD, created_at__lt=cutoff)
+    ).order_by('id').values_list('id', flat=True)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(expired[:batch_size])
+            if not ids:
+                return deleted
+            deleted += OutboxEmail.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
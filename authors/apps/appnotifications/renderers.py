@@ -0,0 +1,11 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class EventStreamRenderer(JSONRenderer):
+    """
+    Lets EventSource clients, which only accept text/event-stream, reach
+    the notification stream. The stream itself is not rendered; errors
+    are rendered as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
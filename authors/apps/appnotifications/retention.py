@@ -0,0 +1,138 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from notifications.models import Notification
+
+from .models import ArchivedNotification, NotificationGroup
+
+
+def quoted_tables():
+    quote = connection.ops.quote_name
+    return {
+        'notifications': quote(Notification._meta.db_table),
+        'archive': quote(ArchivedNotification._meta.db_table),
+        'groups': quote(NotificationGroup._meta.db_table),
+    }
+
+
+def expired_bound(cutoff):
+    """
+    Id of the first notification from the cutoff on, past which there
+    is nothing to expire, so batches stop there instead of scanning the
+    newer notifications. None when every notification is older.
+    """
+    return Notification.objects.filter(
+        timestamp__gte=cutoff
+    ).order_by('timestamp').values_list('id', flat=True).first()
+
+
+def prune_batch(cutoff, after, bound, batch_size, drop=False):
+    """
+    Removes the next batch of read or deleted notifications older than
+    the cutoff with ids after `after`, moving them to the archive
+    unless `drop`. Rows locked by a request are skipped, so the batch
+    only holds locks on the rows it removes. Returns the last id looked
+    at (None when done), the rows removed, the bytes they took and the
+    bytes they take in the archive.
+    """
+    sql = (
+        'WITH expired AS ('
+        'SELECT id FROM {notifications} '
+        'WHERE id > %s AND (%s::integer IS NULL OR id < %s) '
+        'AND timestamp < %s AND (NOT unread OR deleted) '
+        'ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED), '
+        'ungrouped AS ('
+        'DELETE FROM {groups} USING expired '
+        'WHERE {groups}.notification_id = expired.id), '
+        'removed AS ('
+        'DELETE FROM {notifications} USING expired '
+        'WHERE {notifications}.id = expired.id '
+        'RETURNING {notifications}.*, '
+        'pg_column_size({notifications}.*) AS size)'
+    )
+    if drop:
+        sql += ', archived AS (SELECT 0 AS size) '
+    else:
+        sql += (
+            ', archived AS ('
+            'INSERT INTO {archive} (id, recipient_id, verb, description, '
+            'timestamp, unread, deleted, archived_at) '
+            'SELECT id, recipient_id, verb, description, timestamp, '
+            'unread, deleted, now() FROM removed '
+            'ON CONFLICT (id) DO NOTHING '
+            'RETURNING pg_column_size({archive}.*) AS size) '
+        )
+    sql += (
+        'SELECT (SELECT max(id) FROM expired), count(*), '
+        'coalesce(sum(size), 0), '
+        '(SELECT coalesce(sum(size), 0) FROM archived) FROM removed'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql.format(**quoted_tables()), [
+            after, bound, bound, cutoff, batch_size])
+        return cursor.fetchone()
+
+
+class RetentionStats:
+    """
+    Rows and bytes reclaimed by one pass over the notifications
+    """
+
+    def __init__(self):
+        self.rows = self.bytes = self.archived_bytes = self.batches = 0
+        self.started = time.monotonic()
+
+    def add(self, rows, size, archived_size):
+        self.rows += rows
+        self.bytes += size
+        self.archived_bytes += archived_size
+        self.batches += 1
+
+    @property
+    def reclaimed(self):
+        return self.bytes - self.archived_bytes
+
+    def __str__(self):
+        return (
+            'Removed {} notification(s) in {} batch(es), reclaiming {} '
+            'of {} byte(s) ({:.2f}s)'.format(
+                self.rows, self.batches, self.reclaimed, self.bytes,
+                time.monotonic() - self.started))
+
+
+def prune_notifications(days=None, batch_size=None, drop=False,
+                        pause=0):
+    """
+    Archives (or, with `drop`, deletes) the read and deleted
+    notifications older than `days`, NOTIFICATION_RETENTION_DAYS by
+    default, batch_size at a time in id order, each batch in its own
+    short transaction. `pause` seconds are slept between batches to
+    leave the database room for requests. Unread notifications are
+    kept whatever their age. Returns the RetentionStats of the pass.
+    """
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+    cutoff = timezone.now() - timezone.timedelta(days=days)
+    bound = expired_bound(cutoff)
+    stats = RetentionStats()
+    after = 0
+    while True:
+        last, rows, size, archived_size = prune_batch(
+            cutoff, after, bound, batch_size, drop)
+        if last is None:
+            return stats
+        stats.add(rows, size, archived_size)
+        after = last
+        if pause:
+            time.sleep(pause)
+
+
+def archived_notifications(user):
+    """
+    The archived notifications a user can still see, which are only
+    read when asked for
+    """
+    return ArchivedNotification.objects.filter(
+        recipient=user, deleted=False)
@@ -1,8 +1,14 @@
+import base64
+import json
+
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
 from notifications.models import Notification
 from authors.apps.articles.models import Article
 from authors.apps.authentication.models import User
-from .models import UserNotification
+from .models import ArchivedNotification, UserNotification
 
 
 class Subscription(serializers.ModelSerializer):
@@ -13,14 +19,34 @@ class Subscription(serializers.ModelSerializer):
     class Meta:
         model = UserNotification
         fields = ('email_notifications',
-                  'in_app_notifications')
+                  'in_app_notifications',
+                  'email_digest')
 
 
 class NotificationSerializer(serializers.ModelSerializer):
     """
-    serializer class for notification objects
+    serializer class for notification objects. Grouped notifications
+    read "jim and 4 others ..."; with an `actor_names` map of user ids
+    to usernames in the context, their actors are listed too.
     """
     timestamp = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    description = serializers.SerializerMethodField()
+
+    def get_description(self, notification):
+        group = getattr(notification, 'group', None)
+        if group is None or group.actor_count < 2:
+            return notification.description
+        return group.text
+
+    def to_representation(self, notification):
+        data = super().to_representation(notification)
+        actor_names = self.context.get('actor_names')
+        if actor_names is not None:
+            group = getattr(notification, 'group', None)
+            data['actors'] = group and [
+                actor_names[actor_id] for actor_id in group.actor_ids
+                if actor_id in actor_names]
+        return data
 
     class Meta:
         model = Notification
@@ -31,3 +57,80 @@ class NotificationSerializer(serializers.ModelSerializer):
             'timestamp',
             'description'
             )
+
+
+class ArchivedNotificationSerializer(serializers.ModelSerializer):
+    """
+    serializer class for archived notifications, shown like the others
+    """
+    timestamp = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+
+    class Meta:
+        model = ArchivedNotification
+        fields = (
+            'id',
+            'unread',
+            'verb',
+            'timestamp',
+            'description'
+            )
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """
+    Validates the notifications to mark as read, given by their ids or
+    as a high-water mark under which all are read
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False,
+        max_length=1000)
+    up_to = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, data):
+        if ('ids' in data) == ('up_to' in data):
+            raise serializers.ValidationError(
+                "Provide either ids or up_to")
+        return data
+
+
+class NotificationCursorPaginator(BasePagination):
+    """
+    Keyset pagination of notifications, newest first.
+
+    Each page is an index range scan from the id of the last
+    notification of the page before, so every page costs the same
+    however long the history is.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 20
+    max_page_size = 100
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pk, = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        queryset = queryset.order_by('-id')
+        position = self.decode_cursor(request)
+        if position:
+            queryset = queryset.filter(id__lt=position)
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [self.page[-1].id]).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor)
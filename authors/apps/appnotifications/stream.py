@@ -0,0 +1,311 @@
+"""
+Server-sent event streams of notifications. Streams wait on a broker
+for their user's notifications to change, chosen with
+NOTIFICATION_STREAM_BROKER.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    A stream's interest in the notifications of one user
+    """
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.changed = threading.Event()
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds for the user's notifications to
+        change. Returns whether they may have changed.
+        """
+        changed = self.changed.wait(timeout)
+        self.changed.clear()
+        return changed
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """
+    Wakes the streams of a user when their notifications change in this
+    process. Waiting streams make no queries, but changes made by other
+    processes (such as run_notification_jobs) are not seen.
+    """
+    subscription_class = Subscription
+    # streams close their database connection while they wait, since
+    # they are only woken when there is something to read
+    release_connection = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = self.subscription_class(self, user_id)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_ids):
+        with self.lock:
+            subscriptions = [
+                subscription for user_id in user_ids
+                for subscription in self.subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.changed.set()
+
+    def count(self):
+        """
+        Number of open streams
+        """
+        with self.lock:
+            return sum(len(subs) for subs in self.subscriptions.values())
+
+    def wake_all(self):
+        with self.lock:
+            subscriptions = [
+                subscription for subs in self.subscriptions.values()
+                for subscription in subs]
+        for subscription in subscriptions:
+            subscription.changed.set()
+
+
+class RedisBroker(MemoryBroker):
+    """
+    Wakes the streams of a user when their notifications change in any
+    process. Changes are published on the NOTIFICATION_STREAM_CHANNEL
+    Redis channel, which one thread per process listens to and passes
+    on to the process' streams, so waiting streams make no queries.
+    """
+
+    def __init__(self, client=None):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(
+                settings.NOTIFICATION_STREAM_REDIS_URL)
+        self.client = client
+        self.listener = None
+
+    def subscribe(self, user_id):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name='notification-streams',
+                    daemon=True)
+                self.listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_ids):
+        try:
+            self.client.publish(settings.NOTIFICATION_STREAM_CHANNEL,
+                                json.dumps(list(user_ids)))
+        except Exception:
+            # the change is committed; streams pick it up on their next
+            # wake up
+            logger.exception('Could not publish notification changes')
+
+    def dispatch(self, message):
+        super().publish(json.loads(message['data']))
+
+    def listen(self):
+        """
+        Passes published changes on to the streams of this process for
+        as long as it runs, subscribing again when Redis goes away
+        """
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(settings.NOTIFICATION_STREAM_CHANNEL)
+                # changes published while unsubscribed were missed
+                self.wake_all()
+                for message in pubsub.listen():
+                    self.dispatch(message)
+            except Exception:
+                logger.exception('Lost the notification stream channel')
+                time.sleep(settings.NOTIFICATION_STREAM_POLL_INTERVAL)
+
+
+class PollingSubscription(Subscription):
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, settings.NOTIFICATION_STREAM_POLL_INTERVAL))
+        return True
+
+
+class PollingBroker(MemoryBroker):
+    """
+    Has streams check the user's notification counter every
+    NOTIFICATION_STREAM_POLL_INTERVAL seconds, which sees changes made
+    by any process
+    """
+    subscription_class = PollingSubscription
+    release_connection = False
+
+    def publish(self, user_ids):
+        pass
+
+
+@lru_cache(maxsize=None)
+def load_broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    """
+    Gets the configured notification stream broker
+    """
+    return load_broker(settings.NOTIFICATION_STREAM_BROKER)
+
+
+def publish_on_commit(user_ids):
+    """
+    Wakes the streams of the users once the current transaction, which
+    changed their notifications, commits
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids))
+
+
+STREAM_TOKEN_SALT = 'authors.apps.appnotifications.stream'
+
+
+def get_stream_token(user_id):
+    """
+    Builds a token that opens the notification stream of a user for
+    NOTIFICATION_STREAM_TOKEN_MAX_AGE seconds, for clients such as
+    EventSource that cannot send an Authorization header
+    """
+    return signing.TimestampSigner(salt=STREAM_TOKEN_SALT).sign(
+        str(user_id))
+
+
+def get_stream_token_user_id(token):
+    """
+    Reads the user id out of a stream token, or returns None when the
+    token was not signed by us or has expired
+    """
+    try:
+        return int(signing.TimestampSigner(salt=STREAM_TOKEN_SALT).unsign(
+            token, max_age=settings.NOTIFICATION_STREAM_TOKEN_MAX_AGE))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append('id: {}'.format(event_id))
+    if event is not None:
+        lines.append('event: {}'.format(event))
+    lines.append('data: {}'.format(json.dumps(data)))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def notification_events(user, last_event_id=None):
+    """
+    Generates the events of a user's notification stream: the
+    notifications after last_event_id (or, without one, only those
+    created from now on), `update` events with the notifications that
+    were sent before and have since been updated in place (grouped
+    notifications) and the unread count whenever it changes. A comment
+    is sent every NOTIFICATION_STREAM_HEARTBEAT seconds to keep the
+    connection open, and the stream ends after
+    NOTIFICATION_STREAM_TIMEOUT seconds for the client to reconnect.
+    Each wake up reads the user's counter row and only looks for new
+    and updated notifications when the counter moved.
+    """
+    from .models import NotificationCounter
+    from .serializers import NotificationSerializer
+
+    broker = get_broker()
+    subscription = broker.subscribe(user.pk)
+    try:
+        notifications = user.notifications.active().select_related(
+            'group').order_by('id')
+        if last_event_id is None:
+            last = notifications.values_list('id', flat=True).last()
+            last_event_id = last or 0
+        updated_since = timezone.now()
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_TIMEOUT
+        yield 'retry: {}\n\n'.format(
+            settings.NOTIFICATION_STREAM_RETRY).encode('utf-8')
+        unread = version = None
+        changed = more = True
+        last_sent = time.monotonic()
+        while True:
+            if changed:
+                count, current = NotificationCounter.state(user.pk)
+                moved, version = current != version, current
+                if moved:
+                    # no event id, which would take the client's last
+                    # event id back
+                    for notification in notifications.filter(
+                        id__lte=last_event_id, timestamp__gt=updated_since
+                    ).order_by('timestamp')[
+                            :settings.NOTIFICATION_STREAM_BATCH_SIZE]:
+                        updated_since = notification.timestamp
+                        yield format_event(
+                            NotificationSerializer(notification).data,
+                            'update')
+                        last_sent = time.monotonic()
+                if more or moved:
+                    new = list(notifications.filter(
+                        id__gt=last_event_id
+                    )[:settings.NOTIFICATION_STREAM_BATCH_SIZE])
+                    for notification in new:
+                        last_event_id = notification.id
+                        updated_since = max(
+                            updated_since, notification.timestamp)
+                        yield format_event(
+                            NotificationSerializer(notification).data,
+                            'notification', notification.id)
+                        last_sent = time.monotonic()
+                    more = len(new) == settings.NOTIFICATION_STREAM_BATCH_SIZE
+                if count != unread:
+                    unread = count
+                    yield format_event({"unreadCount": count}, 'unread')
+                    last_sent = time.monotonic()
+                if more:
+                    # more are waiting; send them without waiting
+                    continue
+            now = time.monotonic()
+            if now - last_sent >= settings.NOTIFICATION_STREAM_HEARTBEAT:
+                yield b': keep-alive\n\n'
+                last_sent = now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                return
+            if broker.release_connection and not connection.in_atomic_block:
+                connection.close()
+            changed = subscription.wait(min(
+                remaining,
+                settings.NOTIFICATION_STREAM_HEARTBEAT - (now - last_sent)))
+    finally:
+        subscription.close()
@@ -1,6 +1,8 @@
 from ...articles.tests.basetests import BaseTest
 from rest_framework.reverse import reverse
 
+from ..jobs import run_notification_jobs
+
 
 class NotificationBaseTest(BaseTest):
     """
@@ -11,9 +13,20 @@ class NotificationBaseTest(BaseTest):
     notification_url = reverse("notifications:all-notifications")
     unread_notification_url = reverse("notifications:unread-notifications")
     subscribe_unsubscribe_url = reverse("notifications:subscription")
-    delete_single_url = reverse("notifications:deleteone", args=[2])
     delete_single_invalid_id = reverse("notifications:deleteone", args=[56])
 
     def follow_user(self):
         self.is_authenticated("jim@gmail.com", "@Us3r.com")
         self.client.post(self.follow_url)
+
+    def setUp(self):
+        super().setUp()
+        run_notification_jobs()
+
+    def create_article(self):
+        """
+        Creates an article and runs the notification jobs it queued
+        """
+        response = super().create_article()
+        run_notification_jobs()
+        return response
@@ -0,0 +1,141 @@
+from io import StringIO
+from urllib.parse import urlsplit
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+
+from authors.apps.articles.models import Article
+from authors.apps.authentication.models import User
+from authors.utils.notification_handlers import get_opt_out_link
+
+from ..digests import send_notification_digests
+from ..jobs import run_notification_jobs
+from ..models import DigestEntry, OutboxEmail, UserNotification
+from ..outbox import send_queued_emails
+from .basetest import NotificationBaseTest
+
+
+class TestNotificationDigests(NotificationBaseTest):
+    """
+    Tests collecting notifications into hourly and daily digest emails
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.readers = {}
+        for digest in ("immediate", "hourly", "daily"):
+            user = User.objects.create_user(
+                username=digest, email="{}@gmail.com".format(digest),
+                password="@Us3r.com")
+            user.profile.follow(self.user1.profile)
+            UserNotification.objects.filter(user=user).update(
+                email_digest=digest)
+            self.readers[digest] = user
+        OutboxEmail.objects.all().delete()
+
+    def publish(self, number=1):
+        for i in range(number):
+            Article.objects.create(
+                title="Digest {}".format(i), description="Collected",
+                body="Body", author=self.user1)
+        run_notification_jobs()
+
+    def test_digest_users_not_emailed_straight_away(self):
+        """
+        Test only immediate users are emailed as notifications happen
+        """
+        self.publish(2)
+        self.assertEqual(list(OutboxEmail.objects.values_list(
+            'to', flat=True)), [["immediate@gmail.com"]] * 2)
+        self.assertEqual(DigestEntry.objects.filter(
+            user=self.readers["hourly"]).count(), 2)
+        self.assertEqual(DigestEntry.objects.filter(
+            user=self.readers["daily"]).count(), 2)
+
+    @override_settings(NOTIFICATION_DIGEST_MAX_ITEMS=2)
+    def test_hourly_digest(self):
+        """
+        Test the hourly users get one email of their notifications
+        """
+        self.publish(3)
+        OutboxEmail.objects.all().delete()
+        out = StringIO()
+        call_command("send_notification_digests", "hourly", stdout=out)
+        self.assertEqual(out.getvalue(), "Queued 1 hourly digest(s)\n")
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ["hourly@gmail.com"])
+        self.assertEqual(email.subject, "You have 3 new notification(s)")
+        self.assertIn("DIGEST 1", email.html_body)
+        self.assertNotIn("DIGEST 2", email.html_body)
+        self.assertIn("and 1 more", email.html_body)
+        self.assertFalse(DigestEntry.objects.filter(
+            user=self.readers["hourly"]).exists())
+        self.assertEqual(DigestEntry.objects.filter(
+            user=self.readers["daily"]).count(), 3)
+        self.assertEqual(send_notification_digests("hourly"), 0)
+
+    def test_daily_digests_batched(self):
+        """
+        Test digests are queued for every user across batches
+        """
+        self.publish()
+        for user in User.objects.exclude(username="daily"):
+            UserNotification.objects.filter(user=user).update(
+                email_digest="daily")
+        self.publish()
+        OutboxEmail.objects.all().delete()
+        self.assertEqual(send_notification_digests("daily", batch_size=1), 3)
+        mail.outbox = []
+        send_queued_emails()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            "daily@gmail.com", "hourly@gmail.com", "immediate@gmail.com"])
+
+    def test_unsubscribed_users_get_no_digest(self):
+        """
+        Test entries of users who stopped email notifications are dropped
+        """
+        self.publish()
+        UserNotification.objects.filter(user=self.readers["daily"]).update(
+            email_notifications=False)
+        OutboxEmail.objects.all().delete()
+        self.assertEqual(send_notification_digests("daily"), 0)
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertFalse(DigestEntry.objects.filter(
+            user=self.readers["daily"]).exists())
+
+
+class TestOptOutLink(NotificationBaseTest):
+    """
+    Tests the signed email opt out link
+    """
+
+    def test_link_is_signed_and_stable(self):
+        """
+        Test the link is the same every time and writes no token
+        """
+        Token.objects.all().delete()
+        link = get_opt_out_link(self.user2.pk)
+        self.assertEqual(link, get_opt_out_link(self.user2.pk))
+        self.assertFalse(Token.objects.exists())
+
+        response = self.client.get(urlsplit(link).path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(UserNotification.objects.get(
+            user=self.user2).email_notifications)
+
+    def test_tampered_link_rejected(self):
+        """
+        Test a link whose signature does not match is rejected
+        """
+        token = urlsplit(get_opt_out_link(self.user2.pk)).path.split("/")[-2]
+        signature = token.split(":")[1]
+        response = self.client.get(reverse(
+            "notifications:opt_out_link",
+            args=["{}:{}".format(self.user1.pk, signature)]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(UserNotification.objects.get(
+            user=self.user1).email_notifications)
@@ -0,0 +1,297 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from notifications.models import Notification
+
+from authors.apps.articles.models import Article, Comment, Favorite
+from authors.apps.authentication.models import User
+
+from ..jobs import JOB_HANDLERS, run_notification_jobs
+from ..models import NotificationCounter, NotificationJob, OutboxEmail
+from ..outbox import send_queued_emails
+from .basetest import NotificationBaseTest
+
+
+@override_settings(NOTIFICATION_JOB_CHUNK_SIZE=2)
+class TestNotificationJobs(NotificationBaseTest):
+    """
+    Tests the queued notification fan-out of new articles
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.followers = []
+        for i in range(5):
+            user = User.objects.create_user(
+                username="follower{}".format(i),
+                email="follower{}@gmail.com".format(i),
+                password="@Us3r.com")
+            user.profile.follow(self.user1.profile)
+            self.followers.append(user)
+        preferences = self.followers[0].notification_preferences
+        preferences.email_notifications = False
+        preferences.save()
+        preferences = self.followers[1].notification_preferences
+        preferences.in_app_notifications = False
+        preferences.save()
+        mail.outbox = []
+
+    def publish(self):
+        return Article.objects.create(
+            title="Fan out", description="Queued", body="Body",
+            author=self.user1)
+
+    def test_article_queues_job(self):
+        """
+        Test publishing only queues the fan-out
+        """
+        article = self.publish()
+        job = NotificationJob.objects.get(article=article)
+        self.assertEqual(job.status, NotificationJob.PENDING)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_fan_out(self):
+        """
+        Test the job notifies followers in chunks by their preferences
+        """
+        article = self.publish()
+        call_command("run_notification_jobs", stdout=StringIO())
+        job = NotificationJob.objects.get(article=article)
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual((job.total, job.processed), (5, 5))
+        recipients = set(Notification.objects.values_list(
+            'recipient__username', flat=True))
+        self.assertEqual(recipients, {
+            "follower0", "follower2", "follower3", "follower4"})
+        notification = Notification.objects.first()
+        self.assertEqual(notification.verb, article.slug)
+        self.assertEqual(notification.action_object, article)
+        self.assertEqual(OutboxEmail.objects.count(), 4)
+        self.assertEqual(len(mail.outbox), 0)
+        send_queued_emails()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            "follower{}@gmail.com".format(i) for i in range(1, 5)])
+        self.assertIn("notifications/unsubscribe_email/",
+                      mail.outbox[0].alternatives[0][0])
+
+    def test_failed_job_resumes(self):
+        """
+        Test a failing job is retried from the last finished chunk
+        """
+        article = self.publish()
+        with patch("authors.utils.notification_handlers.NotificationMail"
+                   ".send_mail", side_effect=[None, OSError("down")]):
+            run_notification_jobs()
+        job = NotificationJob.objects.get(article=article)
+        self.assertEqual(job.status, NotificationJob.PENDING)
+        self.assertEqual((job.attempts, job.processed), (1, 2))
+        self.assertIn("OSError", job.last_error)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        NotificationJob.objects.update(run_after=job.created_at)
+        run_notification_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(Notification.objects.count(), 4)
+
+    @override_settings(NOTIFICATION_JOB_MAX_ATTEMPTS=1)
+    def test_job_fails_after_max_attempts(self):
+        """
+        Test a job stops being retried after its last attempt
+        """
+        article = self.publish()
+        with patch.dict(JOB_HANDLERS, {
+                NotificationJob.ARTICLE_CREATED: lambda job: 1 / 0}):
+            run_notification_jobs()
+        job = NotificationJob.objects.get(article=article)
+        self.assertEqual(job.status, NotificationJob.FAILED)
+        self.assertEqual(run_notification_jobs(), 0)
+
+    def edit(self, article, times):
+        for i in range(times):
+            article.body = "Edit {}".format(i)
+            article.save()
+
+    def test_edits_not_notified_by_default(self):
+        """
+        Test saving an existing article queues nothing
+        """
+        article = self.publish()
+        self.edit(article, 2)
+        article.votes.up(self.user2.id)
+        self.assertEqual(NotificationJob.objects.filter(
+            article=article).count(), 1)
+
+    @override_settings(ARTICLE_UPDATE_NOTIFICATION_WINDOW=300)
+    def test_edits_coalesced(self):
+        """
+        Test a burst of edits sends one update notification per follower
+        """
+        article = self.publish()
+        run_notification_jobs()
+        Notification.objects.all().delete()
+        self.edit(article, 3)
+        article.votes.up(self.user2.id)
+        job = NotificationJob.objects.get(
+            article=article, kind=NotificationJob.ARTICLE_UPDATED)
+        self.assertGreater(job.run_after, job.created_at)
+        self.assertEqual(run_notification_jobs(), 0)
+
+        NotificationJob.objects.update(run_after=job.created_at)
+        run_notification_jobs()
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertEqual(set(Notification.objects.values_list(
+            'verb', flat=True)), {"article_updated"})
+        self.edit(article, 1)
+        self.assertEqual(NotificationJob.objects.filter(
+            kind=NotificationJob.ARTICLE_UPDATED,
+            status=NotificationJob.PENDING).count(), 1)
+
+
+class TestCommentNotifications(NotificationBaseTest):
+    """
+    Tests the queued notification of comments to favoriting users
+    """
+
+    def setUp(self):
+        super().setUp()
+        NotificationJob.objects.all().delete()
+        Notification.objects.all().delete()
+        self.fans = []
+        for i in range(4):
+            user = User.objects.create_user(
+                username="fan{}".format(i),
+                email="fan{}@gmail.com".format(i),
+                password="@Us3r.com")
+            Favorite.objects.create(user=user, article=self.article)
+            self.fans.append(user)
+        preferences = self.fans[0].notification_preferences
+        preferences.in_app_notifications = False
+        preferences.save()
+        preferences = self.fans[1].notification_preferences
+        preferences.email_notifications = False
+        preferences.save()
+        OutboxEmail.objects.all().delete()
+
+    def post_comments(self, author, number=1):
+        return [
+            Comment.objects.create(
+                article=self.article, author=author,
+                body="Comment {}".format(i))
+            for i in range(number)
+        ]
+
+    def run_due(self):
+        NotificationJob.objects.update(run_after=timezone.now())
+        return run_notification_jobs()
+
+    def test_comment_notified_once_per_fan(self):
+        """
+        Test a comment notifies each favoriting user once
+        """
+        self.post_comments(self.user2)
+        self.assertEqual(run_notification_jobs(), 0)
+        self.assertEqual(self.run_due(), 1)
+        recipients = list(Notification.objects.values_list(
+            'recipient__username', flat=True))
+        self.assertEqual(sorted(recipients), ["fan1", "fan2", "fan3"])
+        notification = Notification.objects.first()
+        self.assertEqual(notification.verb, "comment_created")
+        self.assertTrue(notification.description.startswith(
+            "jim posted a comment to this is mine"))
+        self.assertEqual(notification.target, self.article)
+        self.assertEqual(OutboxEmail.objects.count(), 3)
+
+    def test_burst_coalesced(self):
+        """
+        Test a burst of comments sends one grouped notification per fan
+        """
+        self.post_comments(self.user2, 3)
+        self.post_comments(self.fans[2], 2)
+        self.assertEqual(NotificationJob.objects.count(), 1)
+        self.run_due()
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(set(Notification.objects.values_list(
+            'description', flat=True)), {"5 new comments on this is mine"})
+
+    def test_own_comments_not_notified(self):
+        """
+        Test a fan is not notified of a burst of their own comments
+        """
+        self.post_comments(self.fans[2], 2)
+        self.run_due()
+        self.assertEqual(sorted(Notification.objects.values_list(
+            'recipient__username', flat=True)), ["fan1", "fan3"])
+
+    def test_comments_while_running_queue_new_job(self):
+        """
+        Test comments posted once the job started go to a new job
+        """
+        self.post_comments(self.user2)
+        NotificationJob.objects.update(status=NotificationJob.RUNNING)
+        self.post_comments(self.user2)
+        self.assertEqual(NotificationJob.objects.filter(
+            status=NotificationJob.PENDING).count(), 1)
+
+    def test_later_bursts_grouped(self):
+        """
+        Test a later burst updates the fans' notification in place
+        """
+        self.post_comments(self.user2)
+        self.run_due()
+        notification = Notification.objects.get(recipient=self.fans[3])
+        notification.mark_as_read()
+        NotificationCounter.record({self.fans[3].pk: -1})
+        self.post_comments(self.fans[2])
+        self.run_due()
+        version = NotificationCounter.objects.get(user=self.fans[3]).version
+        self.post_comments(self.user1)
+        self.run_due()
+        self.assertEqual(Notification.objects.filter(
+            recipient=self.fans[3]).get().id, notification.id)
+        # already unread, but the update still reaches its streams
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.fans[3]).version,
+            version + 1)
+        self.assertEqual(NotificationCounter.unread_count(self.fans[3].pk), 1)
+
+        self.client.force_authenticate(user=self.fans[3])
+        response = self.client.get(self.notification_url)
+        self.assertEqual(
+            response.data["notifications"][0]["description"],
+            "adam and 2 others commented on this is mine")
+        self.assertTrue(response.data["notifications"][0]["unread"])
+        self.assertNotIn("actors", response.data["notifications"][0])
+        response = self.client.get(
+            self.notification_url, {"expand": "actors"})
+        self.assertEqual(response.data["notifications"][0]["actors"], [
+            "adam", "fan2", "jim"])
+
+    def test_fan_left_out_of_own_group(self):
+        """
+        Test a fan's own comments do not name them in their group
+        """
+        self.post_comments(self.user2)
+        self.run_due()
+        self.post_comments(self.fans[2])
+        self.run_due()
+        self.assertEqual(
+            Notification.objects.get(recipient=self.fans[2]).group.actor_ids,
+            [self.user2.pk])
+
+    @override_settings(NOTIFICATION_GROUP_WINDOW=0)
+    def test_closed_group_not_updated(self):
+        """
+        Test comments after the window start a new notification
+        """
+        self.post_comments(self.user2)
+        self.run_due()
+        self.post_comments(self.user1)
+        self.run_due()
+        self.assertEqual(Notification.objects.filter(
+            recipient=self.fans[3]).count(), 2)
@@ -1,7 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
+from notifications.models import Notification
+from notifications.signals import notify
 from rest_framework import status
 from .basetest import NotificationBaseTest
 from rest_framework.reverse import reverse
 
+from ..models import NotificationCounter
+
 
 class TestNotifications(NotificationBaseTest):
     """
@@ -108,7 +115,9 @@ class TestNotifications(NotificationBaseTest):
         self.follow_user()
         self.create_article()
         self.is_authenticated("jim@gmail.com", "@Us3r.com")
-        response = self.client.delete(self.delete_single_url)
+        notification = self.user2.notifications.active().first()
+        response = self.client.delete(reverse(
+            "notifications:deleteone", args=[notification.id]))
         self.assertEqual(response.data['message'],
                          'Notification deleted successfully')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -124,3 +133,117 @@ class TestNotifications(NotificationBaseTest):
         self.assertEqual(response.data['message'],
                          'No notification found with that id')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestNotificationReadState(NotificationBaseTest):
+    """
+    Tests paging notifications, marking them read and the unread counter
+    """
+
+    read_url = reverse("notifications:mark-read")
+    unread_count_url = reverse("notifications:unread-count")
+
+    def setUp(self):
+        super().setUp()
+        Notification.objects.all().delete()
+        for i in range(5):
+            notify.send(self.user1, recipient=self.user2,
+                        verb="test", description="Test {}".format(i))
+        notify.send(self.user2, recipient=self.user1, verb="test")
+        self.notifications = list(Notification.objects.filter(
+            recipient=self.user2).order_by('id'))
+        self.is_authenticated("jim@gmail.com", "@Us3r.com")
+
+    def unread_count(self):
+        response = self.client.get(self.unread_count_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["unreadCount"]
+
+    def test_listing_does_not_mark_read(self):
+        """
+        Test listing notifications leaves them unread
+        """
+        response = self.client.get(self.notification_url)
+        self.assertEqual(response.data["unreadCount"], 5)
+        self.assertEqual(self.user2.notifications.unread().count(), 5)
+        self.assertEqual(self.unread_count(), 5)
+
+    def test_pages(self):
+        """
+        Test following the next links through the notifications
+        """
+        response = self.client.get(self.notification_url, {"page_limit": 2})
+        found = []
+        while True:
+            found += [item["id"] for item in response.data["notifications"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(found, [
+            notification.id for notification in reversed(self.notifications)])
+
+    def test_mark_read_by_ids(self):
+        """
+        Test marking notifications read by id
+        """
+        other = Notification.objects.get(recipient=self.user1)
+        response = self.client.post(self.read_url, {"ids": [
+            self.notifications[0].id, self.notifications[1].id, other.id]},
+            format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["message"],
+                         "Marked 2 notification(s) as read")
+        self.assertEqual(response.data["unreadCount"], 3)
+        other.refresh_from_db()
+        self.assertTrue(other.unread)
+
+    def test_mark_read_up_to(self):
+        """
+        Test marking all notifications up to a high-water mark read
+        """
+        self.client.post(self.read_url, {
+            "up_to": self.notifications[3].id}, format="json")
+        self.assertEqual(self.unread_count(), 1)
+        response = self.client.get(self.unread_notification_url)
+        self.assertEqual(
+            [item["id"] for item in response.data["notifications"]],
+            [self.notifications[4].id])
+
+    def test_mark_read_needs_ids_or_up_to(self):
+        """
+        Test marking read takes exactly one of ids and up_to
+        """
+        for data in ({}, {"ids": [1], "up_to": 1}):
+            response = self.client.post(self.read_url, data, format="json")
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_deletes_counted(self):
+        """
+        Test deleting notifications takes them off the counter
+        """
+        self.client.delete(reverse(
+            "notifications:deleteone", args=[self.notifications[0].id]))
+        self.assertEqual(self.unread_count(), 4)
+        self.client.delete(self.notification_url)
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_fan_out_counted(self):
+        """
+        Test bulk inserted notifications are counted
+        """
+        self.follow_user()
+        self.create_article()
+        self.is_authenticated("jim@gmail.com", "@Us3r.com")
+        self.assertEqual(self.unread_count(), 6)
+
+    def test_reconcile_counters(self):
+        """
+        Test counters are recomputed from the notifications
+        """
+        NotificationCounter.objects.update(unread=0)
+        out = StringIO()
+        call_command("reconcile_notification_counters", stdout=out)
+        self.assertIn("Fixed the unread counters of 2 user(s)",
+                      out.getvalue())
+        self.assertEqual(self.unread_count(), 5)
@@ -0,0 +1,209 @@
+import asyncore
+import smtpd
+import threading
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from authors.utils.mailer import NotificationMail
+
+from ..models import OutboxEmail
+from ..outbox import purge_emails, send_queued_emails
+
+FLAKY_BACKEND = (
+    'authors.apps.appnotifications.tests.test_outbox.FlakyBackend')
+
+
+class FlakyBackend(EmailBackend):
+    """
+    Locmem backend that refuses mail to bounce addresses and counts the
+    connections opened
+    """
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bounce') for address in message.to):
+                raise OSError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class SMTPStandIn(smtpd.SMTPServer):
+    """
+    Local SMTP server that records the messages and connections it gets
+    """
+
+    def __init__(self):
+        self.socket_map = {}
+        self.messages = []
+        self.connections = 0
+        super().__init__(('127.0.0.1', 0), None, map=self.socket_map,
+                         decode_data=True)
+        self.port = self.socket.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+
+    def serve(self):
+        while self.running:
+            asyncore.loop(0.05, map=self.socket_map, count=1)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        asyncore.close_all(map=self.socket_map)
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.messages.append(rcpttos)
+
+
+class TestEmailOutbox(APITestCase):
+    """
+    Tests queueing emails and sending them from the outbox
+    """
+
+    def queue(self, *addresses):
+        NotificationMail("Something happened", "http://example.com", [
+            (address.split('@')[0], address, "http://example.com/opt-out")
+            for address in addresses
+        ]).send_mail()
+
+    def test_registration_queues_email(self):
+        """
+        Test registering only queues the confirmation email
+        """
+        mail.outbox = []
+        response = self.client.post(
+            reverse("authentication:registration"), {
+                "username": "queued",
+                "email": "queued@gmail.com",
+                "password": "@Us3r.co3mW"
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ["queued@gmail.com"])
+        self.assertEqual(len(mail.outbox), 0)
+
+        stats = send_queued_emails()
+        self.assertEqual(stats.sent, 1)
+        self.assertEqual(mail.outbox[0].subject, "Welcome queued")
+        self.assertIn("text/html", mail.outbox[0].alternatives[0])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual((email.body, email.html_body), ("", ""))
+
+    @override_settings(EMAIL_BACKEND=FLAKY_BACKEND)
+    def test_batches_share_a_connection(self):
+        """
+        Test each batch is sent over one connection
+        """
+        FlakyBackend.opened = 0
+        mail.outbox = []
+        self.queue(*["user{}@gmail.com".format(i) for i in range(5)])
+        stats = send_queued_emails(batch_size=2)
+        self.assertEqual((stats.sent, stats.batches), (5, 3))
+        self.assertEqual(FlakyBackend.opened, 3)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_BACKEND=FLAKY_BACKEND)
+    def test_failed_email_retried_with_backoff(self):
+        """
+        Test a failing email is rescheduled without holding up the rest
+        """
+        mail.outbox = []
+        self.queue("bounce@gmail.com", "fine@gmail.com")
+        stats = send_queued_emails()
+        self.assertEqual((stats.sent, stats.retried, stats.dead), (1, 1, 0))
+        email = OutboxEmail.objects.get(to=["bounce@gmail.com"])
+        self.assertEqual((email.status, email.attempts),
+                         (OutboxEmail.PENDING, 1))
+        self.assertGreater(email.run_after, timezone.now())
+        self.assertIn("mailbox unavailable", email.last_error)
+        self.assertEqual(send_queued_emails().sent, 0)
+
+    @override_settings(EMAIL_BACKEND=FLAKY_BACKEND,
+                       EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_dead_letter_and_requeue(self):
+        """
+        Test an email is dead after its last attempt and can be requeued
+        """
+        self.queue("bounce@gmail.com")
+        self.assertEqual(send_queued_emails().dead, 1)
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.DEAD)
+
+        out = StringIO()
+        call_command("send_queued_emails", status=True, stdout=out)
+        self.assertEqual(out.getvalue(), "dead: 1\n")
+        call_command("send_queued_emails", requeue_dead=True, stdout=out)
+        self.assertIn("Requeued 1 dead email(s)", out.getvalue())
+
+    def test_old_sent_and_dead_emails_purged(self):
+        """
+        Test sent and dead emails are deleted after their retention
+        """
+        self.queue(*["user{}@gmail.com".format(i) for i in range(4)])
+        old = timezone.now() - timezone.timedelta(days=8)
+        emails = list(OutboxEmail.objects.order_by("id"))
+        OutboxEmail.objects.filter(id=emails[0].id).update(
+            status=OutboxEmail.SENT, sent_at=old)
+        OutboxEmail.objects.filter(id=emails[1].id).update(
+            status=OutboxEmail.SENT, sent_at=timezone.now())
+        OutboxEmail.objects.filter(id=emails[2].id).update(
+            status=OutboxEmail.DEAD)
+        OutboxEmail.objects.filter(id=emails[2].id).update(created_at=old)
+        OutboxEmail.objects.filter(id=emails[3].id).update(created_at=old)
+        self.assertEqual(purge_emails(batch_size=1), 2)
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list("id", flat=True)),
+            [emails[1].id, emails[3].id])
+
+        out = StringIO()
+        call_command("prune_outbox", days=0, stdout=out)
+        self.assertEqual(out.getvalue(), "Deleted 1 email(s)\n")
+
+    def test_stale_lock_reclaimed(self):
+        """
+        Test emails left sending by a dead worker are sent again
+        """
+        self.queue("stuck@gmail.com")
+        OutboxEmail.objects.update(
+            status=OutboxEmail.SENDING,
+            locked_at=timezone.now() - timezone.timedelta(hours=1))
+        mail.outbox = []
+        self.assertEqual(send_queued_emails().sent, 1)
+        self.assertEqual(mail.outbox[0].to, ["stuck@gmail.com"])
+
+    def test_smtp_connection_reused(self):
+        """
+        Test a batch goes to a real SMTP server over one connection
+        """
+        server = SMTPStandIn()
+        self.addCleanup(server.stop)
+        self.queue(*["smtp{}@gmail.com".format(i) for i in range(3)])
+        with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port,
+                EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+                EMAIL_USE_TLS=False):
+            out = StringIO()
+            call_command("send_queued_emails", stdout=out)
+        self.assertIn("Sent 3 email(s) in 1 batch(es)", out.getvalue())
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(sorted(server.messages), [
+            ["smtp{}@gmail.com".format(i)] for i in range(3)])
@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.signals import notify
+from rest_framework.reverse import reverse
+
+from ..models import (ArchivedNotification, NotificationCounter,
+                      NotificationGroup)
+from ..retention import prune_notifications
+from .basetest import NotificationBaseTest
+
+
+class TestNotificationRetention(NotificationBaseTest):
+    """
+    Tests archiving and dropping notifications past their retention
+    """
+
+    def setUp(self):
+        super().setUp()
+        Notification.objects.all().delete()
+        self.notifications = {}
+        for name in ("read", "deleted", "unread", "recent"):
+            self.notifications[name] = notify.send(
+                self.user1, recipient=self.user2, verb=name)[0][1][0]
+        Notification.objects.filter(verb="read").update(unread=False)
+        Notification.objects.filter(verb="recent").update(unread=False)
+        Notification.objects.filter(verb="deleted").update(deleted=True)
+        Notification.objects.exclude(verb="recent").update(
+            timestamp=timezone.now() - timezone.timedelta(days=100))
+        NotificationGroup.objects.create(
+            notification=self.notifications["read"], recipient=self.user2,
+            verb="read", action="read", actor_ids=[self.user1.pk],
+            latest_actors=["adam"], closes_at=timezone.now())
+        call_command("reconcile_notification_counters", stdout=StringIO())
+
+    def test_old_read_and_deleted_archived(self):
+        """
+        Test only old read or deleted notifications are moved
+        """
+        stats = prune_notifications(days=90, batch_size=1)
+        self.assertEqual((stats.rows, stats.batches), (2, 2))
+        self.assertGreater(stats.bytes, 0)
+        self.assertGreater(stats.reclaimed, 0)
+        self.assertEqual(sorted(Notification.objects.values_list(
+            'verb', flat=True)), ["recent", "unread"])
+        archived = ArchivedNotification.objects.get(verb="deleted")
+        self.assertEqual(archived.id, self.notifications["deleted"].id)
+        self.assertTrue(archived.deleted)
+        self.assertEqual(archived.recipient, self.user2)
+        self.assertFalse(NotificationGroup.objects.exists())
+        self.assertEqual(NotificationCounter.unread_count(self.user2.pk), 1)
+        self.assertEqual(prune_notifications(days=90).rows, 0)
+
+    def test_drop(self):
+        """
+        Test dropped notifications are not archived
+        """
+        out = StringIO()
+        call_command("prune_notifications", drop=True, stdout=out)
+        self.assertIn("Removed 2 notification(s) in 1 batch(es)",
+                      out.getvalue())
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_archive_listed_when_asked(self):
+        """
+        Test the list only reads the archive with ?archived=true
+        """
+        prune_notifications()
+        self.is_authenticated("jim@gmail.com", "@Us3r.com")
+        response = self.client.get(self.notification_url)
+        self.assertEqual([
+            notification["verb"]
+            for notification in response.data["notifications"]
+        ], ["recent", "unread"])
+        response = self.client.get(
+            self.notification_url, {"archived": "true"})
+        archived, = response.data["notifications"]
+        self.assertEqual(archived["id"], self.notifications["read"].id)
+        self.assertEqual((archived["verb"], archived["unread"]),
+                         ("read", False))
+        response = self.client.get(reverse(
+            "notifications:unread-notifications"), {"archived": "true"})
+        self.assertEqual([
+            notification["verb"]
+            for notification in response.data["notifications"]
+        ], ["unread"])
@@ -0,0 +1,295 @@
+import json
+import queue
+import threading
+import time
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from notifications.models import Notification
+from notifications.signals import notify
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from ..models import NotificationCounter
+from ..stream import MemoryBroker, RedisBroker, get_broker
+from .basetest import NotificationBaseTest
+
+MEMORY_BROKER = 'authors.apps.appnotifications.stream.MemoryBroker'
+POLLING_BROKER = 'authors.apps.appnotifications.stream.PollingBroker'
+
+
+def run_commit_callbacks():
+    """
+    Runs the callbacks waiting for the test's transaction to commit
+    """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
+
+
+def parse(chunk):
+    """
+    Reads the fields of one server-sent event
+    """
+    fields = {}
+    for line in chunk.decode('utf-8').strip().split('\n'):
+        name, _, value = line.partition(': ')
+        fields[name] = value
+    if 'data' in fields:
+        fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+class TestMemoryBroker(SimpleTestCase):
+    """
+    Tests waking the streams of users
+    """
+
+    def test_publish_wakes_user_streams(self):
+        """
+        Test publishing wakes only the streams of the given users
+        """
+        broker = MemoryBroker()
+        mine = broker.subscribe(1)
+        other = broker.subscribe(2)
+        broker.publish([1])
+        self.assertTrue(mine.wait(0))
+        self.assertFalse(mine.wait(0))
+        self.assertFalse(other.wait(0))
+        mine.close()
+        other.close()
+        self.assertEqual(broker.count(), 0)
+
+
+class LoopbackRedis:
+    """
+    Stands in for a Redis client, handing what is published to its
+    subscribers
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.listening = threading.Event()
+
+    def publish(self, channel, data):
+        self.messages.put({'channel': channel, 'data': data.encode()})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        self.listening.set()
+        while True:
+            yield self.messages.get()
+
+
+class TestRedisBroker(SimpleTestCase):
+    """
+    Tests waking streams on changes published through Redis
+    """
+
+    def test_listener_wakes_user_streams(self):
+        """
+        Test one listener thread passes changes on to the streams
+        """
+        client = LoopbackRedis()
+        broker = RedisBroker(client)
+        mine = broker.subscribe(1)
+        other = broker.subscribe(2)
+        broker.subscribe(1).close()
+        self.assertTrue(client.listening.wait(1))
+        # woken once the listener subscribed, as changes may be missed
+        self.assertTrue(mine.wait(0))
+        self.assertTrue(other.wait(0))
+        broker.publish([1])
+        self.assertTrue(mine.wait(1))
+        self.assertFalse(other.wait(0))
+        self.assertTrue(broker.listener.is_alive())
+        mine.close()
+        other.close()
+
+
+@override_settings(NOTIFICATION_STREAM_BROKER=MEMORY_BROKER,
+                   NOTIFICATION_STREAM_HEARTBEAT=0.05,
+                   NOTIFICATION_STREAM_TIMEOUT=0.3,
+                   NOTIFICATION_STREAM_POLL_INTERVAL=0.01)
+class TestNotificationStream(NotificationBaseTest):
+    """
+    Tests streaming notifications as server-sent events
+    """
+
+    stream_url = reverse("notifications:stream")
+
+    def setUp(self):
+        super().setUp()
+        Notification.objects.all().delete()
+        self.old = [
+            notify.send(self.user1, recipient=self.user2, verb="old")[0][1][0]
+            for _ in range(3)]
+        run_commit_callbacks()
+        self.is_authenticated("jim@gmail.com", "@Us3r.com")
+
+    def open_stream(self, **headers):
+        response = self.client.get(
+            self.stream_url, HTTP_ACCEPT='text/event-stream', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content
+        # the test client closes the stream once it is consumed
+        self.addCleanup(list, events)
+        self.assertEqual(next(events), b'retry: 3000\n\n')
+        return events
+
+    def test_stream_starts_with_unread_count(self):
+        """
+        Test a new stream only sends the unread count
+        """
+        events = self.open_stream()
+        self.assertEqual(parse(next(events)), {
+            'event': 'unread', 'data': {'unreadCount': 3}})
+        self.assertEqual(next(events), b': keep-alive\n\n')
+
+    def test_resume_from_last_event_id(self):
+        """
+        Test a reconnecting stream sends what was missed
+        """
+        events = self.open_stream(HTTP_LAST_EVENT_ID=str(self.old[0].id))
+        for notification in self.old[1:]:
+            event = parse(next(events))
+            self.assertEqual(event['id'], str(notification.id))
+            self.assertEqual(event['event'], 'notification')
+            self.assertEqual(event['data']['verb'], 'old')
+        self.assertEqual(parse(next(events))['event'], 'unread')
+
+    def test_new_notification_pushed(self):
+        """
+        Test a stream is woken by a new notification
+        """
+        events = self.open_stream()
+        next(events)
+        subscription = next(iter(
+            get_broker().subscriptions[self.user2.pk]))
+        notification = notify.send(
+            self.user1, recipient=self.user2, verb="new")[0][1][0]
+        self.assertFalse(subscription.changed.is_set())
+        run_commit_callbacks()
+        self.assertEqual(parse(next(events))['id'], str(notification.id))
+        self.assertEqual(parse(next(events))['data'], {'unreadCount': 4})
+
+    def test_read_pushes_unread_count(self):
+        """
+        Test marking notifications read updates the unread count
+        """
+        events = self.open_stream()
+        next(events)
+        self.client.post(reverse("notifications:mark-read"), {
+            "up_to": self.old[-1].id}, format="json")
+        run_commit_callbacks()
+        self.assertEqual(parse(next(events))['data'], {'unreadCount': 0})
+
+    @override_settings(NOTIFICATION_STREAM_BROKER=POLLING_BROKER)
+    def test_polling_sees_other_processes(self):
+        """
+        Test the polling broker finds notifications nobody published
+        """
+        events = self.open_stream()
+        next(events)
+        notification = notify.send(
+            self.user1, recipient=self.user2, verb="elsewhere")[0][1][0]
+        connection.run_on_commit = []
+        self.assertEqual(parse(next(events))['id'], str(notification.id))
+
+    @override_settings(NOTIFICATION_STREAM_BROKER=POLLING_BROKER)
+    def test_idle_polls_only_read_the_counter(self):
+        """
+        Test polling makes one counter lookup while nothing changes
+        """
+        events = self.open_stream()
+        next(events)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(next(events), b': keep-alive\n\n')
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            self.assertIn('"appnotifications_notificationcounter"',
+                          query['sql'])
+            self.assertNotIn('"notifications_notification"', query['sql'])
+
+    @override_settings(NOTIFICATION_STREAM_BROKER=POLLING_BROKER)
+    def test_polling_sees_new_notification_with_same_count(self):
+        """
+        Test a new notification is found when a read kept the count
+        """
+        events = self.open_stream()
+        next(events)
+        self.client.post(reverse("notifications:mark-read"), {
+            "up_to": self.old[0].id}, format="json")
+        notification = notify.send(
+            self.user1, recipient=self.user2, verb="elsewhere")[0][1][0]
+        connection.run_on_commit = []
+        self.assertEqual(parse(next(events))['id'], str(notification.id))
+
+    def test_notification_updated_in_place_pushed(self):
+        """
+        Test a stream sends a notification again once it is updated
+        """
+        events = self.open_stream()
+        next(events)
+        Notification.objects.filter(id=self.old[0].id).update(
+            description="jim and 1 other commented", timestamp=timezone.now())
+        NotificationCounter.touch([self.user2.pk])
+        run_commit_callbacks()
+        event = parse(next(events))
+        self.assertEqual(event['event'], 'update')
+        self.assertNotIn('id', event)
+        self.assertEqual(event['data']['id'], self.old[0].id)
+        self.assertEqual(event['data']['description'],
+                         "jim and 1 other commented")
+        self.assertEqual(next(events), b': keep-alive\n\n')
+
+    def test_stream_token(self):
+        """
+        Test a stream opens with a stream token instead of a header
+        """
+        response = self.client.post(reverse("notifications:stream-token"))
+        self.assertEqual(response.data["expiresIn"], 60)
+        self.client.credentials()
+        events = self.open_stream(
+            QUERY_STRING="token=" + response.data["token"])
+        self.assertEqual(parse(next(events))['data'], {'unreadCount': 3})
+
+    @override_settings(NOTIFICATION_STREAM_TOKEN_MAX_AGE=0)
+    def test_expired_stream_token(self):
+        """
+        Test an expired or forged stream token is refused
+        """
+        token = self.client.post(
+            reverse("notifications:stream-token")).data["token"]
+        self.client.credentials()
+        time.sleep(1)
+        for token in (token, token + "x"):
+            response = self.client.get(self.stream_url, {"token": token})
+            self.assertEqual(response.status_code,
+                             status.HTTP_403_FORBIDDEN)
+
+    @override_settings(NOTIFICATION_STREAM_TIMEOUT=0.1)
+    def test_stream_ends(self):
+        """
+        Test a stream ends for the client to reconnect
+        """
+        events = self.open_stream()
+        self.assertEqual(len(list(events)), 2)
+        self.assertEqual(
+            get_broker().subscriptions.get(self.user2.pk), None)
+
+    def test_invalid_last_event_id(self):
+        """
+        Test a malformed Last-Event-ID is rejected
+        """
+        response = self.client.get(
+            self.stream_url, HTTP_LAST_EVENT_ID="latest")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -14,6 +14,26 @@ urlpatterns = [
         views.UnreadNotificationsAPIview.as_view(),
         name="unread-notifications"
     ),
+    path(
+        'notifications/unread/count/',
+        views.UnreadCountAPIView.as_view(),
+        name="unread-count"
+    ),
+    path(
+        'notifications/stream/',
+        views.NotificationStreamAPIView.as_view(),
+        name="stream"
+    ),
+    path(
+        'notifications/stream/token/',
+        views.StreamTokenAPIView.as_view(),
+        name="stream-token"
+    ),
+    path(
+        'notifications/read/',
+        views.MarkReadAPIView.as_view(),
+        name="mark-read"
+    ),
     path(
         'notifications/subscription/',
         views.SubscribeUnsubscribeAPIView.as_view(),
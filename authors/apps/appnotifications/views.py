@@ -1,17 +1,30 @@
-from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from notifications.models import Notification
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.generics import (GenericAPIView, ListAPIView,
                                      RetrieveUpdateAPIView)
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from authors.apps.appnotifications.models import UserNotification
-from authors.apps.authentication.models import User
+from authors.apps.appnotifications.models import (NotificationCounter,
+                                                  NotificationGroup,
+                                                  UserNotification)
 
-from .serializers import NotificationSerializer, Subscription
+from authors.utils.notification_handlers import get_opt_out_user_id
+
+from .backends import StreamTokenAuthentication
+from .renderers import EventStreamRenderer
+from .retention import archived_notifications
+from .stream import (get_stream_token, notification_events,
+                     publish_on_commit)
+from .serializers import (ArchivedNotificationSerializer, MarkReadSerializer,
+                          NotificationCursorPaginator,
+                          NotificationSerializer, Subscription)
 
 
 class SubscribeUnsubscribeAPIView(RetrieveUpdateAPIView):
@@ -45,11 +58,19 @@ class UnsubscribeEmailAPIView(GenericAPIView):
 
     def get(self, request, *args, **kwargs):
         token = kwargs['token']
-        token_object = Token.objects.get(key=token)
-        user = token_object.user
-        user = UserNotification.objects.get(user=user)
-        user.email_notifications = False
-        user.save()
+        user_id = get_opt_out_user_id(token)
+        if user_id is None:
+            # links sent before they were signed carry the api token
+            user_id = Token.objects.filter(key=token).values_list(
+                'user_id', flat=True).first()
+        if not UserNotification.objects.filter(user_id=user_id).update(
+                email_notifications=False):
+            return Response(
+                data={
+                    "detail": "Invalid unsubscribe link"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
         resp = {
             "message": "You have unsubscribed from email notifications"
         }
@@ -57,39 +78,74 @@ class UnsubscribeEmailAPIView(GenericAPIView):
 
 
 class NotificationApiView(ListAPIView):
+    """
+    Pages through the user's notifications newest first, without
+    marking them as read
+    """
     serializer_class = NotificationSerializer
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
-        notifications = self.notifications(request)
-        serializer = self.serializer_class(
-            notifications, many=True
+        page_limit = request.GET.get('page_limit', '20')
+        if not page_limit.isdigit() or int(page_limit) < 1:
+            return Response(
+                data={
+                    "detail": "Invalid page limit"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        paginator = NotificationCursorPaginator()
+        paginator.page_size = min(
+            int(page_limit), paginator.max_page_size)
+        notifications = paginator.paginate_queryset(
+            self.notifications(request), request)
+        context = {}
+        if request.GET.get('expand') == 'actors':
+            context['actor_names'] = NotificationGroup.actor_names([
+                notification.group for notification in notifications
+                if getattr(notification, 'group', None) is not None])
+        serializer = self.get_serializer_class()(
+            notifications, many=True, context=context
         )
-        if notifications.count() == 0:
-            resp = {
-                "message": "You have no new notifications",
-                "notifications": serializer.data
-            }
+        if not notifications:
+            message = "You have no new notifications"
         else:
-            resp = {
-                "message": f"You have {notifications.count()} notification(s)",
-                "notifications": serializer.data
-            }
-        return Response(resp)
+            message = f"You have {len(notifications)} notification(s)"
+        return Response({
+            "message": message,
+            "unreadCount": NotificationCounter.unread_count(request.user.pk),
+            "next": paginator.get_next_link(),
+            "notifications": serializer.data
+        })
 
 
 class AllNotificationsAPIview(NotificationApiView):
     """
-    list all user's notifications
+    list all user's notifications, or with ?archived=true those moved
+    to the archive by prune_notifications
     """
 
+    def archived(self):
+        return self.request.GET.get('archived') == 'true'
+
+    def get_serializer_class(self):
+        if self.archived():
+            return ArchivedNotificationSerializer
+        return self.serializer_class
+
     def notifications(self, request):
-        request.user.notifications.mark_all_as_read()
-        return request.user.notifications.active()
+        if self.archived():
+            return archived_notifications(request.user)
+        return request.user.notifications.active().select_related('group')
 
     def delete(self, request, *args, **kwargs):
-        if request.user.notifications.active():
-            request.user.notifications.mark_all_as_deleted()
+        with transaction.atomic():
+            deleted = request.user.notifications.mark_all_as_deleted()
+            NotificationCounter.objects.filter(
+                user_id=request.user.pk
+            ).update(unread=0, version=F('version') + 1)
+            publish_on_commit([request.user.pk])
+        if deleted:
             resp = {
                 'message': 'Notifications deleted successfully'
             }
@@ -105,8 +161,92 @@ class UnreadNotificationsAPIview(NotificationApiView):
     list all user's unread notifications
     """
 
-    def notifications(self, request): 
-        return request.user.notifications.unread()
+    def notifications(self, request):
+        return request.user.notifications.unread().select_related('group')
+
+
+class UnreadCountAPIView(GenericAPIView):
+    """
+    Number of unread notifications of the user, for the unread badge
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "unreadCount": NotificationCounter.unread_count(request.user.pk)
+        })
+
+
+class StreamTokenAPIView(GenericAPIView):
+    """
+    Issues a short-lived token that opens the user's notification stream
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        return Response({
+            "token": get_stream_token(request.user.pk),
+            "expiresIn": settings.NOTIFICATION_STREAM_TOKEN_MAX_AGE
+        })
+
+
+class NotificationStreamAPIView(GenericAPIView):
+    """
+    Streams the user's new notifications and unread count as
+    server-sent events
+    """
+    authentication_classes = (
+        (StreamTokenAuthentication,) +
+        tuple(api_settings.DEFAULT_AUTHENTICATION_CLASSES))
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (JSONRenderer, EventStreamRenderer)
+
+    def get(self, request, *args, **kwargs):
+        last_event_id = request.META.get(
+            'HTTP_LAST_EVENT_ID', request.GET.get('last_event_id'))
+        if last_event_id is not None and not last_event_id.isdigit():
+            return Response(
+                data={
+                    "detail": "Invalid last event id"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = StreamingHttpResponse(
+            notification_events(
+                request.user,
+                int(last_event_id) if last_event_id is not None else None),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # tells nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class MarkReadAPIView(GenericAPIView):
+    """
+    Marks the given notifications, or all up to a high-water mark, as
+    read
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = MarkReadSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        notifications = request.user.notifications.unread()
+        if 'ids' in serializer.validated_data:
+            notifications = notifications.filter(
+                id__in=serializer.validated_data['ids'])
+        else:
+            notifications = notifications.filter(
+                id__lte=serializer.validated_data['up_to'])
+        with transaction.atomic():
+            marked = notifications.update(unread=False)
+            NotificationCounter.record({request.user.pk: -marked})
+        return Response({
+            "message": f"Marked {marked} notification(s) as read",
+            "unreadCount": NotificationCounter.unread_count(request.user.pk)
+        })
 
 
 class DeleteSingleNotificationAPIView(NotificationApiView):
@@ -117,8 +257,11 @@ class DeleteSingleNotificationAPIView(NotificationApiView):
     def delete(self, request, *args, **kwargs):
         try:
             notif = request.user.notifications.active().get(id=kwargs['id'])
-            notif.deleted = True
-            notif.save()
+            with transaction.atomic():
+                notif.deleted = True
+                notif.save()
+                if notif.unread:
+                    NotificationCounter.record({request.user.pk: -1})
             resp = {
                 'message': 'Notification deleted successfully'
             }
@@ -0,0 +1,233 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, prefetch_related_objects
+from django.utils.functional import cached_property
+from vote.models import DOWN, UP, Vote
+
+from authors.apps.profiles.models import Profile
+
+from .models import (Article, Bookmarks, Comment, Favorite,
+                     LikeDislikeComment, RatingModel, RatingStats)
+from .utils import get_comment_trees
+
+
+class ArticleAnnotations:
+    """
+    Loads everything ArticleSerializer needs for a batch of articles
+    in a fixed number of set based queries.
+
+    Tags and author profiles are prefetched onto the article instances
+    up front. The rest (ratings, votes, favorites, bookmarks, comments
+    and follow status) is only loaded the first time a serializer field
+    asks for it, so fields removed from the serializer cost nothing.
+    """
+
+    def __init__(self, articles, user=None, prefetch=True):
+        self.articles = list(articles)
+        self.article_ids = [article.pk for article in self.articles]
+        self.user = None
+        self.user_id = None
+        if user is not None and user.is_authenticated:
+            self.user = user
+            self.user_id = user.pk
+        if prefetch:
+            prefetch_related_objects(
+                self.articles, 'tags', 'author__profile')
+
+    def covers(self, article):
+        """
+        Checks whether an article was loaded in this batch
+        """
+        return article.pk in self.article_ids
+
+    @cached_property
+    def average_ratings(self):
+        """
+        Maps ids of rated articles to their stored average rating
+        """
+        return dict(RatingStats.objects.filter(
+            article_id__in=self.article_ids, count__gt=0
+        ).values_list('article_id', 'average'))
+
+    @cached_property
+    def my_ratings(self):
+        """
+        Maps article ids to the requesting user's rating
+        """
+        if self.user_id is None:
+            return {}
+        return dict(RatingModel.objects.filter(
+            article_id__in=self.article_ids, rated_by_id=self.user_id
+        ).values_list('article_id', 'rate'))
+
+    @cached_property
+    def vote_counts(self):
+        """
+        Maps (article id, action) pairs to the number of votes
+        """
+        content_type = ContentType.objects.get_for_model(Article)
+        rows = Vote.objects.filter(
+            content_type=content_type, object_id__in=self.article_ids
+        ).values('object_id', 'action').annotate(count=Count('id'))
+        return {
+            (row['object_id'], row['action']): row['count'] for row in rows
+        }
+
+    @cached_property
+    def my_votes(self):
+        """
+        Set of (article id, action) pairs voted by the requesting user
+        """
+        if self.user_id is None:
+            return set()
+        content_type = ContentType.objects.get_for_model(Article)
+        return set(Vote.objects.filter(
+            content_type=content_type, object_id__in=self.article_ids,
+            user_id=self.user_id
+        ).values_list('object_id', 'action'))
+
+    @cached_property
+    def favorited(self):
+        """
+        Ids of the articles the requesting user has favorited
+        """
+        if self.user_id is None:
+            return set()
+        return set(Favorite.objects.filter(
+            article_id__in=self.article_ids, user_id=self.user_id
+        ).values_list('article_id', flat=True))
+
+    @cached_property
+    def bookmarked(self):
+        """
+        Ids of the articles the requesting user has bookmarked
+        """
+        if self.user_id is None:
+            return set()
+        return set(Bookmarks.objects.filter(
+            article_id__in=self.article_ids, user_id=self.user_id
+        ).values_list('article_id', flat=True))
+
+    @cached_property
+    def followed_authors(self):
+        """
+        User ids of the authors the requesting user follows
+        """
+        if self.user_id is None:
+            return set()
+        author_ids = {article.author_id for article in self.articles}
+        return set(Profile.following.through.objects.filter(
+            from_profile__user_id=self.user_id,
+            to_profile__user_id__in=author_ids
+        ).values_list('to_profile__user_id', flat=True))
+
+    @cached_property
+    def comment_trees(self):
+        """
+        Maps article ids to the nested representation of their comments
+        """
+        return get_comment_trees(
+            Comment.objects.filter(article_id__in=self.article_ids),
+            self.user)
+
+    def author_details(self, article):
+        """
+        Author's profile as rendered on an article
+        """
+        profile = article.author.profile
+        return {
+            "username": article.author.username,
+            "bio": profile.bio,
+            "image": profile.fetch_image,
+            "following": article.author_id in self.followed_authors
+        }
+
+    def ratings(self, article):
+        """
+        Average rating of an article and the requesting user's own rating
+        """
+        if article.pk not in self.average_ratings:
+            return {
+                "average_ratings": 0
+            }
+        average = float('%.1f' % self.average_ratings[article.pk])
+        if article.pk in self.my_ratings:
+            return {
+                "my_ratings": self.my_ratings[article.pk],
+                "average_ratings": average
+            }
+        return {
+            "average_ratings": average
+        }
+
+    def like_info(self, article):
+        """
+        Vote counts of an article and the requesting user's own votes
+        """
+        return {
+            "like": (article.pk, UP) in self.my_votes,
+            "dislike": (article.pk, DOWN) in self.my_votes,
+            "likeCount": self.vote_counts.get((article.pk, UP), 0),
+            "dislikeCount": self.vote_counts.get((article.pk, DOWN), 0)
+        }
+
+    def overlay(self, representation, article):
+        """
+        Fills the requesting user's own likes, favorite, bookmark, rating
+        and follow status into a representation of an article rendered
+        for an anonymous user
+        """
+        if self.user_id is None:
+            return representation
+        if 'like_info' in representation:
+            representation['like_info'].update(
+                like=(article.pk, UP) in self.my_votes,
+                dislike=(article.pk, DOWN) in self.my_votes)
+        if 'favorites' in representation:
+            representation['favorites']['favorite'] = self.is_favorited(
+                article)
+        if 'bookmarked' in representation:
+            representation['bookmarked'] = self.is_bookmarked(article)
+        if 'ratings' in representation and article.pk in self.my_ratings:
+            representation['ratings'] = {
+                "my_ratings": self.my_ratings[article.pk],
+                "average_ratings": representation['ratings'][
+                    'average_ratings']
+            }
+
+        comments = []
+        for parent in representation.get('comments', []):
+            comments.append(parent)
+            comments.extend(parent.get('replies', []))
+        authors = [representation['author']] if 'author' in representation \
+            else []
+        authors.extend(comment['author'] for comment in comments)
+        followed = set(Profile.following.through.objects.filter(
+            from_profile__user_id=self.user_id,
+            to_profile__user__username__in={
+                author['username'] for author in authors}
+        ).values_list('to_profile__user__username', flat=True))
+        for author in authors:
+            author['following'] = author['username'] in followed
+
+        if comments:
+            reactions = {
+                comment_id: (like, dislike)
+                for comment_id, like, dislike in
+                LikeDislikeComment.objects.filter(
+                    user_id=self.user_id,
+                    comment_id__in=[comment['id'] for comment in comments]
+                ).values_list('comment_id', 'like', 'dislike')
+            }
+            for comment in comments:
+                like, dislike = reactions.get(comment['id'], (False, False))
+                comment['likesInfo'].update(like=like, dislike=dislike)
+        return representation
+
+    def comments(self, article):
+        return self.comment_trees.get(article.pk, [])
+
+    def is_favorited(self, article):
+        return article.pk in self.favorited
+
+    def is_bookmarked(self, article):
+        return article.pk in self.bookmarked
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+TAG_DIRECTORY_KEY = 'tag-directory'
+
+
+def version_key(article_id):
+    return 'article-version:{}'.format(article_id)
+
+
+def fragment_key(slug, version):
+    return 'article-fragment:{}:{}'.format(slug, version)
+
+
+def get_article_version(article_id):
+    """
+    Gets the current version of an article's cached representation,
+    starting a new one if there is none
+    """
+    version = cache.get(version_key(article_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key(article_id), version, None):
+            version = cache.get(version_key(article_id), version)
+    return version
+
+
+def bump_article_versions(*article_ids):
+    """
+    Moves articles to a new version so that their cached
+    representations are no longer used. Inside a transaction they are
+    moved again once it commits, as readers may cache the rows from
+    before the commit under the first new version.
+    """
+    def bump():
+        cache.set_many({
+            version_key(article_id): uuid.uuid4().hex
+            for article_id in article_ids
+        }, None)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def views_key(article_id):
+    return 'article-views:{}'.format(article_id)
+
+
+def count_article_view(article_id):
+    """
+    Counts a view of an article in the cache, where views wait to be
+    added to the trending scores (see TrendingScore.fold_views)
+    """
+    key = views_key(article_id)
+    if cache.add(key, 1, settings.TRENDING_HALF_LIFE):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # expired in between
+        cache.add(key, 1, settings.TRENDING_HALF_LIFE)
+
+
+def take_article_views(article_ids):
+    """
+    Takes the views counted for articles out of the cache, leaving
+    those counted meanwhile. Returns the views of each viewed article.
+    """
+    taken = {}
+    for key, views in cache.get_many(
+            [views_key(article_id) for article_id in article_ids]).items():
+        if not views:
+            continue
+        try:
+            cache.decr(key, views)
+        except ValueError:
+            continue
+        taken[int(key.rsplit(':', 1)[1])] = views
+    return taken
+
+
+def get_article_fragment(slug, version):
+    return cache.get(fragment_key(slug, version))
+
+
+def set_article_fragment(slug, version, representation):
+    cache.set(fragment_key(slug, version), representation,
+              settings.ARTICLE_CACHE_TTL)
+
+
+def get_tag_directory():
+    """
+    Gets the snapshot of the tags in use with their article counts,
+    ordered by popularity and by name, building it if it is not cached
+    """
+    from .models import TagStats
+
+    directory = cache.get(TAG_DIRECTORY_KEY)
+    if directory is None:
+        popular = [
+            [name, count] for name, count in TagStats.objects.filter(
+                articles_count__gt=0
+            ).order_by('-articles_count', 'tag__tag_name').values_list(
+                'tag__tag_name', 'articles_count')
+        ]
+        by_name = sorted(popular, key=lambda tag: (tag[0].lower(), tag[0]))
+        directory = {
+            'popular': popular,
+            'by_name': by_name,
+            'keys': [name.lower() for name, count in by_name],
+            'etag': hashlib.md5(
+                json.dumps(popular).encode('utf-8')).hexdigest(),
+            'modified': int(time.time()),
+        }
+        cache.set(TAG_DIRECTORY_KEY, directory,
+                  settings.TAG_DIRECTORY_CACHE_TTL)
+    return directory
+
+
+def expire_tag_directory():
+    cache.delete(TAG_DIRECTORY_KEY)
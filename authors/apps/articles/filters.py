@@ -1,7 +1,8 @@
+from django.db.models import F, Sum
 from django_filters import rest_framework as filters
 # from rest_framework.generics import ListAPIView
 from .serializers import ArticleSerializer
-from authors.apps.articles.models import Article
+from authors.apps.articles.models import Article, Tag, TagStats
 from rest_framework.response import Response
 from rest_framework import status
 # from rest_framework.filters import SearchFilter
@@ -13,7 +14,9 @@ class ArticleFilter(filters.FilterSet):
         filter-params:
         - author
         - title
-        - Tags
+        - tags (articles with any of the tags)
+        - tags_all (articles with all of the tags)
+        - ordering (rating or -rating)
     returns article depending on the supplied param
     """
     author = filters.CharFilter(field_name='author__username',
@@ -21,17 +24,62 @@ class ArticleFilter(filters.FilterSet):
                                 )
     title = filters.CharFilter(field_name='title', lookup_expr='icontains')
 
-    tags = filters.CharFilter(field_name='tags',
-                              method='get_tags',
-                              lookup_expr='iexact'
-                              )
+    tags = filters.CharFilter(method='get_tags')
+    tags_all = filters.CharFilter(method='get_all_tags')
+    ordering = filters.CharFilter(method='get_ordering')
 
     class Meta:
         model = Article
-        fields = ['author', 'title', 'tags']
+        fields = ['author', 'title', 'tags', 'tags_all', 'ordering']
 
-    def get_tags(self, queryset, tags, value):
-        # remove all spaces and create a list by spliting where there
-        # # is a comma
-        valueList = value.replace(" ", "").split(',')
-        return queryset.filter(tags__tag_name__in=valueList).distinct()
+    @staticmethod
+    def split_tags(value):
+        """
+        Creates a list of tag names from a comma separated value,
+        normalized the way they are stored
+        """
+        names = (Tag.normalize(name) for name in value.split(','))
+        return [name for name in names if name]
+
+    def get_tags(self, queryset, name, value):
+        """
+        Keeps articles that have any of the tags, using the indexed
+        tag names array so no join or DISTINCT is needed
+        """
+        return queryset.filter(tag_names__overlap=self.split_tags(value))
+
+    def get_all_tags(self, queryset, name, value):
+        """
+        Keeps articles that have all of the tags
+        """
+        return queryset.filter(tag_names__contains=self.split_tags(value))
+
+    @classmethod
+    def get_stored_count(cls, params):
+        """
+        Reads the number of articles of a list filtered by a single tag
+        and nothing else from the tag's stats instead of counting them.
+        Returns None for any other list.
+        """
+        filtered = [name for name in cls.base_filters
+                    if name != 'ordering' and params.get(name)]
+        if filtered not in (['tags'], ['tags_all']):
+            return None
+        names = cls.split_tags(params[filtered[0]])
+        if len(names) != 1:
+            return None
+        return TagStats.objects.filter(tag__tag_name=names[0]).aggregate(
+            count=Sum('articles_count'))['count'] or 0
+
+    def get_ordering(self, queryset, name, value):
+        """
+        Orders articles by their stored average rating, lowest first for
+        `rating` and highest first for `-rating`. Unrated articles come
+        last either way. Cursor pages are always ordered by creation.
+        """
+        average = F('rating_stats__average')
+        if value == 'rating':
+            return queryset.order_by(average.asc(nulls_last=True), 'id')
+        if value == '-rating':
+            return queryset.order_by(average.desc(nulls_last=True), 'id')
+        return queryset
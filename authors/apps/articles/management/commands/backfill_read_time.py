@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from authors.apps.articles.cache import bump_article_versions
+from authors.apps.articles.models import Article
+from authors.utils.article_timer import ArticleTimer, count_words
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored word counts and read time of all articles
+    """
+    help = 'Recomputes the stored word counts and read time of articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of articles loaded and updated per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        articles = Article.objects.only(
+            'id', 'title', 'body', 'description', 'image').order_by('id')
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(articles.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            tag_names = {}
+            tag_rows = Article.tags.through.objects.filter(
+                article_id__in=[article.id for article in batch]
+            ).values_list('article_id', 'tag__tag_name')
+            for article_id, tag_name in tag_rows:
+                tag_names.setdefault(article_id, []).append(tag_name)
+            for article in batch:
+                timer = ArticleTimer(article)
+                article.word_count = timer.count_text_words()
+                article.tag_word_count = count_words(
+                    *tag_names.get(article.id, []))
+                article.read_time = timer.get_read_time()
+            Article.objects.bulk_update(
+                batch, ['word_count', 'tag_word_count', 'read_time'])
+            bump_article_versions(*[article.id for article in batch])
+            updated += len(batch)
+        self.stdout.write('Updated the read time of {} article(s)'.format(
+            updated))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authors.apps.articles.models import TimelineEntry
+from authors.apps.profiles.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Adds the latest articles of the authors each user follows to their
+    home timeline, for the follows made before timelines were pushed
+    """
+    help = 'Backfills the home timelines of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of followers backfilled per transaction')
+        parser.add_argument(
+            '--user', help='Only backfill the timeline of this username')
+
+    def handle(self, *args, **options):
+        followers = Profile.following.through.objects.order_by(
+            'from_profile_id').values_list(
+                'from_profile_id', flat=True).distinct()
+        if options['user']:
+            followers = followers.filter(
+                from_profile__user__username=options['user'])
+
+        last_id = 0
+        added = 0
+        while True:
+            batch = list(followers.filter(
+                from_profile_id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1]
+            with transaction.atomic():
+                added += TimelineEntry.backfill(batch)
+        self.stdout.write(
+            'Added {} timeline entry(ies)'.format(added))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from authors.apps.articles.models import Article
+from authors.apps.articles.search import load_search_backend
+
+BACKENDS = (
+    ('postgres', 'authors.apps.articles.search.postgres.'
+                 'PostgresSearchBackend'),
+    ('inverted index', 'authors.apps.articles.search.memory.'
+                       'InvertedIndexBackend'),
+)
+
+
+class Command(BaseCommand):
+    """
+    Times the search backends against icontains filtering
+    """
+    help = ('Times a first page of article search results with each '
+            'search backend and with icontains filtering')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries', nargs='+', help='Search queries to time')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of times each query is run')
+        parser.add_argument(
+            '--page-size', type=int, default=10,
+            help='Number of results fetched per query')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Rebuild the backends\' indexes before timing')
+
+    def icontains(self, query, queryset):
+        condition = Q()
+        for term in query.split():
+            condition |= Q(title__icontains=term) | Q(
+                description__icontains=term) | Q(body__icontains=term)
+        return queryset.filter(condition)
+
+    def time(self, search, query, repeat, page_size):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = search(query, Article.objects.all())
+            list(results[:page_size])
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        searches = [('icontains', self.icontains)]
+        for name, path in BACKENDS:
+            backend = load_search_backend(path)
+            if options['rebuild']:
+                backend.rebuild()
+            searches.append((name, backend.search))
+
+        self.stdout.write('{} articles, {} runs per query'.format(
+            Article.objects.count(), options['repeat']))
+        self.stdout.write('{:<24}'.format('query') + ''.join(
+            '{:>18}'.format(name) for name, search in searches))
+        for query in options['queries']:
+            timings = [
+                self.time(search, query, options['repeat'],
+                          options['page_size'])
+                for name, search in searches
+            ]
+            self.stdout.write('{:<24}'.format(query[:23]) + ''.join(
+                '{:>15.2f} ms'.format(timing) for timing in timings))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+
+from authors.apps.articles.models import Article, Tag, TagStats
+
+
+class Command(BaseCommand):
+    """
+    Deletes tags that are no longer on any article
+    """
+    help = 'Deletes tags that are no longer on any article'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of tags deleted per transaction')
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        # tags being added to an article are locked by Tag.lock_ids and
+        # skipped here, so a tag is never deleted while it is reused
+        sql = (
+            'WITH orphans AS ('
+            'SELECT id FROM {tags} WHERE NOT EXISTS ('
+            'SELECT 1 FROM {article_tags} '
+            'WHERE {article_tags}.tag_id = {tags}.id) '
+            'ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED), '
+            'stats AS (DELETE FROM {stats} '
+            'WHERE tag_id IN (SELECT id FROM orphans)) '
+            'DELETE FROM {tags} WHERE id IN (SELECT id FROM orphans)'
+        ).format(
+            tags=quote(Tag._meta.db_table),
+            article_tags=quote(Article.tags.through._meta.db_table),
+            stats=quote(TagStats._meta.db_table))
+
+        deleted = 0
+        while True:
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql, [options['batch_size']])
+                    count = cursor.rowcount
+            except IntegrityError:
+                # a tag was linked to an article after this batch read
+                # the article tags; it is no orphan and the next run
+                # will see so
+                break
+            deleted += count
+            if count < options['batch_size']:
+                break
+        self.stdout.write('Deleted {} orphan tag(s)'.format(deleted))
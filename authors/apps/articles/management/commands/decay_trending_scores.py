@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authors.apps.articles.models import TrendingScore
+
+
+class Command(BaseCommand):
+    """
+    Adds the article views counted since the last run to the trending
+    scores, then decays all scores to the present and deletes the
+    scores that have decayed below TRENDING_MIN_SCORE
+    """
+    help = 'Decays the trending scores of articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of scores decayed per transaction')
+
+    def handle(self, *args, **options):
+        views = TrendingScore.fold_views(options['batch_size'])
+        self.stdout.write('Added {} article view(s)'.format(views))
+
+        table = connection.ops.quote_name(TrendingScore._meta.db_table)
+        decay = (
+            'WITH batch AS (SELECT article_id FROM {table} '
+            'WHERE article_id > %s ORDER BY article_id LIMIT %s FOR UPDATE) '
+            'UPDATE {table} SET score = {decayed}, decayed_at = now() '
+            'FROM batch WHERE {table}.article_id = batch.article_id '
+            'RETURNING {table}.article_id, {table}.score'
+        ).format(table=table,
+                 decayed=TrendingScore.DECAYED_SCORE.format(table=table))
+        drop = 'DELETE FROM {table} WHERE article_id = ANY(%s)'.format(
+            table=table)
+
+        last_id = 0
+        decayed = dropped = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(decay, [
+                    last_id, options['batch_size'],
+                    TrendingScore.decay_rate()])
+                rows = cursor.fetchall()
+                faded = [article_id for article_id, score in rows
+                         if score < settings.TRENDING_MIN_SCORE]
+                if faded:
+                    cursor.execute(drop, [faded])
+            if not rows:
+                break
+            last_id = max(article_id for article_id, score in rows)
+            decayed += len(rows)
+            dropped += len(faded)
+        self.stdout.write(
+            'Decayed {} trending score(s), dropped {}'.format(
+                decayed, dropped))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from authors.apps.articles.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the article search index of the configured backend
+    """
+    help = 'Rebuilds the article search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of articles indexed per batch')
+
+    def handle(self, *args, **options):
+        count = get_search_backend().rebuild(options['batch_size'])
+        self.stdout.write('Indexed {} article(s)'.format(count))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from authors.apps.articles.cache import bump_article_versions
+from authors.apps.articles.models import RatingModel, RatingStats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the rating stats of all articles from their ratings
+    """
+    help = 'Recomputes the stored rating stats of articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of stats rows written per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        star_counts = {
+            field: Count('id', filter=Q(rate=star))
+            for star, field in RatingStats.STAR_FIELDS.items()
+        }
+        rows = RatingModel.objects.order_by().values('article_id').annotate(
+            count=Count('id'), total=Sum('rate'), **star_counts)
+        fields = ['count', 'total', 'average'] + list(
+            RatingStats.STAR_FIELDS.values())
+
+        with transaction.atomic():
+            existing = set(RatingStats.objects.select_for_update(
+            ).values_list('article_id', flat=True))
+            created, updated = [], []
+            for row in rows:
+                stats = RatingStats(
+                    average=row['total'] / row['count'], **row)
+                if stats.article_id in existing:
+                    updated.append(stats)
+                else:
+                    created.append(stats)
+            rated = {stats.article_id for stats in created + updated}
+            RatingStats.objects.bulk_create(created, batch_size=batch_size)
+            RatingStats.objects.bulk_update(
+                updated, fields, batch_size=batch_size)
+            emptied = RatingStats.objects.filter(
+                article_id__in=existing - rated
+            ).update(**{field: 0 for field in fields})
+        bump_article_versions(*existing.union(rated))
+
+        self.stdout.write(
+            'Reconciled the rating stats of {} article(s), reset {}'.format(
+                len(rated), emptied))
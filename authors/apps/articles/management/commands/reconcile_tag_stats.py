@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authors.apps.articles.models import Article, TagStats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored tag names of articles and the article counts
+    of tags from the article tags table
+    """
+    help = 'Recomputes the stored tag names of articles and tag counts'
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        tables = {
+            'articles': quote(Article._meta.db_table),
+            'article_tags': quote(Article.tags.through._meta.db_table),
+            'tags': quote(Article.tags.field.related_model._meta.db_table),
+            'stats': quote(TagStats._meta.db_table),
+        }
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE {articles} SET tag_names = names.tag_names '
+                'FROM (SELECT {articles}.id, ARRAY('
+                'SELECT {tags}.tag_name FROM {article_tags} '
+                'JOIN {tags} ON {tags}.id = {article_tags}.tag_id '
+                'WHERE {article_tags}.article_id = {articles}.id '
+                'ORDER BY {tags}.tag_name) AS tag_names FROM {articles}'
+                ') AS names WHERE names.id = {articles}.id '
+                'AND names.tag_names <> {articles}.tag_names'.format(**tables))
+            articles = cursor.rowcount
+            cursor.execute(
+                'INSERT INTO {stats} (tag_id, articles_count) '
+                'SELECT {tags}.id, count({article_tags}.id) FROM {tags} '
+                'LEFT JOIN {article_tags} '
+                'ON {article_tags}.tag_id = {tags}.id GROUP BY {tags}.id '
+                'ON CONFLICT (tag_id) DO UPDATE '
+                'SET articles_count = EXCLUDED.articles_count '
+                'WHERE {stats}.articles_count <> EXCLUDED.articles_count'
+                .format(**tables))
+            tags = cursor.rowcount
+        self.stdout.write(
+            'Fixed the tag names of {} article(s) and the counts of {} '
+            'tag(s)'.format(articles, tags))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0002_auto_20190518_1442'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['created_at', 'id'], name='articles_ar_created_707b24_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_auto_20261018_1230'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='read_time',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2 on 2026-10-18 12:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rating_stats(apps, schema_editor):
+    RatingModel = apps.get_model('articles', 'RatingModel')
+    RatingStats = apps.get_model('articles', 'RatingStats')
+    stars = ['one_star', 'two_stars', 'three_stars', 'four_stars',
+             'five_stars']
+    stats = {}
+    for article_id, rate in RatingModel.objects.values_list(
+            'article_id', 'rate').iterator():
+        row = stats.setdefault(article_id, RatingStats(article_id=article_id))
+        row.count += 1
+        row.total += rate
+        if 1 <= rate <= 5:
+            setattr(row, stars[rate - 1], getattr(row, stars[rate - 1]) + 1)
+    for row in stats.values():
+        row.average = row.total / row.count
+    RatingStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_auto_20261018_1232'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingStats',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='articles.Article')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('one_star', models.PositiveIntegerField(default=0)),
+                ('two_stars', models.PositiveIntegerField(default=0)),
+                ('three_stars', models.PositiveIntegerField(default=0)),
+                ('four_stars', models.PositiveIntegerField(default=0)),
+                ('five_stars', models.PositiveIntegerField(default=0)),
+                ('average', models.FloatField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2 on 2026-10-18 12:37
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_favorites(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    Favorite = apps.get_model('articles', 'Favorite')
+    keep = Favorite.objects.values('user_id', 'article_id').annotate(
+        first=Min('id')).values('first')
+    Favorite.objects.exclude(id__in=Subquery(keep)).delete()
+    counts = Favorite.objects.filter(
+        article_id=OuterRef('pk')
+    ).order_by().values('article_id').annotate(
+        count=Count('id')).values('count')
+    Article.objects.update(favoritesCount=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0005_ratingstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_favorites, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'article'), name='unique_user_favorite'),
+        ),
+    ]
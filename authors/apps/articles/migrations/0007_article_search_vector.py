@@ -0,0 +1,55 @@
+# Generated by Django 2.2 on 2026-10-18 12:50
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import OuterRef, Subquery, TextField, Value
+    from django.db.models.functions import Coalesce
+
+    Article = apps.get_model('articles', 'Article')
+    tag_names = Article.tags.through.objects.filter(
+        article_id=OuterRef('pk')
+    ).order_by().values('article_id').annotate(
+        names=StringAgg('tag__tag_name', ' ')).values('names')
+    Article.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector(
+            Coalesce(Subquery(tag_names, output_field=TextField()),
+                     Value('')),
+            weight='B', config='english') +
+        SearchVector('description', weight='C', config='english') +
+        SearchVector('body', weight='D', config='english')
+    ))
+    schema_editor.execute(
+        'CREATE INDEX articles_article_search_vector_idx '
+        'ON articles_article USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS articles_article_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_auto_20261018_1237'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # fills in the vectors of the existing articles before building
+        # their GIN index
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
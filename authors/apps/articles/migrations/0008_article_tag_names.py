@@ -0,0 +1,45 @@
+# Generated by Django 2.2 on 2026-10-18 12:56
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_tag_names(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE articles_article SET tag_names = ARRAY('
+        'SELECT articles_tag.tag_name FROM articles_article_tags '
+        'JOIN articles_tag ON articles_tag.id = articles_article_tags.tag_id '
+        'WHERE articles_article_tags.article_id = articles_article.id '
+        'ORDER BY articles_tag.tag_name)')
+    schema_editor.execute(
+        'INSERT INTO articles_tagstats (tag_id, articles_count) '
+        'SELECT tag_id, count(*) FROM articles_article_tags GROUP BY tag_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_article_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='articles.Tag')),
+                ('articles_count', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_names',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_names'], name='article_tag_names_gin'),
+        ),
+        migrations.RunPython(populate_tag_names, migrations.RunPython.noop),
+    ]
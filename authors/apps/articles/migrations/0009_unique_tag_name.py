@@ -0,0 +1,74 @@
+# Generated by Django 2.2 on 2026-10-18 12:58
+
+from collections import OrderedDict
+
+from django.db import migrations, models
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """
+    Normalizes tag names and merges the tags whose names are then the
+    same into the oldest of them, before the names are made unique
+    """
+    Tag = apps.get_model('articles', 'Tag')
+    groups = OrderedDict()
+    for tag_id, name in Tag.objects.order_by('id').values_list(
+            'id', 'tag_name'):
+        groups.setdefault(' '.join(name.split()), []).append((tag_id, name))
+
+    with schema_editor.connection.cursor() as cursor:
+        # the table is altered next, which cannot be done with
+        # deferred foreign key checks still pending
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for name, tags in groups.items():
+            (keep, kept_name), duplicates = tags[0], [
+                tag_id for tag_id, _ in tags[1:]]
+            if duplicates:
+                cursor.execute(
+                    'INSERT INTO articles_article_tags (article_id, tag_id) '
+                    'SELECT DISTINCT article_id, %s '
+                    'FROM articles_article_tags WHERE tag_id = ANY(%s) '
+                    'ON CONFLICT DO NOTHING',
+                    [keep, duplicates])
+                cursor.execute(
+                    'DELETE FROM articles_article_tags WHERE tag_id = ANY(%s)',
+                    [duplicates])
+                cursor.execute(
+                    'DELETE FROM articles_tagstats WHERE tag_id = ANY(%s)',
+                    [duplicates])
+                cursor.execute(
+                    'DELETE FROM articles_tag WHERE id = ANY(%s)',
+                    [duplicates])
+            if name != kept_name:
+                cursor.execute(
+                    'UPDATE articles_tag SET tag_name = %s WHERE id = %s',
+                    [name, keep])
+
+        cursor.execute(
+            'UPDATE articles_article SET tag_names = ARRAY('
+            'SELECT articles_tag.tag_name FROM articles_article_tags '
+            'JOIN articles_tag '
+            'ON articles_tag.id = articles_article_tags.tag_id '
+            'WHERE articles_article_tags.article_id = articles_article.id '
+            'ORDER BY articles_tag.tag_name)')
+        cursor.execute(
+            'INSERT INTO articles_tagstats (tag_id, articles_count) '
+            'SELECT tag_id, count(*) FROM articles_article_tags '
+            'GROUP BY tag_id ON CONFLICT (tag_id) DO UPDATE '
+            'SET articles_count = EXCLUDED.articles_count')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0008_article_tag_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='tag_name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2 on 2026-10-18 13:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0009_unique_tag_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='articles.Article')),
+                ('score', models.FloatField(default=0)),
+                ('decayed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score', '-article'], name='trending_score_idx'),
+        ),
+    ]
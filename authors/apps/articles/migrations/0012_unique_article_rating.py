@@ -0,0 +1,61 @@
+# Generated by Django 2.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ratings(apps, schema_editor):
+    """
+    Keeps only the latest rating of each user for an article, before
+    ratings are made unique, and recomputes the rating stats of the
+    articles that had duplicates
+    """
+    with schema_editor.connection.cursor() as cursor:
+        # the constraint is added next, which cannot be done with
+        # deferred foreign key checks still pending
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            'DELETE FROM articles_ratingmodel '
+            'USING articles_ratingmodel newer '
+            'WHERE newer.article_id = articles_ratingmodel.article_id '
+            'AND newer.rated_by_id = articles_ratingmodel.rated_by_id '
+            'AND newer.id > articles_ratingmodel.id '
+            'RETURNING articles_ratingmodel.article_id')
+        article_ids = list({article_id for article_id, in cursor.fetchall()})
+        if not article_ids:
+            return
+        cursor.execute(
+            'INSERT INTO articles_ratingstats (article_id, count, total, '
+            'one_star, two_stars, three_stars, four_stars, five_stars, '
+            'average) '
+            'SELECT article_id, count(*), sum(rate), '
+            'count(*) FILTER (WHERE rate = 1), '
+            'count(*) FILTER (WHERE rate = 2), '
+            'count(*) FILTER (WHERE rate = 3), '
+            'count(*) FILTER (WHERE rate = 4), '
+            'count(*) FILTER (WHERE rate = 5), '
+            'sum(rate)::float / count(*) '
+            'FROM articles_ratingmodel WHERE article_id = ANY(%s) '
+            'GROUP BY article_id '
+            'ON CONFLICT (article_id) DO UPDATE SET '
+            'count = EXCLUDED.count, total = EXCLUDED.total, '
+            'one_star = EXCLUDED.one_star, two_stars = EXCLUDED.two_stars, '
+            'three_stars = EXCLUDED.three_stars, '
+            'four_stars = EXCLUDED.four_stars, '
+            'five_stars = EXCLUDED.five_stars, average = EXCLUDED.average',
+            [article_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0011_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ratingmodel',
+            constraint=models.UniqueConstraint(fields=('article', 'rated_by'), name='unique_article_rating'),
+        ),
+    ]
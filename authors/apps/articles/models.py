@@ -1,15 +1,30 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from autoslug import AutoSlugField
 from cloudinary.models import CloudinaryField
 from cloudinary import CloudinaryImage
-from vote.models import VoteModel
+from vote.models import UP, Vote, VoteModel
+from authors.apps.profiles.cache import expire_profiles
 from authors.apps.profiles.models import Profile
 import json
-from django.db.models.signals import post_save
+import math
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
 from django.dispatch import receiver
+from .cache import (bump_article_versions, expire_tag_directory,
+                    take_article_views)
+from .search import get_search_backend
 from .utils import get_comments
-from authors.utils.article_timer import ArticleTimer
+from authors.utils.article_timer import ArticleTimer, count_words
 
 
 User = get_user_model()
@@ -19,7 +34,7 @@ class Tag(models.Model):
     """
     Model for for tags
     """
-    tag_name = models.CharField(max_length=100)
+    tag_name = models.CharField(max_length=100, unique=True)
 
     class Meta:
         ordering = ('tag_name',)
@@ -27,6 +42,44 @@ class Tag(models.Model):
     def __str__(self):
         return self.tag_name
 
+    @staticmethod
+    def normalize(name):
+        """
+        Trims a tag name and collapses the whitespace inside it
+        """
+        return ' '.join(name.split())
+
+    @classmethod
+    def lock_ids(cls, names):
+        """
+        Maps the names of existing tags to their ids. The tags stay
+        locked against orphan collection until the transaction ends.
+        """
+        tags = cls.objects.raw(
+            'SELECT id, tag_name FROM {} WHERE tag_name = ANY(%s) '
+            'FOR KEY SHARE'.format(
+                connection.ops.quote_name(cls._meta.db_table)),
+            [names])
+        return {tag.tag_name: tag.pk for tag in tags}
+
+    @classmethod
+    def get_ids(cls, names):
+        """
+        Gets the ids of the tags with the given names, in order, with
+        one lookup and one bulk insert of the missing tags. Must run
+        in a transaction.
+        """
+        names = list(OrderedDict.fromkeys(
+            name for name in map(cls.normalize, names) if name))
+        ids = cls.lock_ids(names)
+        missing = [name for name in names if name not in ids]
+        if missing:
+            cls.objects.bulk_create(
+                [cls(tag_name=name) for name in missing],
+                ignore_conflicts=True)
+            ids.update(cls.lock_ids(missing))
+        return [ids[name] for name in names]
+
     @property
     def articles(self):
         """
@@ -36,6 +89,45 @@ class Tag(models.Model):
         return queryset
 
 
+class TagStats(models.Model):
+    """
+    Number of articles carrying a tag, kept up to date as tags are
+    added to and removed from articles
+    """
+    tag = models.OneToOneField(
+        Tag, primary_key=True, related_name='stats',
+        on_delete=models.CASCADE)
+    articles_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    @classmethod
+    def record(cls, changes):
+        """
+        Applies changes in article counts, given as {tag id: change},
+        to the stats of the tags in one statement. Stats of tags that
+        have none yet are created.
+        """
+        changes = {tag_id: change for tag_id, change in changes.items()
+                   if change}
+        if not changes:
+            return
+        sql = (
+            'WITH changes (tag_id, change) AS ('
+            'SELECT * FROM unnest(%s::integer[], %s::integer[])), '
+            'updated AS ('
+            'UPDATE {stats} SET articles_count = GREATEST('
+            '{stats}.articles_count + changes.change, 0) FROM changes '
+            'WHERE {stats}.tag_id = changes.tag_id RETURNING {stats}.tag_id) '
+            'INSERT INTO {stats} (tag_id, articles_count) '
+            'SELECT tag_id, change FROM changes WHERE change > 0 '
+            'AND tag_id NOT IN (SELECT tag_id FROM updated) '
+            'ON CONFLICT (tag_id) DO UPDATE SET articles_count = '
+            '{stats}.articles_count + EXCLUDED.articles_count'
+        ).format(stats=connection.ops.quote_name(cls._meta.db_table))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [list(changes), list(changes.values())])
+        expire_tag_directory()
+
+
 class Article(VoteModel, models.Model):
     """
     Model for articles
@@ -54,9 +146,71 @@ class Article(VoteModel, models.Model):
     favoritesCount = models.PositiveSmallIntegerField(default=0)
     image = CloudinaryField('image')
     bookmarked = models.BooleanField(default=False)
+    word_count = models.PositiveIntegerField(default=0)
+    tag_word_count = models.PositiveIntegerField(default=0)
+    read_time = models.CharField(max_length=30, blank=True)
+    # names of the article's tags, kept in step with `tags` so that tag
+    # filters are an indexed array lookup instead of a join
+    tag_names = ArrayField(
+        models.CharField(max_length=100), default=list, blank=True,
+        editable=False)
+    # maintained by the Postgres search backend, see search/postgres.py
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['created_at', ]
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            GinIndex(fields=['tag_names'], name='article_tag_names_gin'),
+            models.Index(fields=['author', '-created_at', '-id'],
+                         name='article_author_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Article, cls).from_db(db, field_names, values)
+        instance._read_time_source = instance.read_time_source()
+        return instance
+
+    def read_time_source(self):
+        """
+        The loaded fields the read time is computed from
+        """
+        return tuple(
+            str(self.__dict__.get(field) or '')
+            for field in ('title', 'body', 'description', 'image')
+        )
+
+    # columns written by their own single statement updates, which a
+    # save of values read earlier must not overwrite
+    SEPARATELY_UPDATED_FIELDS = {
+        'favoritesCount', 'tag_names', 'tag_word_count', 'search_vector'}
+
+    def save(self, *args, **kwargs):
+        """
+        Recomputes the read time when the text or image has changed.
+        `content_changed` tells post_save receivers whether it had.
+        Saves of existing articles leave out SEPARATELY_UPDATED_FIELDS
+        unless they are named in `update_fields`.
+        """
+        if (not self._state.adding and not kwargs.get('force_insert') and
+                kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name not in self.SEPARATELY_UPDATED_FIELDS]
+        self.content_changed = self.read_time_source() != getattr(
+            self, '_read_time_source', None)
+        if self.content_changed:
+            timer = ArticleTimer(self)
+            self.word_count = timer.count_text_words()
+            self.read_time = timer.get_read_time()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'word_count', 'read_time'}
+        super(Article, self).save(*args, **kwargs)
+        self._read_time_source = self.read_time_source()
 
     def get_image(self):
         """
@@ -80,13 +234,12 @@ class Article(VoteModel, models.Model):
         }
 
     def average_ratings(self, id):
-        import math
-        user_ratings = RatingModel.objects.filter(article__pk=id)
-        average = 0
-        if user_ratings:
-            total = sum([rating.rate for rating in user_ratings])
-            average = total/user_ratings.count()
-        return float('%.1f' % (average))
+        """
+        Reads the stored average rating of an article
+        """
+        average = RatingStats.objects.filter(
+            article_id=id).values_list('average', flat=True).first()
+        return float('%.1f' % (average or 0))
 
     @property
     def tagList(self):
@@ -98,24 +251,33 @@ class Article(VoteModel, models.Model):
 
     def clear_tags(self):
         """
-        Clears all tags for an article
+        Clears all tags for an article. Tags left without articles are
+        deleted by the collect_orphan_tags command.
         """
-        for tag in self.tags.all():
-            self.tags.remove(tag)
-            if not tag.articles:
-                tag.delete()
+        self.tags.clear()
 
     def comments(self, request=None):
         """
         Gets all comments on a specific article
         """
-        comments = Comment.objects.filter(article__slug=self.slug)
+        comments = Comment.objects.filter(article_id=self.pk)
         return get_comments(comments, request)
 
     @property
     def readtime(self):
-        timer = ArticleTimer(self)
-        return timer.get_read_time()
+        return self.read_time
+
+    def refresh_tag_words(self):
+        """
+        Stores the names of the article's tags, recounts the words in
+        them and updates the stored read time
+        """
+        self.tag_names = list(self.tags.values_list('tag_name', flat=True))
+        self.tag_word_count = count_words(*self.tag_names)
+        self.read_time = ArticleTimer(self).get_read_time()
+        Article.objects.filter(pk=self.pk).update(
+            tag_names=self.tag_names, tag_word_count=self.tag_word_count,
+            read_time=self.read_time)
 
 
 class Comment(models.Model):
@@ -174,7 +336,7 @@ class Comment(models.Model):
 
     @property
     def is_parent(self):
-        if self.parent is not None:
+        if self.parent_id is not None:
             return False
         return True
 
@@ -241,6 +403,12 @@ class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'article'], name='unique_user_favorite'),
+        ]
+
     def is_favorited(self, user, article):
         """
         Get all articles that are favorited by user
@@ -257,6 +425,56 @@ class Favorite(models.Model):
             return True
         return False
 
+    @classmethod
+    def change_favorites(cls, change, step, user_id, article_ids):
+        """
+        Runs the favorite rows change and the favorites count update of
+        the affected articles as one statement, so concurrent requests
+        can neither lose counts nor insert duplicates. `step` is what
+        each changed row adds to its article's count, 1 or -1.
+
+        Returns the new favorites count of each article that changed.
+        """
+        quote = connection.ops.quote_name
+        count = quote(Article._meta.get_field('favoritesCount').column)
+        sql = (
+            'WITH changed AS ({change} RETURNING article_id) '
+            'UPDATE {articles} SET {count} = {count} + %s '
+            'WHERE id IN (SELECT article_id FROM changed) '
+            'RETURNING id, {count}'
+        ).format(
+            change=change.format(favorites=quote(cls._meta.db_table)),
+            articles=quote(Article._meta.db_table),
+            count=count
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, list(article_ids), step])
+            counts = dict(cursor.fetchall())
+        bump_article_versions(*counts)
+        TrendingScore.record(list(counts), 'favorite', step)
+        return counts
+
+    @classmethod
+    def add(cls, user_id, article_ids):
+        """
+        Favorites articles for a user, skipping the ones already
+        favorited
+        """
+        return cls.change_favorites(
+            'INSERT INTO {favorites} (user_id, article_id) '
+            'SELECT %s, unnest(%s::integer[]) ON CONFLICT DO NOTHING',
+            1, user_id, article_ids)
+
+    @classmethod
+    def remove(cls, user_id, article_ids):
+        """
+        Unfavorites articles for a user, skipping the ones not favorited
+        """
+        return cls.change_favorites(
+            'DELETE FROM {favorites} '
+            'WHERE user_id = %s AND article_id = ANY(%s::integer[])',
+            -1, user_id, article_ids)
+
 
 class RatingModel(models.Model):
     """
@@ -268,6 +486,12 @@ class RatingModel(models.Model):
         User, related_name='rated_by', on_delete=models.CASCADE)
     rate = models.IntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'rated_by'],
+                                    name='unique_article_rating'),
+        ]
+
     def get_articles_details(self):
         """
         Fetch relevant articles details
@@ -285,23 +509,301 @@ class RatingModel(models.Model):
         """
         Model to display rating for users in an articles
         """
-        queryset1 = RatingModel.objects.filter(
-            article_id=article_id, rated_by_id=user).first()
-        queryset2 = RatingModel.objects.filter(
-            article_id=article_id).first()
-        if queryset1:
-            return {
-                "my_ratings": queryset1.rate,
-                "average_ratings": Article().average_ratings(article_id)
-            }
-        elif queryset2:
+        my_rating = RatingModel.objects.filter(
+            article_id=article_id, rated_by_id=user
+        ).values_list('rate', flat=True).first()
+        stats = RatingStats.objects.filter(article_id=article_id).first()
+        average = 0
+        if stats and stats.count:
+            average = float('%.1f' % stats.average)
+        if my_rating is not None:
             return {
-                "average_ratings": Article().average_ratings(article_id)
+                "my_ratings": my_rating,
+                "average_ratings": average
             }
         return {
-            "average_ratings": 0
+            "average_ratings": average
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(RatingModel, cls).from_db(db, field_names, values)
+        instance._saved_rate = instance.__dict__.get('rate')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the rating and applies the change to the article's
+        rating stats in the same transaction
+        """
+        previous = getattr(self, '_saved_rate', None)
+        with transaction.atomic():
+            super(RatingModel, self).save(*args, **kwargs)
+            RatingStats.record(self.article_id, self.rate, previous)
+            TrendingScore.record(
+                [self.article_id], 'rating',
+                ((self.rate or 0) - (previous or 0)) / 5)
+        self._saved_rate = self.rate
+
+
+class RatingStats(models.Model):
+    """
+    Running rating statistics of an article, kept up to date as
+    ratings are created, changed and removed
+    """
+    STAR_FIELDS = {
+        1: 'one_star',
+        2: 'two_stars',
+        3: 'three_stars',
+        4: 'four_stars',
+        5: 'five_stars',
+    }
+
+    article = models.OneToOneField(
+        Article, primary_key=True, related_name='rating_stats',
+        on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    one_star = models.PositiveIntegerField(default=0)
+    two_stars = models.PositiveIntegerField(default=0)
+    three_stars = models.PositiveIntegerField(default=0)
+    four_stars = models.PositiveIntegerField(default=0)
+    five_stars = models.PositiveIntegerField(default=0)
+    average = models.FloatField(default=0, db_index=True)
+
+    @property
+    def histogram(self):
+        """
+        Number of ratings given for each star
+        """
+        return {
+            star: getattr(self, field)
+            for star, field in self.STAR_FIELDS.items()
+        }
+
+    @classmethod
+    def record(cls, article_id, rate=None, previous=None, create=True):
+        """
+        Applies a new (previous is None), changed or removed (rate is
+        None) rating to an article's stats with a single UPDATE, so
+        concurrent ratings never overwrite each other's counts
+        """
+        if rate == previous:
+            return
+        count = int(rate is not None) - int(previous is not None)
+        change = (rate or 0) - (previous or 0)
+        updates = {
+            'count': F('count') + count,
+            'total': F('total') + change,
+            'average': Coalesce(
+                Cast(F('total') + change, FloatField()) /
+                NullIf(F('count') + count, 0),
+                0.0),
+        }
+        for star, step in ((rate, 1), (previous, -1)):
+            field = cls.STAR_FIELDS.get(star)
+            if field:
+                updates[field] = F(field) + step
+        stats = cls.objects.filter(article_id=article_id)
+        if not stats.update(**updates) and create:
+            cls.objects.get_or_create(article_id=article_id)
+            stats.update(**updates)
+
+
+class TrendingScore(models.Model):
+    """
+    Time decayed trending score of an article.
+
+    Views, likes, comments, ratings and favorites add their weight in
+    TRENDING_WEIGHTS to the score, and the score halves every
+    TRENDING_HALF_LIFE seconds. A score is decayed to the present
+    whenever it changes, and all scores are decayed together by the
+    decay_trending_scores command, so the stored scores rank the
+    articles as they are.
+    """
+    article = models.OneToOneField(
+        Article, primary_key=True, related_name='trending',
+        on_delete=models.CASCADE)
+    score = models.FloatField(default=0)
+    decayed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-article'],
+                         name='trending_score_idx'),
+        ]
+
+    # the score decayed from decayed_at to the start of the transaction
+    DECAYED_SCORE = (
+        '{table}.score * exp(%s * extract(epoch FROM '
+        '{table}.decayed_at - now()))')
+
+    @staticmethod
+    def decay_rate():
+        return math.log(2) / settings.TRENDING_HALF_LIFE
+
+    @classmethod
+    def record(cls, article_ids, event, factor=1):
+        """
+        Adds the weight of an event, times factor, to the decayed
+        scores of articles in one statement. Negative weights take
+        back earlier events from existing scores, which never drop
+        below 0.
+        """
+        weight = settings.TRENDING_WEIGHTS[event] * factor
+        if not weight or not article_ids:
+            return
+        table = connection.ops.quote_name(cls._meta.db_table)
+        decayed = cls.DECAYED_SCORE.format(table=table)
+        if weight > 0:
+            sql = (
+                'INSERT INTO {table} (article_id, score, decayed_at) '
+                'SELECT unnest(%s::integer[]), %s, now() '
+                'ON CONFLICT (article_id) DO UPDATE SET '
+                'score = {decayed} + %s, decayed_at = now()')
+            params = [list(article_ids), weight, cls.decay_rate(), weight]
+        else:
+            sql = (
+                'UPDATE {table} SET score = GREATEST({decayed} + %s, 0), '
+                'decayed_at = now() WHERE article_id = ANY(%s::integer[])')
+            params = [cls.decay_rate(), weight, list(article_ids)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=table, decayed=decayed), params)
+
+    @classmethod
+    def fold_views(cls, batch_size=1000):
+        """
+        Adds the article views counted in the cache to the scores,
+        going through the articles batch_size at a time. Views are
+        counted there so that reading an article writes nothing.
+        Returns the number of views added.
+        """
+        folded = 0
+        last_id = 0
+        while True:
+            article_ids = list(Article.objects.filter(
+                id__gt=last_id
+            ).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not article_ids:
+                return folded
+            last_id = article_ids[-1]
+            by_views = {}
+            for article_id, views in take_article_views(
+                    article_ids).items():
+                by_views.setdefault(views, []).append(article_id)
+                folded += views
+            for views, viewed in by_views.items():
+                cls.record(viewed, 'view', views)
+
+
+class PulledAuthor(models.Model):
+    """
+    An author who had more than TIMELINE_PUSH_MAX_FOLLOWERS followers
+    when posting. Their articles are not pushed to every follower's
+    timeline but merged into timelines as they are read.
+    """
+    author = models.OneToOneField(
+        User, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TimelineEntry(models.Model):
+    """
+    An article in the home timeline of one of its author's followers,
+    pushed when it was posted or backfilled when the author was
+    followed. Entries of authors who were unfollowed since are deleted
+    when the timeline is read.
+    """
+    user = models.ForeignKey(
+        User, related_name='timeline_entries', on_delete=models.CASCADE)
+    article = models.ForeignKey(
+        Article, related_name='timeline_entries', on_delete=models.CASCADE)
+    author = models.ForeignKey(
+        User, related_name='+', on_delete=models.CASCADE)
+    # the article's, so that timelines are read from this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'article'], name='unique_timeline_article'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-article'],
+                         name='timeline_entry_idx'),
+        ]
+
+    @classmethod
+    def quoted_tables(cls):
+        quote = connection.ops.quote_name
+        return {
+            'entries': quote(cls._meta.db_table),
+            'articles': quote(Article._meta.db_table),
+            'profiles': quote(Profile._meta.db_table),
+            'following': quote(Profile.following.through._meta.db_table),
+            'pulled': quote(PulledAuthor._meta.db_table),
         }
 
+    @classmethod
+    def push(cls, article):
+        """
+        Adds a new article to the timelines of its author's followers
+        with one INSERT, unless the author has too many followers and
+        is pulled instead
+        """
+        if PulledAuthor.objects.filter(author_id=article.author_id).exists():
+            return
+        limit = settings.TIMELINE_PUSH_MAX_FOLLOWERS
+        followers = Profile.following.through.objects.filter(
+            to_profile__user_id=article.author_id)
+        if followers.values('id')[:limit + 1].count() > limit:
+            PulledAuthor.objects.get_or_create(author_id=article.author_id)
+            return
+        sql = (
+            'INSERT INTO {entries} (user_id, article_id, author_id, '
+            'created_at) SELECT follower.user_id, %s, %s, %s '
+            'FROM {following} JOIN {profiles} follower '
+            'ON follower.id = {following}.from_profile_id '
+            'JOIN {profiles} author ON author.id = {following}.to_profile_id '
+            'WHERE author.user_id = %s ON CONFLICT DO NOTHING'
+        ).format(**cls.quoted_tables())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                article.pk, article.author_id, article.created_at,
+                article.author_id])
+
+    @classmethod
+    def backfill(cls, follower_ids, author_ids=None):
+        """
+        Adds the latest TIMELINE_BACKFILL_SIZE articles of the authors
+        followed by the given follower profiles, or only of the given
+        author profiles among them, to the followers' timelines in one
+        INSERT. Pulled authors are skipped. Returns the number of
+        entries added.
+        """
+        condition = '{following}.from_profile_id = ANY(%s)'
+        params = [list(follower_ids)]
+        if author_ids is not None:
+            condition += ' AND {following}.to_profile_id = ANY(%s)'
+            params.append(list(author_ids))
+        sql = (
+            'INSERT INTO {entries} (user_id, article_id, author_id, '
+            'created_at) SELECT follower.user_id, latest.id, '
+            'latest.author_id, latest.created_at '
+            'FROM {following} JOIN {profiles} follower '
+            'ON follower.id = {following}.from_profile_id '
+            'JOIN {profiles} author ON author.id = {following}.to_profile_id '
+            'CROSS JOIN LATERAL (SELECT id, author_id, created_at '
+            'FROM {articles} WHERE {articles}.author_id = author.user_id '
+            'ORDER BY created_at DESC, id DESC LIMIT %s) latest '
+            'WHERE ' + condition + ' AND NOT EXISTS ('
+            'SELECT 1 FROM {pulled} WHERE {pulled}.author_id = author.user_id'
+            ') ON CONFLICT DO NOTHING'
+        ).format(**cls.quoted_tables())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [settings.TIMELINE_BACKFILL_SIZE] + params)
+            return cursor.rowcount
+
 
 class CommentHistory(models.Model):
     """
@@ -353,3 +855,208 @@ class LikeDislikeComment(models.Model):
     )
     like = models.BooleanField(default=False)
     dislike = models.BooleanField(default=False)
+
+
+@receiver(post_delete, sender=RatingModel)
+def remove_rating_stats(sender, instance, **kwargs):
+    """
+    Takes a deleted rating out of its article's stats
+    """
+    previous = getattr(instance, '_saved_rate', instance.rate)
+    RatingStats.record(instance.article_id, previous=previous, create=False)
+    TrendingScore.record([instance.article_id], 'rating', -previous / 5)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_read_time(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """
+    Keeps the stored read time in step with the tags on an article
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.refresh_tag_words()
+        bump_article_versions(instance.pk)
+        get_search_backend().index_articles([instance.pk])
+    elif pk_set:
+        for article in Article.objects.filter(pk__in=pk_set):
+            article.refresh_tag_words()
+        bump_article_versions(*pk_set)
+        get_search_backend().index_articles(pk_set)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def count_tagged_articles(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Keeps the article counts of tags up to date. Additions are counted
+    from the ids actually added, removals from the rows about to be
+    deleted, in the same transaction as the change.
+    """
+    if action == 'post_add':
+        if reverse:
+            changes = {instance.pk: len(pk_set)}
+        else:
+            changes = dict.fromkeys(pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            rows = Article.tags.through.objects.filter(tag_id=instance.pk)
+            if pk_set is not None:
+                rows = rows.filter(article_id__in=pk_set)
+            changes = {instance.pk: -rows.count()}
+        else:
+            rows = Article.tags.through.objects.filter(article_id=instance.pk)
+            if pk_set is not None:
+                rows = rows.filter(tag_id__in=pk_set)
+            changes = dict.fromkeys(
+                rows.values_list('tag_id', flat=True), -1)
+    else:
+        return
+    TagStats.record(changes)
+
+
+@receiver(post_delete, sender=Tag)
+def expire_deleted_tag(sender, instance, **kwargs):
+    expire_tag_directory()
+
+
+@receiver(pre_delete, sender=Article)
+def uncount_deleted_article(sender, instance, **kwargs):
+    """
+    Takes a deleted article out of the article counts of its tags, as
+    the cascade deletes its tag rows without an m2m_changed signal
+    """
+    TagStats.record(dict.fromkeys(
+        Article.tags.through.objects.filter(
+            article_id=instance.pk).values_list('tag_id', flat=True),
+        -1))
+
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, created, **kwargs):
+    """
+    Updates the search index of a new or edited article
+    """
+    if created or getattr(instance, 'content_changed', False):
+        get_search_backend().index_articles([instance.pk])
+
+
+@receiver(post_delete, sender=Article)
+def unindex_article(sender, instance, **kwargs):
+    get_search_backend().remove_articles([instance.pk])
+
+
+@receiver(post_save, sender=Article)
+def push_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        TimelineEntry.push(instance)
+
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def backfill_timeline(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Adds the latest articles of newly followed authors to the
+    followers' timelines
+    """
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        TimelineEntry.backfill(pk_set, [instance.pk])
+    else:
+        TimelineEntry.backfill([instance.pk], pk_set)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def record_trending_comment(sender, instance, **kwargs):
+    """
+    Counts new comments towards their article's trending score and
+    takes deleted ones back
+    """
+    if kwargs['signal'] is post_delete:
+        TrendingScore.record([instance.article_id], 'comment', -1)
+    elif kwargs['created']:
+        TrendingScore.record([instance.article_id], 'comment')
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def record_trending_like(sender, instance, **kwargs):
+    """
+    Counts likes of articles towards their trending score. Changing a
+    like into a dislike or removing it takes the like back.
+    """
+    if instance.content_type_id != ContentType.objects.get_for_model(
+            Article).id:
+        return
+    if kwargs['signal'] is post_delete:
+        change = -1 if instance.action == UP else 0
+    elif kwargs['created']:
+        change = 1 if instance.action == UP else 0
+    else:
+        change = 1 if instance.action == UP else -1
+    TrendingScore.record([instance.object_id], 'like', change)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=RatingModel)
+@receiver(post_delete, sender=RatingModel)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def expire_cached_article(sender, instance, **kwargs):
+    """
+    Replaces the cached representation of a changed article
+    """
+    bump_article_versions(
+        instance.pk if sender is Article else instance.article_id)
+
+
+@receiver(post_save, sender=LikeDislikeComment)
+@receiver(post_delete, sender=LikeDislikeComment)
+def expire_cached_comment_article(sender, instance, **kwargs):
+    """
+    Replaces the cached representation of the article of a liked or
+    disliked comment
+    """
+    bump_article_versions(*Comment.objects.filter(
+        pk=instance.comment_id).values_list('article_id', flat=True))
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def expire_cached_author_profile(sender, instance, **kwargs):
+    """
+    Drops the cached profile listing a changed article
+    """
+    expire_profiles(instance.author_id)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def expire_tagged_author_profiles(sender, instance, action, reverse, pk_set,
+                                  **kwargs):
+    """
+    Drops the cached profiles listing articles whose tags changed
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        expire_profiles(instance.author_id)
+    elif pk_set:
+        expire_profiles(*Article.objects.filter(
+            pk__in=pk_set).values_list('author_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Profile)
+def expire_cached_profile_articles(sender, instance, **kwargs):
+    """
+    Replaces the cached representations showing a profile, the articles
+    of its user and the articles the user has commented on
+    """
+    written = Article.objects.filter(
+        author_id=instance.user_id).values_list('id', flat=True)
+    commented = Comment.objects.filter(
+        author_id=instance.user_id).values_list('article_id', flat=True)
+    bump_article_versions(*set(written).union(commented))
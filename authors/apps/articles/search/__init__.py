@@ -0,0 +1,20 @@
+"""
+Full text search over articles, used by the `q` parameter of the
+article list. The backend is chosen with ARTICLE_SEARCH_BACKEND.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def load_search_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    """
+    Gets the configured search backend
+    """
+    return load_search_backend(settings.ARTICLE_SEARCH_BACKEND)
@@ -0,0 +1,71 @@
+import re
+
+from django.utils.html import escape
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if',
+    'in', 'into', 'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such',
+    'that', 'the', 'their', 'then', 'there', 'these', 'they', 'this', 'to',
+    'was', 'will', 'with'
+))
+
+SNIPPET_WORDS = 30
+
+
+def tokenize(text):
+    """
+    Splits text into lower case terms, leaving out stop words
+    """
+    return [
+        term for term in TOKEN_PATTERN.findall((text or '').lower())
+        if term not in STOP_WORDS
+    ]
+
+
+def highlight(text, terms, size=SNIPPET_WORDS):
+    """
+    Cuts the part of a text around the first matching term and wraps
+    the matching words in <mark> tags. The text is HTML escaped.
+    """
+    words = (text or '').split()
+    matches = [
+        index for index, word in enumerate(words)
+        if set(tokenize(word)) & terms
+    ]
+    start = max(matches[0] - size // 3, 0) if matches else 0
+    window = words[start:start + size]
+    snippet = ' '.join(
+        '<mark>{}</mark>'.format(escape(word))
+        if set(tokenize(word)) & terms else escape(word)
+        for word in window
+    )
+    if start > 0:
+        snippet = '... ' + snippet
+    if start + size < len(words):
+        snippet += ' ...'
+    return snippet
+
+
+class SearchBackend:
+    """
+    Base class of article search backends.
+
+    `search` returns the articles of a queryset that match a query,
+    best match first. Each result has `search_rank` and a highlighted
+    `search_snippet`. `index_articles` and `remove_articles` are called
+    as articles change and `rebuild` recreates the whole index.
+    """
+
+    def search(self, query, queryset):
+        raise NotImplementedError
+
+    def index_articles(self, article_ids):
+        raise NotImplementedError
+
+    def remove_articles(self, article_ids):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=500):
+        raise NotImplementedError
@@ -0,0 +1,218 @@
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from ..models import Article
+from .base import SearchBackend, highlight, tokenize
+
+
+class RankedResults:
+    """
+    Lazily loaded search results. Only the articles of the slices that
+    are read (the requested page) are fetched.
+    """
+
+    def __init__(self, queryset, ranked, terms):
+        self.queryset = queryset
+        self.ranked = ranked
+        self.terms = terms
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def count(self):
+        return len(self.ranked)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ranked = self.ranked[index]
+        articles = self.queryset.in_bulk([pk for pk, score in ranked])
+        results = []
+        for pk, score in ranked:
+            article = articles[pk]
+            article.search_rank = score
+            article.search_snippet = highlight(article.body, self.terms)
+            results.append(article)
+        return results
+
+
+class InvertedIndexBackend(SearchBackend):
+    """
+    Ranks articles with BM25 over an in-process inverted index.
+
+    Terms of the title, tags and description count more than the body
+    (see FIELD_WEIGHTS). The index is kept on disk as a JSON snapshot at
+    ARTICLE_SEARCH_INDEX_PATH and a journal of the changes made since,
+    which every process replays before searching, so changes saved by
+    one process are seen by all of them.
+    """
+    FIELD_WEIGHTS = (
+        ('title', 3.0),
+        ('tags', 2.0),
+        ('description', 1.5),
+        ('body', 1.0),
+    )
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.path = settings.ARTICLE_SEARCH_INDEX_PATH
+        self.journal_path = self.path + '.journal'
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0.0
+        self.offset = 0
+        self.snapshot_stamp = None
+
+    def add(self, article_id, terms):
+        self.discard(article_id)
+        length = sum(terms.values())
+        self.documents[article_id] = (terms, length)
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings[term][article_id] = frequency
+
+    def discard(self, article_id):
+        terms, length = self.documents.pop(article_id, ({}, 0))
+        self.total_length -= length
+        for term in terms:
+            self.postings[term].pop(article_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def apply(self, entry):
+        if entry.get('remove'):
+            self.discard(entry['id'])
+        else:
+            self.add(entry['id'], entry['terms'])
+
+    def stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def sync(self):
+        """
+        Loads a new snapshot and applies the journal entries written
+        since the last sync
+        """
+        with self.lock:
+            snapshot = self.stamp(self.path)
+            journal = self.stamp(self.journal_path)
+            journal_size = journal[2] if journal else 0
+            if snapshot != self.snapshot_stamp or journal_size < self.offset:
+                self.reset()
+                self.snapshot_stamp = snapshot
+                if snapshot:
+                    with open(self.path) as snapshot_file:
+                        for article_id, terms in json.load(snapshot_file):
+                            self.add(article_id, terms)
+            if journal_size > self.offset:
+                with open(self.journal_path, 'rb') as journal_file:
+                    journal_file.seek(self.offset)
+                    for line in journal_file:
+                        if not line.endswith(b'\n'):
+                            break
+                        self.apply(json.loads(line.decode('utf-8')))
+                        self.offset += len(line)
+
+    def write_journal(self, entries):
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        with self.lock:
+            with open(self.journal_path, 'a') as journal_file:
+                journal_file.write(lines)
+            self.sync()
+
+    def document_terms(self, article_ids):
+        """
+        Weighted term frequencies of articles, loaded in two queries
+        """
+        tags = defaultdict(list)
+        for article_id, tag_name in Article.tags.through.objects.filter(
+                article_id__in=article_ids
+        ).values_list('article_id', 'tag__tag_name'):
+            tags[article_id].append(tag_name)
+        articles = Article.objects.filter(pk__in=article_ids).values(
+            'id', 'title', 'description', 'body')
+        for article in articles:
+            article['tags'] = ' '.join(tags[article['id']])
+            terms = Counter()
+            for field, weight in self.FIELD_WEIGHTS:
+                for term in tokenize(article[field]):
+                    terms[term] += weight
+            yield article['id'], dict(terms)
+
+    def index_articles(self, article_ids):
+        self.write_journal(
+            {'id': article_id, 'terms': terms}
+            for article_id, terms in self.document_terms(article_ids))
+
+    def remove_articles(self, article_ids):
+        self.write_journal(
+            {'id': article_id, 'remove': True} for article_id in article_ids)
+
+    def rebuild(self, batch_size=500):
+        """
+        Writes a new snapshot of all articles and empties the journal
+        """
+        ids = list(Article.objects.values_list('id', flat=True))
+        documents = []
+        for start in range(0, len(ids), batch_size):
+            documents.extend(
+                self.document_terms(ids[start:start + batch_size]))
+        with self.lock:
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as snapshot_file:
+                json.dump(documents, snapshot_file)
+            os.replace(temporary, self.path)
+            open(self.journal_path, 'w').close()
+            self.sync()
+        return len(documents)
+
+    def score(self, terms):
+        """
+        BM25 scores of the articles containing any of the terms
+        """
+        count = len(self.documents)
+        if not count:
+            return {}
+        average_length = self.total_length / count
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for article_id, frequency in postings.items():
+                length = self.documents[article_id][1]
+                scores[article_id] += idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * (
+                        1 - self.b + self.b * length / average_length))
+        return scores
+
+    def search(self, query, queryset):
+        terms = set(tokenize(query))
+        with self.lock:
+            self.sync()
+            scores = self.score(terms)
+        matching = set(queryset.filter(
+            pk__in=list(scores)).values_list('pk', flat=True))
+        ranked = sorted(
+            ((pk, score) for pk, score in scores.items() if pk in matching),
+            key=lambda item: (-item[1], item[0]))
+        return RankedResults(queryset, ranked, terms)
@@ -0,0 +1,89 @@
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import F, FloatField, Func, OuterRef, Subquery
+from django.db.models import TextField, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Article
+from .base import SNIPPET_WORDS, SearchBackend, tokenize
+
+SEARCH_CONFIG = 'english'
+
+# divide the rank by 1 + log(document length) and scale it to 0 - 1
+RANK_NORMALIZATION = 1 | 32
+
+
+class CoverDensityRank(Func):
+    """
+    ts_rank_cd with length normalization, the closest built in ranking
+    to BM25
+    """
+    function = 'ts_rank_cd'
+    output_field = FloatField()
+
+
+class Headline(Func):
+    """
+    ts_headline of a document for a query
+    """
+    function = 'ts_headline'
+    template = "%(function)s('{}'::regconfig, %(expressions)s)".format(
+        SEARCH_CONFIG)
+    output_field = TextField()
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Searches a weighted tsvector column (title, tags, description, body)
+    through its GIN index
+    """
+    headline_options = (
+        'StartSel=<mark>, StopSel=</mark>, '
+        'MaxWords={}, MinWords={}'.format(SNIPPET_WORDS, SNIPPET_WORDS // 2))
+
+    def search(self, query, queryset):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        search_query = reduce(or_, (
+            SearchQuery(term, config=SEARCH_CONFIG) for term in terms))
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=CoverDensityRank(
+                F('search_vector'), search_query,
+                Value(RANK_NORMALIZATION)),
+            search_snippet=Headline(
+                F('body'), search_query, Value(self.headline_options))
+        ).order_by('-search_rank', 'id')
+
+    def search_vector(self):
+        tag_names = Article.tags.through.objects.filter(
+            article_id=OuterRef('pk')
+        ).order_by().values('article_id').annotate(
+            names=StringAgg('tag__tag_name', ' ')).values('names')
+        return (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(
+                Coalesce(Subquery(tag_names, output_field=TextField()),
+                         Value('')),
+                weight='B', config=SEARCH_CONFIG) +
+            SearchVector('description', weight='C', config=SEARCH_CONFIG) +
+            SearchVector('body', weight='D', config=SEARCH_CONFIG)
+        )
+
+    def index_articles(self, article_ids):
+        Article.objects.filter(pk__in=article_ids).update(
+            search_vector=self.search_vector())
+
+    def remove_articles(self, article_ids):
+        """
+        The vectors are removed along with the articles
+        """
+
+    def rebuild(self, batch_size=500):
+        ids = list(Article.objects.values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            self.index_articles(ids[start:start + batch_size])
+        return len(ids)
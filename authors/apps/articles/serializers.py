@@ -1,22 +1,45 @@
+import base64
 import json
 from collections import OrderedDict
 
-from django.db.models import Avg
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import models, transaction
+from django.db.models import Q
 from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from authors.apps.articles.models import Tag
 from authors.utils.baseserializer import BaseSerializer
 
+from .annotations import ArticleAnnotations
+from .cache import (get_article_fragment, get_article_version,
+                    set_article_fragment)
 from .exceptions import ArticleNotFound
+from .utils import get_request_user
 from .models import (
     Article, Bookmarks, Comment, CommentHistory, Favorite,
-    RatingModel, LikeDislikeComment
+    RatingModel, RatingStats, LikeDislikeComment
 )
 
 
+class ArticleListSerializer(serializers.ListSerializer):
+    """
+    Serializes many articles against one batch of annotations
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        articles = list(iterable)
+        self.child.annotations = ArticleAnnotations(
+            articles, self.child.get_request_user())
+        return [self.child.to_representation(item) for item in articles]
+
+
 class ArticleSerializer(BaseSerializer):
     """
     Articles serializer
@@ -25,92 +48,41 @@ class ArticleSerializer(BaseSerializer):
     def __init__(self, *args, **kwargs):
         super(ArticleSerializer, self).__init__(*args, **kwargs)
 
-    author = serializers.ReadOnlyField(source="get_author_details")
-    like_info = serializers.SerializerMethodField()
-    favorites = serializers.SerializerMethodField()
+    annotations = None
 
-    def get_user_article(self):
+    def get_request_user(self):
         request = self.context.get('request', None)
-        slug = self.context.get('article', None)
-
-        if request.user.is_anonymous:
-            return ((False, None))
-
-        user = request.user.id
-        article = Article.objects.get(slug=slug).id
-
-        return (user, article)
+        return getattr(request, 'user', None)
 
-    def get_likes_data(self):
-        article = self.instance
-        return article
-
-    def get_likes(self, vote):
-        article = self.get_likes_data()
-        request = self.context.get('request', None)
-        votetf = article.votes.exists(request.user.id, vote)
-        return votetf
-
-    def get_like(self, obj):
-        like = self.get_likes(0)
-        return like
-
-    def get_dislike(self, obj):
-        like = self.get_likes(1)
-        return like
-
-    def get_likes_count(self, obj):
-        article = self.get_likes_data()
-        return article.votes.count()
-
-    def get_dislikes_count(self, obj):
-        article = self.get_likes_data()
-        return article.votes.count(1)
+    def to_representation(self, instance):
+        if isinstance(instance, Article) and (
+                self.annotations is None or
+                not self.annotations.covers(instance)):
+            self.annotations = ArticleAnnotations(
+                [instance], self.get_request_user())
+        return super(ArticleSerializer, self).to_representation(instance)
 
-    def get_favorite(self, instance):
-        user, article = self.get_user_article()
-        is_favorited = Favorite().is_favorited(user, article)
-        return is_favorited
+    def get_author(self, obj):
+        return self.annotations.author_details(obj)
 
     def get_like_info(self, obj):
-        mapped_data = {
-            "like": self.get_like(self),
-            "dislike": self.get_dislike(self),
-            "likeCount": self.get_likes_count(self),
-            "dislikeCount": self.get_dislikes_count(self)
-        }
-
-        return mapped_data
+        return self.annotations.like_info(obj)
 
     def get_favorites(self, obj):
         mapped_data = {
-            "favorite": self.get_favorite(self),
+            "favorite": self.annotations.is_favorited(obj),
             "favoritesCount": obj.favoritesCount,
         }
 
         return mapped_data
 
     def get_ratings(self, obj):
-        request = self.context.get('request', None)
-        ratings = RatingModel().ratings(obj.id, request.user.id)
-        return ratings
+        return self.annotations.ratings(obj)
 
     def get_bookmarked(self, instance):
-        request = self.context.get('request')
-        slug = self.context.get('article')
-        if not request:
-            return False
-        if slug is None:
-            check_is_bookmarked = Bookmarks().check_is_bookmarked(
-                request.user.id, instance.id)
-            return check_is_bookmarked
-        else:
-            article = Article.objects.get(slug=slug)
-            check_is_bookmarked = Bookmarks().check_is_bookmarked(
-                request.user.id, instance.id)
-            return check_is_bookmarked
+        return self.annotations.is_bookmarked(instance)
 
-    author = serializers.ReadOnlyField(source="get_author_details")
+    author = serializers.SerializerMethodField()
     like_info = serializers.SerializerMethodField()
     favorites = serializers.SerializerMethodField()
     ratings = serializers.SerializerMethodField()
@@ -118,12 +90,12 @@ class ArticleSerializer(BaseSerializer):
     bookmarked = serializers.SerializerMethodField()
 
     def get_comments(self, article):
-        request = self.context.get("request")
-        return article.comments(request)
+        return self.annotations.comments(article)
     comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Article
+        list_serializer_class = ArticleListSerializer
         fields = (
             'slug', 'title', 'description', 'body', 'image', 'image_url',
             'created_at', 'updated_at', 'author', 'ratings', 'tagList',
@@ -135,22 +107,48 @@ class ArticleSerializer(BaseSerializer):
         }
 
 
-def add_tag_list(tag_names, article):
+def render_article(article, request):
+    """
+    Renders an article for a request from the cached representation of
+    the article, rendering and caching it first when there is none. The
+    requesting user's own fields are filled in on every request.
     """
-    Adds tag list to an article
+    version = get_article_version(article.pk)
+    representation = get_article_fragment(article.slug, version)
+    if representation is None:
+        article = Article.objects.get(pk=article.pk)
+        representation = dict(ArticleSerializer(article).data)
+        set_article_fragment(article.slug, version, representation)
+    user = get_request_user(request)
+    return ArticleAnnotations([article], user, prefetch=False).overlay(
+        representation, article)
+
+
+def add_tag_list(tag_names, article, replace=False):
     """
-    for name in tag_names:
-        if name.strip():
-            tag, created = Tag.objects.get_or_create(
-                tag_name=name.strip()
-            )
-            article.tags.add(tag)
+    Adds tag list to an article, or replaces the article's tags with it.
+    Tags are looked up and created in bulk and linked in one write.
+    """
+    with transaction.atomic():
+        tag_ids = Tag.get_ids(tag_names)
+        if replace:
+            article.tags.set(tag_ids)
+        else:
+            article.tags.add(*tag_ids)
 
 
 class ArticlePaginator(PageNumberPagination):
     """
     Custom pagination for Articles
     """
+    # total set by the view when it is known without counting
+    known_count = None
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = DjangoPaginator(object_list, per_page)
+        if self.known_count is not None:
+            paginator.count = self.known_count
+        return paginator
 
     def get_paginated_response(self, data):
         return OrderedDict([
@@ -162,6 +160,206 @@ class ArticlePaginator(PageNumberPagination):
         ])
 
 
+class ArticleCursorPaginator(BasePagination):
+    """
+    Keyset pagination for Articles on (created_at, id).
+
+    Pages are fetched with an indexed range scan from an opaque cursor
+    instead of an OFFSET, and the total count is only computed when
+    asked for with `with_count=true`
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 10
+
+    def encode_cursor(self, article, reverse):
+        """
+        Builds a link to the page after or before an article
+        """
+        position = [int(reverse), article.created_at.isoformat(), article.pk]
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(position).encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """
+        Reads the position and direction out of the cursor parameter
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            reverse, created_at, pk = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), bool(reverse)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        if reverse:
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            queryset = queryset.order_by('created_at', 'id')
+        if position:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) |
+                    Q(created_at=created_at, id__lt=pk))
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) |
+                    Q(created_at=created_at, id__gt=pk))
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([("pageCount", len(self.page))])
+        if self.count is not None:
+            response['articlesCount'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return response
+
+
+class TrendingCursorPaginator(BasePagination):
+    """
+    Keyset pagination of trending scores, highest first.
+
+    Each page is an index range scan from the (score, article id) of
+    the last score of the page before, so every page costs the same.
+    Scores keep changing, so the pages only go forwards.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 10
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            score, pk = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return float(score), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        queryset = queryset.order_by('-score', '-article_id')
+        position = self.decode_cursor(request)
+        if position:
+            score, pk = position
+            queryset = queryset.filter(
+                Q(score__lt=score) | Q(score=score, article_id__lt=pk))
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        last = self.page[-1]
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [last.score, last.article_id]).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return OrderedDict([
+            ("pageCount", len(self.page)),
+            ('next', self.get_next_link()),
+            ('results', data)
+        ])
+
+
+class TimelineCursorPaginator(BasePagination):
+    """
+    Keyset pagination of a home timeline, newest first.
+
+    Paginates a Timeline rather than a queryset: each page merges the
+    pushed entries and pulled articles after the (created_at, article
+    id) of the last article of the page before. Like trending, the
+    pages only go forwards.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 10
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            created_at, pk = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def paginate_queryset(self, timeline, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        entries = timeline.page(
+            self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(entries) > self.page_size
+        self.keys = [key for key, _ in entries[:self.page_size]]
+        self.page = [article for _, article in entries[:self.page_size]]
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.keys):
+            return None
+        created_at, pk = self.keys[-1]
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [created_at.isoformat(), pk]).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return OrderedDict([
+            ("pageCount", len(self.page)),
+            ('next', self.get_next_link()),
+            ('results', data)
+        ])
+
+
 class FavoritesSerializer(serializers.ModelSerializer):
     """
     A class to serialize favorite article and user
@@ -173,6 +371,29 @@ class FavoritesSerializer(serializers.ModelSerializer):
         )
 
 
+class BatchFavoritesSerializer(serializers.Serializer):
+    """
+    Validates the slugs of a batch favorite request
+    """
+    favorite = serializers.ListField(
+        child=serializers.CharField(), required=False, max_length=100)
+    unfavorite = serializers.ListField(
+        child=serializers.CharField(), required=False, max_length=100)
+
+    def validate(self, data):
+        favorite = data.get('favorite', [])
+        unfavorite = data.get('unfavorite', [])
+        if not favorite and not unfavorite:
+            raise serializers.ValidationError(
+                "Provide articles to favorite or unfavorite")
+        if set(favorite) & set(unfavorite):
+            raise serializers.ValidationError(
+                "An article cannot be favorited and unfavorited at once")
+        data['favorite'] = list(OrderedDict.fromkeys(favorite))
+        data['unfavorite'] = list(OrderedDict.fromkeys(unfavorite))
+        return data
+
+
 class RatingSerializer(ArticleSerializer):
     """
     Serializer class to rate an article
@@ -201,11 +422,12 @@ class RatingSerializer(ArticleSerializer):
         """
         Calculate the average rating of an article
         """
-        average_rate = RatingModel.objects.filter(article=obj.article,
-                                                  ).aggregate(rate=Avg('rate'))
+        average_rate = RatingStats.objects.filter(
+            article_id=obj.article_id
+        ).values_list('average', flat=True).first()
 
-        if average_rate["rate"]:
-            return float('%.2f' % (average_rate["rate"]))
+        if average_rate:
+            return float('%.2f' % (average_rate))
         return 0
 
 
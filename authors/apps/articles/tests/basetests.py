@@ -5,8 +5,14 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework.reverse import reverse
 from rest_framework.authtoken.models import Token
 import json
-from authors.apps.articles.models import Article, Tag, Comment, CommentHistory
+from authors.apps.authentication.cache import user_cache
+from authors.apps.articles.cache import expire_tag_directory
+from authors.apps.articles.models import (
+    Article, Bookmarks, Comment, CommentHistory, Favorite,
+    LikeDislikeComment, RatingModel, Tag)
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from authors.apps.articles.filters import ArticleFilter
 
 User = get_user_model()
@@ -806,6 +812,7 @@ class TagsBaseTest(APITestCase):
     """
 
     def setUp(self):
+        expire_tag_directory()
         self.client = APIClient()
         self.user = User.objects.create_user(
             email="mininguathor@gmail.com",
@@ -1004,6 +1011,18 @@ class PagniationBaseTest(APITestCase):
         )
         return response
 
+    def get_cursor_page(self, url=None, **params):
+        """
+        Gets a page of articles in cursor mode
+        """
+        query = {"cursor": ""}
+        query.update(params)
+        return self.client.get(
+            path=url or self.get_articles_url,
+            data=None if url else query,
+            format="json"
+        )
+
 
 class FilterBaseTest(TagsBaseTest):
     def setUp(self):
@@ -1224,3 +1243,70 @@ class LikeCommentsBaseTests(BaseTest):
         self.like_comment()
         response = self.dislike_comment()
         return response
+
+
+class QueryCountBaseTest(PagniationBaseTest):
+    """
+    Base test for counting the queries run by article endpoints
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create_user(
+            email="reader@gmail.com",
+            username="reader",
+            password="HeLV27@tica"
+        )
+        self.reader.is_verified = True
+        self.reader.save()
+        self.reader.profile.follow(self.user.profile)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.reader.token())
+        # authenticate once so that counts do not include the user lookup
+        user_cache.get(self.reader.email, self.reader.username)
+
+    def generate_engaged_articles(self, count):
+        """
+        Generates articles the reader has tagged, rated, voted,
+        favorited and bookmarked
+        """
+        tag, created = Tag.objects.get_or_create(tag_name="Queries")
+        for i in range(count):
+            article = Article.objects.create(
+                title="Counting queries",
+                description="Batched serialization",
+                body="Every article costs the same",
+                author=self.user
+            )
+            article.tags.add(tag)
+            article.votes.up(self.reader.id)
+            RatingModel.objects.create(
+                article=article, rated_by=self.reader, rate=4)
+            Favorite.add(self.reader.id, [article.id])
+            Bookmarks.objects.create(
+                article=article, user=self.reader,
+                article_slug=article.slug)
+            self.generate_comments(article, 2)
+
+    def generate_comments(self, article, count):
+        """
+        Generates liked comments, each with a disliked reply
+        """
+        for i in range(count):
+            comment = Comment.objects.create(
+                article=article, author=self.user, body="Parent comment")
+            reply = Comment.objects.create(
+                article=article, author=self.reader, body="Reply",
+                parent=comment)
+            LikeDislikeComment.objects.create(
+                comment=comment, user=self.reader, like=True)
+            LikeDislikeComment.objects.create(
+                comment=reply, user=self.user, dislike=True)
+
+    def count_queries(self, url):
+        """
+        Returns the response of a GET and the number of queries it ran
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, format='json')
+        return response, len(queries)
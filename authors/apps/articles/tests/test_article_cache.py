@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+from django.db import transaction
+from rest_framework.reverse import reverse
+
+from authors.apps.articles.cache import get_article_version
+from authors.apps.articles.models import (Article, Comment, Favorite,
+                                          LikeDislikeComment, RatingModel,
+                                          Tag)
+from authors.apps.articles.serializers import ArticleSerializer
+from authors.apps.articles.tests.basetests import QueryCountBaseTest
+
+
+class TestArticleCache(QueryCountBaseTest):
+    """
+    Tests the cached representation of single articles
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.generate_engaged_articles(1)
+        self.article = Article.objects.get()
+        self.url = reverse("articles:articles", args=[self.article.slug])
+
+    def get_article(self):
+        return self.client.get(self.url).data["article"]
+
+    def assert_expired(self, change):
+        """
+        Asserts that a change moves the article to a new version
+        """
+        self.get_article()
+        version = get_article_version(self.article.pk)
+        change()
+        self.assertNotEqual(get_article_version(self.article.pk), version)
+
+    def test_cached_article_matches_render(self):
+        """
+        Tests the cached article with the reader's fields filled in
+        """
+        self.get_article()
+        response, cached = self.count_queries(self.url)
+        expected = ArticleSerializer(
+            Article.objects.get(), context={"request": response.wsgi_request}
+        ).data
+        self.assertEqual(response.data["article"], expected)
+        self.client.credentials()
+        response, anonymous = self.count_queries(self.url)
+        article = response.data["article"]
+        self.assertFalse(article["like_info"]["like"])
+        self.assertFalse(article["favorites"]["favorite"])
+        self.assertFalse(article["author"]["following"])
+        self.assertNotIn("my_ratings", article["ratings"])
+        self.assertLess(anonymous, cached)
+
+    def test_cached_article_queries(self):
+        """
+        Tests that a cached article needs fewer queries
+        """
+        response, rendered = self.count_queries(self.url)
+        response, cached = self.count_queries(self.url)
+        self.assertLess(cached, rendered)
+
+    def test_changes_expire_article(self):
+        """
+        Tests the changes that replace the cached article
+        """
+        comment = Comment.objects.filter(article=self.article).first()
+        changes = [
+            lambda: self.article.save(),
+            lambda: self.article.votes.up(self.user.id),
+            lambda: Comment.objects.create(
+                article=self.article, author=self.user, body="New"),
+            lambda: LikeDislikeComment.objects.create(
+                comment=comment, user=self.user, like=True),
+            lambda: RatingModel.objects.create(
+                article=self.article, rated_by=self.user, rate=1),
+            lambda: Favorite.remove(self.reader.id, [self.article.id]),
+            lambda: self.article.tags.add(
+                Tag.objects.create(tag_name="Cached")),
+            lambda: self.user.profile.save(),
+        ]
+        for change in changes:
+            self.assert_expired(change)
+
+    def test_comment_shows_after_change(self):
+        """
+        Tests a new comment is rendered after it was posted
+        """
+        self.assertEqual(len(self.get_article()["comments"]), 2)
+        Comment.objects.create(
+            article=self.article, author=self.user, body="New")
+        self.assertEqual(len(self.get_article()["comments"]), 3)
+
+    def test_article_expired_again_on_commit(self):
+        """
+        Tests a version cached while a change commits is replaced
+        """
+        committed = []
+        with patch.object(transaction, "on_commit", committed.append):
+            with transaction.atomic():
+                self.article.save()
+                # a reader caching the article before the commit
+                self.get_article()
+                version = get_article_version(self.article.pk)
+        for callback in committed:
+            callback()
+        self.assertNotEqual(get_article_version(self.article.pk), version)
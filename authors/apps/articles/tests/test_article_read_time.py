@@ -1,6 +1,12 @@
-from .basetests import BaseTest
+from io import StringIO
+
+from django.core.management import call_command
 from rest_framework import status
 
+from authors.apps.articles.models import Article, Tag
+from authors.utils.article_timer import count_words
+from .basetests import BaseTest
+
 
 class TestReadTime(BaseTest):
     """
@@ -77,3 +83,43 @@ class TestReadTime(BaseTest):
             response.data.get("results").get("articles")[0].get("readtime"),
             self.seconds_time
         )
+
+    def test_read_time_is_stored(self):
+        """
+        Tests read time is persisted and read without queries
+        """
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.word_count, 14)
+        with self.assertNumQueries(0):
+            self.assertEqual(article.readtime, self.seconds_time)
+
+    def test_read_time_follows_tags(self):
+        """
+        Tests tag changes update the stored read time
+        """
+        self.article.tags.add(*[
+            Tag.objects.create(tag_name=str(i) + " " + self.word_generator(13))
+            for i in range(14)])
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.tag_word_count, 196)
+        self.assertEqual(article.readtime, "58 second(s)")
+        article.clear_tags()
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.tag_word_count, 0)
+        self.assertEqual(article.readtime, self.seconds_time)
+
+    def test_count_words(self):
+        """
+        Tests counting words across texts
+        """
+        self.assertEqual(count_words(" one  two\nthree ", "", None), 3)
+
+    def test_backfill_read_time(self):
+        """
+        Tests the read time backfill command
+        """
+        Article.objects.update(word_count=0, read_time="")
+        call_command("backfill_read_time", stdout=StringIO())
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.word_count, 14)
+        self.assertEqual(article.readtime, self.seconds_time)
@@ -0,0 +1,79 @@
+from rest_framework import status
+
+from authors.apps.articles.models import Article
+from authors.apps.articles.tests.basetests import PagniationBaseTest
+
+
+class TestCursorPagination(PagniationBaseTest):
+    """
+    Tests cursor paginated article responses
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.generate_articles()
+        self.slugs = list(Article.objects.order_by(
+            'created_at', 'id').values_list('slug', flat=True))
+
+    def page_slugs(self, response):
+        return [article["slug"]
+                for article in response.data["results"]["articles"]]
+
+    def test_first_page(self):
+        """
+        Tests the first page in cursor mode
+        """
+        response = self.get_cursor_page()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.page_slugs(response), self.slugs[:10])
+        self.assertEqual(response.data.get("pageCount"), 10)
+        self.assertNotIn("articlesCount", response.data)
+        self.assertIsNone(response.data.get("previous"))
+        self.assertIn("cursor=", response.data.get("next"))
+
+    def test_walk_forwards_and_backwards(self):
+        """
+        Tests following next and previous cursors
+        """
+        second = self.get_cursor_page(self.get_cursor_page().data["next"])
+        self.assertEqual(self.page_slugs(second), self.slugs[10:20])
+        third = self.get_cursor_page(second.data["next"])
+        self.assertEqual(self.page_slugs(third), self.slugs[20:])
+        self.assertIsNone(third.data.get("next"))
+        back = self.get_cursor_page(third.data["previous"])
+        self.assertEqual(self.page_slugs(back), self.slugs[10:20])
+
+    def test_page_limit_and_count(self):
+        """
+        Tests page limit and the optional total count
+        """
+        response = self.get_cursor_page(page_limit=4, with_count="true")
+        self.assertEqual(self.page_slugs(response), self.slugs[:4])
+        self.assertEqual(response.data.get("articlesCount"), 21)
+
+    def test_cursor_with_filters(self):
+        """
+        Tests cursor mode composes with filters
+        """
+        response = self.get_cursor_page(author="nobody")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("pageCount"), 0)
+        self.assertEqual(response.data.get("message"),
+                         "We couldn’t find any articles")
+
+    def test_invalid_cursor(self):
+        """
+        Tests a cursor that cannot be decoded
+        """
+        response = self.get_cursor_page(cursor="not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data.get("detail"), "Invalid cursor")
+
+    def test_ordering_rejected(self):
+        """
+        Tests that cursors can not page reordered articles
+        """
+        response = self.get_cursor_page(ordering="rating")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get("detail"),
+                         "Ordered articles are paged with page, not cursor")
@@ -1,7 +1,9 @@
+from django.db import IntegrityError, transaction
 from rest_framework import status
+from rest_framework.reverse import reverse
 from django.contrib.auth import get_user_model
 from authors.apps.articles.tests.basetests import BaseTest
-from authors.apps.articles.models import Favorite
+from authors.apps.articles.models import Article, Favorite
 
 User = get_user_model()
 
@@ -86,3 +88,88 @@ class TestFavoriteArticle(BaseTest):
         response = self.delete_favorite_invalidslug()
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data["detail"], "Article does not exist")
+
+    def test_favorites_count(self):
+        """
+        Test the favorites count follows favoriting and unfavoriting
+        """
+        self.is_authenticated("adam@gmail.com", "@Us3r.com")
+        response = self.post_favorite()
+        self.assertEqual(response.data.get("article").get(
+            "favorites").get("favoritesCount"), 1)
+        self.post_favorite()
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).favoritesCount, 1)
+        self.delete_favorite()
+        self.delete_favorite()
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).favoritesCount, 0)
+
+    def test_save_keeps_concurrent_favorites(self):
+        """
+        Test saving an article loaded before a favorite keeps its count
+        """
+        article = Article.objects.get(pk=self.article.pk)
+        Favorite.add(self.user1.pk, [article.pk])
+        article.title = "Edited meanwhile"
+        article.save()
+        article = Article.objects.get(pk=article.pk)
+        self.assertEqual(
+            (article.title, article.favoritesCount), ("Edited meanwhile", 1))
+
+    def test_duplicate_favorite_rejected(self):
+        """
+        Test the database rejects a second favorite of the same article
+        """
+        Favorite.objects.create(user=self.user1, article=self.article)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Favorite.objects.create(user=self.user1, article=self.article)
+
+
+class TestBatchFavorites(BaseTest):
+    """
+    Tests for favoriting articles in batches
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("articles:batch_favorite")
+        self.other = Article.objects.create(
+            title='another one', description='Another',
+            body='Another article', author=self.user1)
+
+    def post_batch(self, data):
+        return self.client.post(self.url, data=data, format="json")
+
+    def test_batch_favorite(self):
+        """
+        Test favoriting and unfavoriting several articles at once
+        """
+        Favorite.add(self.user1.id, [self.other.id])
+        response = self.post_batch({
+            "favorite": [self.article.slug, "missing-article"],
+            "unfavorite": [self.other.slug]
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("articles"), [
+            {"slug": self.article.slug, "favorited": True,
+             "favoritesCount": 1},
+            {"slug": self.other.slug, "favorited": False,
+             "favoritesCount": 1},
+        ])
+        self.assertEqual(response.data.get("notFound"), ["missing-article"])
+        response = self.post_batch({"favorite": [self.article.slug]})
+        self.assertEqual(
+            response.data.get("articles")[0].get("favoritesCount"), 1)
+
+    def test_batch_favorite_invalid(self):
+        """
+        Test batches that favorite and unfavorite the same article
+        """
+        response = self.post_batch({
+            "favorite": [self.article.slug],
+            "unfavorite": [self.article.slug]
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post_batch({})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
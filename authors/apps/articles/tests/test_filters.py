@@ -1,5 +1,6 @@
 from authors.apps.articles.tests.basetests import FilterBaseTest
 from authors.apps.articles.filters import ArticleFilter
+from authors.apps.articles.models import Article, Tag, TagStats
 from rest_framework import status
 
 
@@ -79,3 +80,94 @@ class TestFilters(FilterBaseTest):
         self.assertEqual(response.status_code,
                          status.HTTP_200_OK
                          )
+
+
+class TestTagFilters(FilterBaseTest):
+    """
+    Tests any-of and all-of tag filters and the stored tag counts
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.other = Article.objects.create(
+            title="Principia Mathematica",
+            description="Foundations",
+            body="A work on the foundations of mathematics",
+            author=self.user
+        )
+        self.other.tags.add(self.tag_objects[1])
+
+    def filter_articles(self, **params):
+        response = self.client.get(self.articles_url, params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, response):
+        return sorted(article["slug"]
+                      for article in response.data["results"]["articles"])
+
+    def test_any_of_tags(self):
+        """
+        Tests that articles with any of the tags are listed once
+        """
+        response = self.filter_articles(tags="Analysis, Principia")
+        self.assertEqual(self.found(response),
+                         sorted([self.article.slug, self.other.slug]))
+        self.assertEqual(response.data["articlesCount"], 2)
+
+    def test_all_of_tags(self):
+        """
+        Tests that only articles with all of the tags are listed
+        """
+        response = self.filter_articles(tags_all="Analysis,Principia")
+        self.assertEqual(self.found(response), [self.article.slug])
+
+    def test_tag_names_normalized(self):
+        """
+        Tests that tags are filtered by their stored, normalized names
+        """
+        self.other.tags.add(Tag.objects.create(tag_name="Set Theory"))
+        response = self.filter_articles(tags=" Set   Theory ,")
+        self.assertEqual(self.found(response), [self.other.slug])
+        response = self.filter_articles(tags_all="Set\tTheory, Principia")
+        self.assertEqual(self.found(response), [self.other.slug])
+
+    def test_tag_names_kept_in_sync(self):
+        """
+        Tests the stored tag names as tags are added and removed
+        """
+        self.assertEqual(Article.objects.get(pk=self.article.pk).tag_names,
+                         ["Analysis", "Principia"])
+        self.tag_objects[0].article_set.add(self.other)
+        self.assertEqual(Article.objects.get(pk=self.other.pk).tag_names,
+                         ["Analysis", "Principia"])
+        self.article.clear_tags()
+        self.assertEqual(Article.objects.get(pk=self.article.pk).tag_names,
+                         [])
+
+    def test_tag_stats(self):
+        """
+        Tests the article counts of tags as tags are added and removed
+        """
+        analysis, principia = self.tag_objects
+        self.assertEqual(TagStats.objects.get(tag=principia).articles_count,
+                         2)
+        self.article.tags.add(principia)
+        analysis.article_set.add(self.other)
+        self.assertEqual(TagStats.objects.get(tag=analysis).articles_count, 2)
+        self.other.tags.remove(analysis, principia)
+        principia.article_set.clear()
+        self.assertEqual(TagStats.objects.get(tag=analysis).articles_count, 1)
+        self.assertEqual(TagStats.objects.get(tag=principia).articles_count,
+                         0)
+
+    def test_single_tag_count_is_stored(self):
+        """
+        Tests that a single tag list is counted from the tag stats
+        """
+        TagStats.objects.filter(tag=self.tag_objects[1]).update(
+            articles_count=7)
+        response = self.filter_articles(tags="Principia")
+        self.assertEqual(response.data["articlesCount"], 7)
+        response = self.filter_articles(tags="Principia", title="TED")
+        self.assertEqual(response.data["articlesCount"], 1)
@@ -0,0 +1,114 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from authors.apps.articles.models import Article
+from authors.apps.articles.tests.basetests import QueryCountBaseTest
+
+
+class TestArticleQueryCounts(QueryCountBaseTest):
+    """
+    Tests that article endpoints run a constant number of queries
+    """
+
+    def assert_constant_queries(self, url):
+        """
+        Asserts that adding articles does not add queries to a request
+        """
+        self.generate_engaged_articles(2)
+        response, few = self.count_queries(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.generate_engaged_articles(4)
+        response, many = self.count_queries(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(few, many)
+        return response
+
+    def test_article_list_queries(self):
+        """
+        Tests the query count of the article list
+        """
+        response = self.assert_constant_queries(self.get_articles_url)
+        article = response.data.get("results").get("articles")[0]
+        self.assertEqual(article.get("tagList"), ["Queries"])
+        self.assertEqual(article.get("ratings"), {
+            "my_ratings": 4, "average_ratings": 4.0})
+        self.assertTrue(article.get("author").get("following"))
+        self.assertTrue(article.get("bookmarked"))
+
+    def test_profile_queries(self):
+        """
+        Tests the query count of a profile with articles
+        """
+        url = reverse("profiles:profile", args=[self.user.username])
+        response = self.assert_constant_queries(url)
+        self.assertEqual(len(response.data["profile"]["articles"]), 6)
+
+    def test_single_article_annotations(self):
+        """
+        Tests the batched fields on a single article
+        """
+        self.generate_engaged_articles(1)
+        slug = self.get_articles().data["results"]["articles"][0]["slug"]
+        response = self.client.get(reverse("articles:articles", args=[slug]))
+        article = response.data.get("article")
+        self.assertEqual(article.get("like_info"), {
+            "like": True, "dislike": False,
+            "likeCount": 1, "dislikeCount": 0})
+        self.assertEqual(article.get("favorites").get("favorite"), True)
+
+    def test_favorites_queries(self):
+        """
+        Tests the query count of the user's favorite articles
+        """
+        response = self.assert_constant_queries(
+            reverse("articles:get_favorite"))
+        self.assertEqual(len(response.data["favorites"]), 6)
+
+    def test_bookmarks_queries(self):
+        """
+        Tests the query count of the user's bookmarked articles
+        """
+        response = self.assert_constant_queries(
+            reverse("articles:bookmarks"))
+        self.assertEqual(len(response.data["articles"]), 6)
+
+
+class TestCommentTreeQueries(QueryCountBaseTest):
+    """
+    Tests building of the comment tree of an article
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.generate_engaged_articles(1)
+        self.article = Article.objects.get()
+        self.url = reverse("articles:comment", args=[self.article.slug])
+
+    def test_comment_tree_queries(self):
+        """
+        Tests that more comments do not add queries
+        """
+        response, few = self.count_queries(self.url)
+        self.generate_comments(self.article, 5)
+        response, many = self.count_queries(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["comments"]), 7)
+        self.assertEqual(few, many)
+
+    def test_comment_tree_shape(self):
+        """
+        Tests nesting and reactions in the comment tree
+        """
+        response = self.client.get(self.url)
+        parent = response.data["comments"][0]
+        self.assertIsNone(parent["parent"])
+        self.assertEqual(parent["author"]["username"], self.user.username)
+        self.assertTrue(parent["author"]["following"])
+        self.assertEqual(parent["likesInfo"], {
+            "like": True, "dislike": False,
+            "like_count": 1, "dislikes_count": 0})
+        reply = parent["replies"][0]
+        self.assertEqual(reply["parent_id"], parent["id"])
+        self.assertEqual(reply["likesInfo"], {
+            "like": False, "dislike": False,
+            "like_count": 0, "dislikes_count": 1})
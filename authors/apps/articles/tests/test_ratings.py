@@ -1,6 +1,12 @@
 import json
+from io import StringIO
 
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from rest_framework.reverse import reverse
 from rest_framework.views import status
+
+from authors.apps.articles.models import Article, RatingModel, RatingStats
 from .basetests import BaseTest
 
 
@@ -52,3 +58,104 @@ class RatingArticlesTest(BaseTest):
         self.is_authenticated("adam@gmail.com", "@Us3r.com")
         rating = self.rate_article()
         self.assertEqual(rating.data.get("errors").get("error"), "You can't rate your own article")
+
+
+class RatingStatsTest(BaseTest):
+    """
+    Test cases for the stored rating stats of articles
+    """
+
+    def get_stats(self, article=None):
+        return RatingStats.objects.get(article=article or self.article)
+
+    def test_rating_updates_stats(self):
+        """
+        Test that rating and re-rating an article keeps its stats
+        """
+        self.rate_article()
+        RatingModel.objects.create(
+            article=self.article, rated_by=self.user1, rate=5)
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.total, stats.average),
+                         (2, 9, 4.5))
+        response = self.update_rate_article()
+        self.assertEqual(response.data.get("ratings").get("my_ratings"), 3)
+        self.assertEqual(
+            response.data.get("ratings").get("average_ratings"), 4.0)
+        stats = self.get_stats()
+        self.assertEqual(stats.histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+        self.assertEqual((stats.count, stats.total), (2, 8))
+
+    def test_deleting_rating_updates_stats(self):
+        """
+        Test that removed ratings are taken out of the stats
+        """
+        self.rate_article()
+        RatingModel.objects.filter(article=self.article).delete()
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.total, stats.average),
+                         (0, 0, 0))
+        self.assertEqual(stats.histogram[4], 0)
+
+    def test_ratings_without_stats(self):
+        """
+        Test the ratings of an article whose stats row is missing
+        """
+        self.rate_article()
+        rating = RatingModel.objects.get()
+        RatingStats.objects.all().delete()
+        self.assertEqual(
+            rating.ratings(self.article.id, rating.rated_by_id),
+            {"my_ratings": rating.rate, "average_ratings": 0})
+
+    def test_one_rating_per_user(self):
+        """
+        Test a user can not rate an article twice
+        """
+        self.rate_article()
+        rating = RatingModel.objects.get()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RatingModel.objects.create(
+                article=self.article, rated_by_id=rating.rated_by_id, rate=1)
+        self.assertEqual(self.get_stats().count, 1)
+
+    def test_order_articles_by_rating(self):
+        """
+        Test ordering the article list by average rating
+        """
+        rated = Article.objects.create(
+            title='rated highly', description='Top', body='Top article',
+            author=self.user1)
+        Article.objects.create(
+            title='not rated', description='None', body='No ratings',
+            author=self.user1)
+        RatingModel.objects.create(article=rated, rated_by=self.user2, rate=5)
+        RatingModel.objects.create(
+            article=self.article, rated_by=self.user2, rate=2)
+        url = reverse("articles:article")
+        for ordering, expected in (
+                ('rating', ['this-is-mine', 'rated-highly', 'not-rated']),
+                ('-rating', ['rated-highly', 'this-is-mine', 'not-rated'])):
+            response = self.client.get(url, {'ordering': ordering})
+            slugs = [article['slug']
+                     for article in response.data['results']['articles']]
+            self.assertEqual(slugs, expected)
+
+    def test_reconcile_rating_stats(self):
+        """
+        Test recomputing the stats from the ratings
+        """
+        self.rate_article()
+        RatingModel.objects.update(rate=2)
+        RatingStats.objects.create(
+            article=Article.objects.create(
+                title='stale', description='Stale', body='Stale stats',
+                author=self.user1),
+            count=3, total=9, three_stars=3, average=3)
+        call_command("reconcile_rating_stats", stdout=StringIO())
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.total, stats.average),
+                         (1, 2, 2.0))
+        self.assertEqual(stats.histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+        stale = RatingStats.objects.get(article__slug='stale')
+        self.assertEqual((stale.count, stale.three_stars), (0, 0))
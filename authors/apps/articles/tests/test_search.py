@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+
+from authors.apps.articles.models import Article, Tag
+from authors.apps.articles.search import load_search_backend
+from authors.apps.articles.search.base import highlight, tokenize
+from authors.apps.articles.tests.basetests import PagniationBaseTest
+
+MEMORY_BACKEND = 'authors.apps.articles.search.memory.InvertedIndexBackend'
+
+
+class SearchBaseTest(PagniationBaseTest):
+    """
+    Creates articles to search
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.body_match = Article.objects.create(
+            title="Cooking for beginners",
+            description="Simple meals",
+            body="Start with pasta before you try a dragon fruit salad",
+            author=self.user
+        )
+        self.title_match = Article.objects.create(
+            title="How to train your dragon",
+            description="Ever wonder how?",
+            body="You have to believe",
+            author=self.user
+        )
+        self.other = Article.objects.create(
+            title="Gardening",
+            description="Growing tomatoes",
+            body="Water them every morning",
+            author=self.user
+        )
+
+    def search(self, query, **params):
+        params["q"] = query
+        return self.client.get(
+            path=self.get_articles_url, data=params, format="json")
+
+    def found(self, response):
+        return [article["slug"]
+                for article in response.data["results"]["articles"]]
+
+
+class TestPostgresSearch(SearchBaseTest):
+    """
+    Tests searching articles with the Postgres backend
+    """
+
+    def test_title_match_ranks_first(self):
+        """
+        Tests that a title match beats a body match
+        """
+        response = self.search("dragon")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.found(response), [
+            self.title_match.slug, self.body_match.slug])
+        self.assertEqual(response.data.get("articlesCount"), 2)
+
+    def test_snippet(self):
+        """
+        Tests the highlighted snippet of a result
+        """
+        response = self.search("salad")
+        article = response.data["results"]["articles"][0]
+        self.assertIn("<mark>salad</mark>", article["snippet"])
+
+    def test_search_with_filters(self):
+        """
+        Tests that search composes with the other filters
+        """
+        response = self.search("dragon", title="cooking")
+        self.assertEqual(self.found(response), [self.body_match.slug])
+
+    def test_search_tags(self):
+        """
+        Tests that tags are searchable
+        """
+        tag = Tag.objects.create(tag_name="horticulture")
+        self.other.tags.add(tag)
+        response = self.search("horticulture")
+        self.assertEqual(self.found(response), [self.other.slug])
+
+    def test_edited_article_reindexed(self):
+        """
+        Tests that edits are searchable
+        """
+        self.other.body = "Dragon shaped hedges"
+        self.other.save()
+        self.assertIn(self.other.slug, self.found(self.search("hedges")))
+
+    def test_no_match(self):
+        """
+        Tests a query without results
+        """
+        response = self.search("submarine")
+        self.assertEqual(response.data.get("message"),
+                         "We couldn’t find any articles")
+
+    def test_cursor_rejected(self):
+        """
+        Tests that ranked results can not be cursor paged
+        """
+        response = self.search("dragon", cursor="")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["detail"],
+                         "Search results are paged with page, not cursor")
+
+
+class TestInvertedIndexSearch(SearchBaseTest):
+    """
+    Tests searching articles with the inverted index backend
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.settings = override_settings(
+            ARTICLE_SEARCH_BACKEND=MEMORY_BACKEND,
+            ARTICLE_SEARCH_INDEX_PATH=self.index_path)
+        self.settings.enable()
+        load_search_backend.cache_clear()
+        super().setUp()
+
+    def tearDown(self):
+        self.settings.disable()
+        load_search_backend.cache_clear()
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def test_title_match_ranks_first(self):
+        """
+        Tests that a title match beats a body match
+        """
+        response = self.search("dragon")
+        self.assertEqual(self.found(response), [
+            self.title_match.slug, self.body_match.slug])
+        article = response.data["results"]["articles"][1]
+        self.assertIn("<mark>dragon</mark>", article["snippet"])
+
+    def test_journal_shared_between_instances(self):
+        """
+        Tests that a new backend instance replays the journal
+        """
+        load_search_backend.cache_clear()
+        backend = load_search_backend(MEMORY_BACKEND)
+        results = backend.search("tomatoes", Article.objects.all())
+        self.assertEqual([article.pk for article in results],
+                         [self.other.pk])
+
+    def test_delete_removes_article(self):
+        """
+        Tests that deleted articles leave the index
+        """
+        self.title_match.delete()
+        self.assertEqual(self.found(self.search("dragon")),
+                         [self.body_match.slug])
+
+    def test_rebuild(self):
+        """
+        Tests that a rebuild writes a snapshot and empties the journal
+        """
+        backend = load_search_backend(MEMORY_BACKEND)
+        self.assertEqual(backend.rebuild(batch_size=2), 3)
+        self.assertEqual(os.path.getsize(self.index_path + '.journal'), 0)
+        load_search_backend.cache_clear()
+        self.assertEqual(self.found(self.search("believe")),
+                         [self.title_match.slug])
+
+
+class TestSearchHelpers(SimpleTestCase):
+    """
+    Tests tokenizing and highlighting
+    """
+
+    def test_tokenize(self):
+        """
+        Tests that terms are lower cased and stop words dropped
+        """
+        self.assertEqual(tokenize("The Dragon, and a Knight"),
+                         ["dragon", "knight"])
+
+    def test_highlight_escapes(self):
+        """
+        Tests that snippets are HTML escaped
+        """
+        snippet = highlight("<b>dragon</b> fire", {"dragon"})
+        self.assertEqual(
+            snippet, "<mark>&lt;b&gt;dragon&lt;/b&gt;</mark> fire")
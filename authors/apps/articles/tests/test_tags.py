@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
 from authors.apps.articles.tests.basetests import TagsBaseTest
-from authors.apps.articles.models import Tag, Article
+from authors.apps.articles.models import Tag, Article, TagStats
+from authors.apps.articles.serializers import add_tag_list
 from rest_framework import status
+from rest_framework.reverse import reverse
 
 
 class TestTagsModel(TagsBaseTest):
@@ -255,3 +260,156 @@ class TestFetchOneArticle(TestUpdateTags):
             response.data.get("article").get("tagList"),
             self.tagList
         )
+
+
+class TestTagIngestion(TagsBaseTest):
+    """
+    Tests bulk tag assignment and orphan tag collection
+    """
+
+    def tag_names(self, count):
+        return ["tag {}".format(number) for number in range(count)]
+
+    def count_stats(self, name):
+        return TagStats.objects.get(tag__tag_name=name).articles_count
+
+    def test_names_normalized_and_reused(self):
+        """
+        Tests that tag names are trimmed, deduplicated and reused
+        """
+        Tag.objects.create(tag_name="Real Analysis")
+        add_tag_list([" Real   Analysis ", "Real Analysis", "Set Theory", ""],
+                     self.article)
+        self.assertEqual(self.article.tagList, ["Real Analysis", "Set Theory"])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_constant_queries(self):
+        """
+        Tests that tagging with more tags does not add queries
+        """
+        other = Article.objects.create(
+            title="Other", description="Other", body="Other",
+            author=self.user)
+        with self.assertNumQueries(11):
+            add_tag_list(self.tag_names(2), self.article)
+        with self.assertNumQueries(11):
+            add_tag_list(self.tag_names(20), other)
+        self.assertEqual(other.tags.count(), 20)
+
+    def test_replace_tags(self):
+        """
+        Tests replacing the tags of an article
+        """
+        add_tag_list(["Analysis", "Principia"], self.article)
+        add_tag_list(["Principia", "Cambridge"], self.article, replace=True)
+        self.assertEqual(self.article.tagList, ["Cambridge", "Principia"])
+        self.assertEqual(self.count_stats("Analysis"), 0)
+        self.assertEqual(self.count_stats("Principia"), 1)
+
+    def test_deleted_article_uncounted(self):
+        """
+        Tests that deleting an article updates the tag counts
+        """
+        add_tag_list(["Analysis"], self.article)
+        self.article.delete()
+        self.assertEqual(self.count_stats("Analysis"), 0)
+
+    def test_collect_orphan_tags(self):
+        """
+        Tests that only tags without articles are collected
+        """
+        add_tag_list(["Analysis", "Principia"], self.article)
+        add_tag_list(["Principia"], self.article, replace=True)
+        output = StringIO()
+        call_command('collect_orphan_tags', batch_size=1, stdout=output)
+        self.assertIn("Deleted 1 orphan tag(s)", output.getvalue())
+        self.assertEqual(list(Tag.objects.values_list(
+            'tag_name', flat=True)), ["Principia"])
+        self.assertFalse(TagStats.objects.filter(
+            tag__tag_name="Analysis").exists())
+
+
+class TestTagDirectory(TagsBaseTest):
+    """
+    Tests the directory of tags with their article counts
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.directory_url = reverse("articles:tag_directory")
+        add_tag_list(["python", "pandas", "Pascal"], self.article)
+        for title in ("Second", "Third"):
+            article = Article.objects.create(
+                title=title, description=title, body=title,
+                author=self.user)
+            add_tag_list(["python"], article)
+        add_tag_list(["pandas", "rust"], article)
+
+    def get_directory(self, **params):
+        headers = {
+            "HTTP_" + name.upper(): params.pop(name)
+            for name in ("if_none_match", "if_modified_since")
+            if name in params
+        }
+        return self.client.get(self.directory_url, params, **headers)
+
+    def listed(self, response):
+        return [(tag["tag"], tag["articlesCount"])
+                for tag in response.data["tags"]]
+
+    def test_most_popular_first(self):
+        """
+        Tests that tags are listed by article count
+        """
+        response = self.get_directory()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.listed(response), [
+            ("python", 3), ("pandas", 2), ("Pascal", 1), ("rust", 1)])
+
+    def test_prefix_and_sort_by_name(self):
+        """
+        Tests filtering by a case insensitive prefix and sorting by name
+        """
+        response = self.get_directory(prefix="PA", sort="name")
+        self.assertEqual(self.listed(response),
+                         [("pandas", 2), ("Pascal", 1)])
+        response = self.get_directory(prefix="p", limit="2")
+        self.assertEqual(self.listed(response),
+                         [("python", 3), ("pandas", 2)])
+
+    def test_invalid_parameters(self):
+        """
+        Tests invalid sort orders and limits
+        """
+        response = self.get_directory(sort="age")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.get_directory(limit="0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_served_from_snapshot(self):
+        """
+        Tests that the directory is cached until tags change
+        """
+        first = self.get_directory()
+        with self.assertNumQueries(0):
+            self.get_directory()
+        add_tag_list(["rust"], self.article)
+        second = self.get_directory()
+        self.assertIn(("rust", 2), self.listed(second))
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_revalidation(self):
+        """
+        Tests conditional requests with the ETag and Last-Modified date
+        """
+        response = self.get_directory(sort="name")
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+        cached = self.get_directory(
+            sort="name", if_none_match=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b"")
+        cached = self.get_directory(
+            sort="name", if_modified_since=response["Last-Modified"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        other = self.get_directory(if_none_match=response["ETag"])
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
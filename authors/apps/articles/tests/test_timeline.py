@@ -0,0 +1,143 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from authors.apps.articles.models import (Article, PulledAuthor,
+                                          TimelineEntry)
+from authors.apps.articles.tests.basetests import PagniationBaseTest
+from authors.apps.authentication.models import User
+
+
+class TestTimeline(PagniationBaseTest):
+    """
+    Tests pushing, backfilling and reading home timelines
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.timeline_url = reverse("articles:timeline")
+        self.reader = User.objects.create_user(
+            username="reader", email="reader@gmail.com",
+            password="HeLV27@tica")
+        self.other = User.objects.create_user(
+            username="other", email="other@gmail.com",
+            password="HeLV27@tica")
+        self.client.force_authenticate(user=self.reader)
+
+    def post(self, author, number=1):
+        return [
+            Article.objects.create(
+                title="Timeline {}".format(index),
+                description="Timeline",
+                body="Articles of followed authors",
+                author=author
+            ) for index in range(number)
+        ]
+
+    def follow(self, follower, author):
+        follower.profile.follow(author.profile)
+
+    def get_timeline(self, url=None, **params):
+        response = self.client.get(url or self.timeline_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, response):
+        return [article["slug"]
+                for article in response.data["results"]["articles"]]
+
+    def test_new_articles_pushed(self):
+        """
+        Tests that new articles reach the timelines of followers only
+        """
+        self.follow(self.reader, self.user)
+        article, = self.post(self.user)
+        self.post(self.other)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, article=article).exists())
+        self.assertEqual(self.found(self.get_timeline()), [article.slug])
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2)
+    def test_follow_backfills(self):
+        """
+        Tests that following adds the author's latest articles
+        """
+        articles = self.post(self.user, 3)
+        self.follow(self.reader, self.user)
+        self.assertEqual(self.found(self.get_timeline()), [
+            articles[2].slug, articles[1].slug])
+
+    def test_unfollowed_entries_dropped(self):
+        """
+        Tests that articles of unfollowed authors leave the timeline
+        """
+        self.follow(self.reader, self.user)
+        self.post(self.user, 2)
+        self.reader.profile.unfollow(self.user.profile)
+        self.assertEqual(self.found(self.get_timeline()), [])
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+
+    @override_settings(TIMELINE_PUSH_MAX_FOLLOWERS=1)
+    def test_popular_author_pulled(self):
+        """
+        Tests that articles of authors with many followers are merged in
+        while reading
+        """
+        self.follow(self.reader, self.user)
+        self.follow(self.other, self.user)
+        self.follow(self.reader, self.other)
+        first, = self.post(self.other)
+        popular, = self.post(self.user)
+        last, = self.post(self.other)
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.user).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(article=popular).exists())
+        self.assertEqual(self.found(self.get_timeline()), [
+            last.slug, popular.slug, first.slug])
+
+    def test_pages(self):
+        """
+        Tests following the next links through the timeline
+        """
+        self.follow(self.reader, self.user)
+        articles = self.post(self.user, 5)
+        response = self.get_timeline(page_limit=2)
+        found = self.found(response)
+        while response.data["next"]:
+            response = self.get_timeline(response.data["next"])
+            found += self.found(response)
+        self.assertEqual(
+            found, [article.slug for article in reversed(articles)])
+        self.assertEqual(response.data["pageCount"], 1)
+
+    def test_invalid_cursor(self):
+        """
+        Tests that an invalid cursor is rejected
+        """
+        response = self.client.get(self.timeline_url, {"cursor": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        """
+        Tests that the timeline is private
+        """
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.timeline_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_backfill_command(self):
+        """
+        Tests backfilling the timelines of existing follows
+        """
+        self.follow(self.reader, self.user)
+        self.post(self.user, 2)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_timelines', batch_size=1, stdout=out)
+        self.assertIn('Added 2', out.getvalue())
+        self.assertEqual(len(self.found(self.get_timeline())), 2)
@@ -0,0 +1,159 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from authors.apps.articles.models import (Article, Comment, Favorite,
+                                          RatingModel, TrendingScore)
+from authors.apps.articles.tests.basetests import PagniationBaseTest
+
+WEIGHTS = settings.TRENDING_WEIGHTS
+
+
+class TestTrendingArticles(PagniationBaseTest):
+    """
+    Tests trending scores and the trending articles endpoint
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.trending_url = reverse("articles:trending")
+        self.articles = [
+            Article.objects.create(
+                title="Trending {}".format(number),
+                description="Trending",
+                body="Trending articles",
+                author=self.user
+            ) for number in range(3)
+        ]
+
+    def score(self, article):
+        return TrendingScore.objects.get(article=article).score
+
+    def age_scores(self, seconds):
+        TrendingScore.objects.update(
+            decayed_at=timezone.now() - timedelta(seconds=seconds))
+
+    def get_trending(self, url=None, **params):
+        response = self.client.get(url or self.trending_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, response):
+        return [article["slug"]
+                for article in response.data["results"]["articles"]]
+
+    def test_events_add_weights(self):
+        """
+        Tests that each kind of event adds its weight
+        """
+        article = self.articles[0]
+        article.votes.up(self.user.pk)
+        Favorite.add(self.user.pk, [article.pk])
+        Comment.objects.create(article=article, author=self.user, body="Hot")
+        RatingModel.objects.create(article=article, rated_by=self.user,
+                                   rate=5)
+        self.client.get(reverse("articles:articles", args=[article.slug]))
+        self.assertEqual(TrendingScore.fold_views(), 1)
+        self.assertAlmostEqual(self.score(article), sum(WEIGHTS.values()),
+                               places=3)
+
+    def test_views_counted_without_writes(self):
+        """
+        Tests that reading articles only counts views in the cache until
+        they are added to the scores
+        """
+        first, second, third = self.articles
+        for article in (first, first, second):
+            self.client.get(
+                reverse("articles:articles", args=[article.slug]))
+        self.assertFalse(TrendingScore.objects.exists())
+        output = StringIO()
+        call_command('decay_trending_scores', batch_size=2, stdout=output)
+        self.assertIn("Added 3 article view(s)", output.getvalue())
+        self.assertAlmostEqual(self.score(first), WEIGHTS['view'] * 2,
+                               places=3)
+        self.assertAlmostEqual(self.score(second), WEIGHTS['view'],
+                               places=3)
+        self.assertEqual(TrendingScore.fold_views(), 0)
+
+    def test_events_taken_back(self):
+        """
+        Tests that removed likes, favorites and comments are taken back
+        """
+        article = self.articles[0]
+        article.votes.up(self.user.pk)
+        Favorite.add(self.user.pk, [article.pk])
+        comment = Comment.objects.create(
+            article=article, author=self.user, body="Hot")
+        article.votes.down(self.user.pk)
+        Favorite.remove(self.user.pk, [article.pk])
+        comment.delete()
+        self.assertAlmostEqual(self.score(article), 0, places=3)
+
+    def test_scores_decay(self):
+        """
+        Tests that scores halve every half life before new events
+        """
+        article = self.articles[0]
+        Favorite.add(self.user.pk, [article.pk])
+        self.age_scores(settings.TRENDING_HALF_LIFE)
+        Comment.objects.create(article=article, author=self.user, body="Hot")
+        self.assertAlmostEqual(
+            self.score(article),
+            WEIGHTS['favorite'] / 2 + WEIGHTS['comment'], places=3)
+
+    def test_trending_order_and_pages(self):
+        """
+        Tests that articles are listed by score, page by page
+        """
+        first, second, third = self.articles
+        Favorite.add(self.user.pk, [first.pk, second.pk])
+        Comment.objects.create(article=first, author=self.user, body="Hot")
+        third.votes.up(self.user.pk)
+        response = self.get_trending(page_limit=2)
+        self.assertEqual(self.found(response), [first.slug, second.slug])
+        self.assertEqual(
+            response.data["results"]["articles"][0]["trendingScore"],
+            WEIGHTS['favorite'] + WEIGHTS['comment'])
+        response = self.get_trending(response.data["next"])
+        self.assertEqual(self.found(response), [third.slug])
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        """
+        Tests a cursor that cannot be decoded
+        """
+        response = self.client.get(self.trending_url, {"cursor": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_decay_command(self):
+        """
+        Tests decaying all scores and dropping faded ones
+        """
+        first, second, third = self.articles
+        Favorite.add(self.user.pk, [first.pk, second.pk])
+        self.age_scores(settings.TRENDING_HALF_LIFE)
+        TrendingScore.objects.filter(article=second).update(
+            decayed_at=timezone.now() - timedelta(
+                seconds=settings.TRENDING_HALF_LIFE * 20))
+        output = StringIO()
+        call_command('decay_trending_scores', batch_size=1, stdout=output)
+        self.assertIn("Decayed 2 trending score(s), dropped 1",
+                      output.getvalue())
+        self.assertAlmostEqual(self.score(first), WEIGHTS['favorite'] / 2,
+                               places=3)
+        self.assertEqual(self.found(self.get_trending()), [first.slug])
+
+    def test_decay_rate(self):
+        """
+        Tests the decay rate for the half life
+        """
+        self.assertAlmostEqual(
+            math.exp(-TrendingScore.decay_rate() *
+                     settings.TRENDING_HALF_LIFE), 0.5)
@@ -0,0 +1,120 @@
+import heapq
+
+from django.db.models import Q
+
+from authors.apps.profiles.models import Profile
+
+from .models import Article, PulledAuthor, TimelineEntry
+
+
+def after(queryset, position, pk_field):
+    """
+    Keyset filter for the rows after a (created_at, article id)
+    position in newest first order
+    """
+    if position is None:
+        return queryset
+    created_at, pk = position
+    return queryset.filter(
+        Q(created_at__lt=created_at) |
+        Q(created_at=created_at, **{pk_field + '__lt': pk}))
+
+
+class Timeline:
+    """
+    Home timeline of a user: the articles of the authors they follow,
+    newest first.
+
+    Articles of most authors were pushed to the user's timeline
+    entries when they were posted. Articles of authors with too many
+    followers to push to are pulled from the articles table and merged
+    in while reading.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def followed(self):
+        """
+        User ids of the authors the user follows
+        """
+        if not hasattr(self, '_followed'):
+            self._followed = set(Profile.following.through.objects.filter(
+                from_profile__user_id=self.user.pk
+            ).values_list('to_profile__user_id', flat=True))
+        return self._followed
+
+    @property
+    def pulled(self):
+        """
+        User ids of the followed authors whose articles are pulled
+        """
+        if not hasattr(self, '_pulled'):
+            self._pulled = set(PulledAuthor.objects.filter(
+                author_id__in=self.followed
+            ).values_list('author_id', flat=True))
+        return self._pulled
+
+    def pushed_keys(self, position, limit):
+        """
+        (created_at, article id) keys of up to limit pushed entries after
+        position. Entries of authors no longer followed are deleted on
+        the way.
+        """
+        entries = TimelineEntry.objects.filter(
+            user_id=self.user.pk
+        ).order_by('-created_at', '-article_id')
+        keys = []
+        while len(keys) < limit:
+            rows = list(after(entries, position, 'article_id').values_list(
+                'id', 'author_id', 'created_at', 'article_id')[:limit])
+            stale = []
+            for entry_id, author_id, created_at, article_id in rows:
+                if author_id in self.followed:
+                    keys.append((created_at, article_id))
+                else:
+                    stale.append(entry_id)
+            if stale:
+                TimelineEntry.objects.filter(id__in=stale).delete()
+            if len(rows) < limit:
+                break
+            position = rows[-1][2:]
+        return keys[:limit]
+
+    def pulled_keys(self, position, limit):
+        """
+        (created_at, article id) keys of up to limit articles of pulled
+        authors after position
+        """
+        if not self.pulled:
+            return []
+        articles = Article.objects.filter(
+            author_id__in=self.pulled).order_by('-created_at', '-id')
+        return list(after(articles, position, 'id').values_list(
+            'created_at', 'id')[:limit])
+
+    def page_keys(self, position=None, size=10):
+        """
+        Merges up to size keys after position from the pushed entries
+        and the pulled articles
+        """
+        merged = heapq.merge(
+            self.pushed_keys(position, size),
+            self.pulled_keys(position, size), reverse=True)
+        keys = []
+        seen = set()
+        for key in merged:
+            if key[1] not in seen:
+                seen.add(key[1])
+                keys.append(key)
+        return keys[:size]
+
+    def page(self, position=None, size=10):
+        """
+        Articles of the page of the timeline after position, with the
+        (created_at, article id) key of each
+        """
+        keys = self.page_keys(position, size)
+        articles = Article.objects.in_bulk([pk for _, pk in keys])
+        return [(key, articles[key[1]]) for key in keys if key[1] in articles]
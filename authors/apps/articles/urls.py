@@ -2,20 +2,26 @@ from django.conf.urls import url
 from django.urls import path, re_path
 
 from .views import (
-    BookmarkAPIView, CommentAllHistoryView, CommentAPIView,
+    BatchFavoritesView, BookmarkAPIView, CommentAllHistoryView, CommentAPIView,
     CommentDetailAPIView, CommentOneHistoryView,
     DeleteBookMakeAPIView, FavoritesView, FetchTags,
     GetBookMarksAPIVIew, LikeCommentsView, LikeDislikeView,
     ListCreateArticleAPIView, ListUserFavoriteArticlesView,
     RateArticleAPIView, RetrieveUpdateArticleAPIView,
-    SocialShareArticleView
+    SocialShareArticleView, TagDirectoryView, TimelineView,
+    TrendingArticlesView
 )
 
 app_name = 'articles'
 
 urlpatterns = [
     path('articles/', ListCreateArticleAPIView.as_view(), name='article'),
+    path('articles/trending/', TrendingArticlesView.as_view(),
+         name='trending'),
+    path('articles/feed/', TimelineView.as_view(), name='timeline'),
     path('tags/', FetchTags.as_view(), name="all_tags"),
+    path('tags/directory/', TagDirectoryView.as_view(),
+         name="tag_directory"),
     path('articles/<slug>/comments/',
          CommentAPIView.as_view(), name='comment'),
     path('articles/<slug>/comments/<int:id>/',
@@ -28,6 +34,8 @@ urlpatterns = [
          FavoritesView.as_view(), name='favorite'),
     path('articles/favorites/me/',
          ListUserFavoriteArticlesView.as_view(), name='get_favorite'),
+    path('articles/favorites/batch/',
+         BatchFavoritesView.as_view(), name='batch_favorite'),
     path('articles/<slug>/rate/',
          RateArticleAPIView.as_view(), name='rating_articles'),
     path("articles/<slug>/share/<provider>/",
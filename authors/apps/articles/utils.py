@@ -1,39 +1,96 @@
-# from .views import CommentAPIView
+from collections import OrderedDict
 
-# user = CommentAPIView.get_user()
+from django.db.models import Count, Q
 
+from authors.apps.profiles.models import Profile
 
-def get_comments(comments, request=None):
-    # global user
-    parents = []
+
+def get_request_user(request):
+    """
+    Gets the user making a request, if any
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    return None
+
+
+def get_comment_trees(comments, user=None):
+    """
+    Builds the nested representation of comments grouped by article.
+
+    All comments are loaded with their authors' profiles in one query,
+    like and dislike counts together with the requester's own reactions
+    in one grouped query, and the requester's follow status of the
+    authors in one more. The tree is then assembled in memory.
+    """
+    from .models import LikeDislikeComment
+
+    comments = list(comments.select_related('author__profile'))
+    if not comments:
+        return OrderedDict()
+    comment_ids = [comment.pk for comment in comments]
+
+    user_id = user.pk if user else None
+    likes = LikeDislikeComment.objects.filter(
+        comment_id__in=comment_ids
+    ).values('comment_id').annotate(
+        likes=Count('id', filter=Q(like=True)),
+        dislikes=Count('id', filter=Q(dislike=True)),
+        liked=Count('id', filter=Q(like=True, user_id=user_id)),
+        disliked=Count('id', filter=Q(dislike=True, user_id=user_id))
+    )
+    likes = {row['comment_id']: row for row in likes}
+
+    followed = set()
+    if user:
+        followed = set(Profile.following.through.objects.filter(
+            from_profile__user_id=user.pk,
+            to_profile__user_id__in={c.author_id for c in comments}
+        ).values_list('to_profile__user_id', flat=True))
+
+    def represent(comment, **links):
+        reactions = likes.get(comment.pk, {})
+        profile = comment.author.profile
+        representation = {
+            "id": comment.pk,
+            "createdAt": comment.created_at,
+            "updatedAt": comment.updated_at,
+            "body": comment.body,
+            "author": {
+                "username": comment.author.username,
+                "bio": profile.bio,
+                "image": profile.fetch_image,
+                "following": comment.author_id in followed
+            }
+        }
+        representation.update(links)
+        representation["likesInfo"] = {
+            "like": bool(reactions.get('liked')),
+            "dislike": bool(reactions.get('disliked')),
+            "like_count": reactions.get('likes', 0),
+            "dislikes_count": reactions.get('dislikes', 0)
+        }
+        return representation
+
+    replies = {}
+    for comment in comments:
+        if not comment.is_parent:
+            replies.setdefault(comment.parent_id, []).append(
+                represent(comment, parent_id=comment.parent_id))
+
+    trees = OrderedDict()
     for comment in comments:
         if comment.is_parent:
-            parents.append({
-                "id": comment.pk,
-                "createdAt": comment.created_at,
-                "updatedAt": comment.updated_at,
-                "body": comment.body,
-                "author": comment.get_profile_details(),
-                "parent": comment.parent,
-                "likesInfo": {
-                    "like": comment.liked(request),
-                    "dislike": comment.disliked(request),
-                    "like_count": comment.likes_count(),
-                    "dislikes_count": comment.dislikes_count()
-                },
-                "replies": [{
-                    "id": child.pk,
-                    "createdAt": child.created_at,
-                    "updatedAt": child.updated_at,
-                    "body": child.body,
-                    "author": child.get_profile_details(),
-                    "parent_id": comment.pk,
-                    "likesInfo": {
-                        "like": child.liked(request),
-                        "dislike": child.disliked(request),
-                        "like_count": child.likes_count(),
-                        "dislikes_count": child.dislikes_count()
-                    },
-                } for child in comment.children()]
-            })
-    return parents
+            parent = represent(comment, parent=None)
+            parent["replies"] = replies.get(comment.pk, [])
+            trees.setdefault(comment.article_id, []).append(parent)
+    return trees
+
+
+def get_comments(comments, request=None):
+    """
+    Builds the nested representation of a set of comments
+    """
+    trees = get_comment_trees(comments, get_request_user(request))
+    return [parent for tree in trees.values() for parent in tree]
@@ -1,7 +1,14 @@
+import bisect
+import hashlib
+import itertools
 import types
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django_filters import rest_framework as filters
 from rest_framework import permissions, status
 from rest_framework.exceptions import APIException, ValidationError
@@ -13,19 +20,23 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from ...utils.social_share_utils import generate_share_url
+from .cache import count_article_view, get_tag_directory
 from .exceptions import (ArticleNotFound, BookmarkDoesNotExist, Forbidden,
                          ItemDoesNotExist)
 from .filters import ArticleFilter
 from .models import (Article, Bookmarks, Comment, CommentHistory, Favorite,
-                     LikeDislikeComment, RatingModel, Tag)
+                     LikeDislikeComment, RatingModel, TrendingScore)
+from .search import get_search_backend
 from .serializers import (
-    ArticlePaginator, ArticleSerializer,
-    BookmarkSerializers, CommentChildSerializer,
+    ArticleCursorPaginator, ArticlePaginator, ArticleSerializer,
+    BatchFavoritesSerializer, BookmarkSerializers, CommentChildSerializer,
     CommentDetailSerializer,
     CommentEditHistorySerializer, CommentSerializer,
     DisplayCommentsSerializer, DisplaySingleComment,
-    FavoritesSerializer, RatingSerializer, add_tag_list
+    FavoritesSerializer, RatingSerializer, TimelineCursorPaginator,
+    TrendingCursorPaginator, add_tag_list, render_article
 )
+from .timeline import Timeline
 
 
 def get_serialiser_data(serializer_data, content):
@@ -77,7 +88,8 @@ class ListCreateArticleAPIView(ListCreateAPIView):
     queryset = Article.objects.all()
     filter_backends = (filters.DjangoFilterBackend, SearchFilter)
     filterset_class = ArticleFilter
-    search_fields = ('title')
+    search_fields = ('title',)
+    search_query_param = 'q'
 
     def create(self, request):
         """
@@ -121,9 +133,38 @@ class ListCreateArticleAPIView(ListCreateAPIView):
                 return invalid_response
             elif int(page_limit) < 1:
                 return invalid_response
+        query = request.GET.get(self.search_query_param, '').strip()
+        use_cursor = ArticleCursorPaginator.cursor_query_param in request.GET
+        if query and use_cursor:
+            # search results are ranked, not in the order cursors follow
+            return Response(
+                data={
+                    "detail": "Search results are paged with page, "
+                              "not cursor"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if use_cursor and request.GET.get('ordering'):
+            # cursors follow the creation order
+            return Response(
+                data={
+                    "detail": "Ordered articles are paged with page, "
+                              "not cursor"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
         articles = self.filter_queryset(self.get_queryset())
-        paginator = ArticlePaginator()
-        paginator.page_size = page_limit
+        if query:
+            articles = get_search_backend().search(query, articles)
+        if use_cursor:
+            paginator = ArticleCursorPaginator()
+            paginator.page_size = int(page_limit)
+        else:
+            paginator = ArticlePaginator()
+            paginator.page_size = page_limit
+            if not query and not request.GET.get(SearchFilter.search_param):
+                paginator.known_count = ArticleFilter.get_stored_count(
+                    request.GET)
         result = paginator.paginate_queryset(articles, request)
         serializer = ArticleSerializer(
             result, many=True,
@@ -134,14 +175,94 @@ class ListCreateArticleAPIView(ListCreateAPIView):
                 'favorites'
             ]
         )
+        data = serializer.data
+        if query:
+            for article, representation in zip(result, data):
+                representation["snippet"] = article.search_snippet
         response = paginator.get_paginated_response({
-            "articles": serializer.data
+            "articles": data
         })
-        if response.get("articlesCount") == 0:
+        if response.get("pageCount") == 0:
             response["message"] = "We couldn’t find any articles"
         return Response(response)
 
 
+class TrendingArticlesView(GenericAPIView):
+    """
+    Lists articles by their time decayed trending score
+    """
+    permission_classes = (IsAuthenticatedOrReadOnly,)
+
+    def get(self, request):
+        """
+        Gets a page of trending articles
+        """
+        page_limit = request.GET.get('page_limit', '10')
+        if not page_limit.isdigit() or int(page_limit) < 1:
+            return Response(
+                data={
+                    "detail": "Invalid page limit"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        paginator = TrendingCursorPaginator()
+        paginator.page_size = int(page_limit)
+        scores = paginator.paginate_queryset(
+            TrendingScore.objects.filter(
+                score__gte=settings.TRENDING_MIN_SCORE
+            ).select_related('article'), request)
+        serializer = ArticleSerializer(
+            [score.article for score in scores], many=True,
+            context={'request': request},
+            remove_fields=[
+                'like_info',
+                'comments',
+                'favorites'
+            ]
+        )
+        data = serializer.data
+        for score, representation in zip(scores, data):
+            representation["trendingScore"] = round(score.score, 3)
+        return Response(paginator.get_paginated_response({
+            "articles": data
+        }))
+
+
+class TimelineView(GenericAPIView):
+    """
+    Lists the articles of the authors the user follows, newest first
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """
+        Gets a page of the user's home timeline
+        """
+        page_limit = request.GET.get('page_limit', '10')
+        if not page_limit.isdigit() or int(page_limit) < 1:
+            return Response(
+                data={
+                    "detail": "Invalid page limit"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        paginator = TimelineCursorPaginator()
+        paginator.page_size = int(page_limit)
+        articles = paginator.paginate_queryset(Timeline(request.user), request)
+        serializer = ArticleSerializer(
+            articles, many=True,
+            context={'request': request},
+            remove_fields=[
+                'like_info',
+                'comments',
+                'favorites'
+            ]
+        )
+        return Response(paginator.get_paginated_response({
+            "articles": serializer.data
+        }))
+
+
 class RetrieveUpdateArticleAPIView(GenericAPIView):
     """
     Retrive, Update and Delete an article
@@ -165,13 +286,9 @@ class RetrieveUpdateArticleAPIView(GenericAPIView):
         """
         article = self.retrieve_article(slug)
         if article:
-            serializer = ArticleSerializer(
-                article,
-                context={'article': slug, 'request': request},
-                many=False
-            )
+            count_article_view(article.pk)
             return Response(
-                {"article": serializer.data},
+                {"article": render_article(article, request)},
                 status=status.HTTP_200_OK
             )
 
@@ -195,8 +312,7 @@ class RetrieveUpdateArticleAPIView(GenericAPIView):
             data = serializer.data
             tag_names = request.data.get("tags")
             if tag_names:
-                article.clear_tags()
-                add_tag_list(tag_names, article)
+                add_tag_list(tag_names, article, replace=True)
             data["tagList"] = article.tagList
             return Response(
                 data={
@@ -245,7 +361,7 @@ class FetchTags(GenericAPIView):
         """
         Gets all articles
         """
-        tags = Tag.objects.all()
+        tags = get_tag_directory()['by_name']
         if not tags:
             response = Response(
                 data={
@@ -259,13 +375,73 @@ class FetchTags(GenericAPIView):
         else:
             response = Response(
                 data={
-                    "tags": [tag.tag_name for tag in tags]
+                    "tags": [name for name, count in tags]
                 },
                 status=status.HTTP_200_OK
             )
         return response
 
 
+class TagDirectoryView(GenericAPIView):
+    """
+    Lists the tags in use with their article counts, most used first
+    or by name, optionally only those starting with a prefix.
+
+    Answers from a cached snapshot and sends an ETag and Last-Modified
+    date, so unchanged directories are revalidated without a body.
+    """
+    sort_orders = ('popular', 'name')
+    default_limit = 100
+    max_limit = 1000
+
+    def invalid(self, field, message):
+        return Response(
+            data={"errors": {field: [message]}},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def get(self, request):
+        """
+        Gets tags with their article counts
+        """
+        sort = request.GET.get('sort', self.sort_orders[0])
+        if sort not in self.sort_orders:
+            return self.invalid("sort", "Sort by popular or name")
+        limit = request.GET.get('limit', str(self.default_limit))
+        if not limit.isdigit() or not 0 < int(limit) <= self.max_limit:
+            return self.invalid(
+                "limit", "Limit must be between 1 and {}".format(
+                    self.max_limit))
+        limit = int(limit)
+        prefix = request.GET.get('prefix', '').strip().lower()
+
+        directory = get_tag_directory()
+        etag = quote_etag(hashlib.md5('{}:{}:{}:{}'.format(
+            directory['etag'], sort, limit, prefix
+        ).encode('utf-8')).hexdigest())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=directory['modified'])
+        if response is None:
+            if sort == 'name':
+                start = bisect.bisect_left(directory['keys'], prefix)
+                tags = itertools.takewhile(
+                    lambda tag: tag[0].lower().startswith(prefix),
+                    directory['by_name'][start:])
+            else:
+                tags = (tag for tag in directory['popular']
+                        if tag[0].lower().startswith(prefix))
+            response = Response(data={
+                "tags": [
+                    {"tag": name, "articlesCount": count}
+                    for name, count in itertools.islice(tags, limit)
+                ]
+            })
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(directory['modified'])
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
 class LikeDislikeView(GenericAPIView):
     """
     A generic class to like and dislike articles
@@ -354,39 +530,24 @@ class FavoritesView(GenericAPIView):
         """
         A method to favorite an article
         """
-        data = request.data
         article_inst = RetrieveUpdateArticleAPIView()
         article = article_inst.retrieve_article(slug)
-        favorite_count = article.favoritesCount
-        user = request.user
-        favorite = Favorite.objects.filter(user=user, article=article)
-        if favorite:
-            response = Response({
+        if not Favorite.add(request.user.id, [article.id]):
+            return Response({
                 'errors': {
                     'exist': ['Already favorited this article']
                 }
             }, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            Article.objects.filter(slug=slug).update(
-                favoritesCount=favorite_count + 1)
-            data['article'] = article.id
-            data['user'] = request.user.id
-            serializer = FavoritesSerializer(data=data)
-            serializer.is_valid()
-            serializer.save()
-            article_id = serializer.data.get("article")
-            article = Article.objects.get(id=article_id)
-            article_serializer = ArticleSerializer(
-                article,
-                context={'article': slug, 'request': request},
-                many=False
-            )
-            response = Response({
-                "article": article_serializer.data,
-                "message": "Article added to favorites"
-            }, status=status.HTTP_201_CREATED)
-
-        return response
+        article.refresh_from_db()
+        article_serializer = ArticleSerializer(
+            article,
+            context={'article': slug, 'request': request},
+            many=False
+        )
+        return Response({
+            "article": article_serializer.data,
+            "message": "Article added to favorites"
+        }, status=status.HTTP_201_CREATED)
 
     def delete(self, request, slug):
         """
@@ -394,14 +555,7 @@ class FavoritesView(GenericAPIView):
         """
         article_inst = RetrieveUpdateArticleAPIView()
         article = article_inst.retrieve_article(slug)
-
-        favorite_count = article.favoritesCount
-        favorite = Favorite.objects.filter(
-            user=request.user.id, article=article)
-        if favorite:
-            favorite.delete()
-            Article.objects.filter(slug=slug).update(
-                favoritesCount=favorite_count-1)
+        if Favorite.remove(request.user.id, [article.id]):
             return Response({
                 "message": "Article removed from favorites"
             }, status=status.HTTP_200_OK)
@@ -412,6 +566,45 @@ class FavoritesView(GenericAPIView):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+class BatchFavoritesView(GenericAPIView):
+    """
+    Favorite and unfavorite several articles in one request
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BatchFavoritesSerializer
+
+    def post(self, request):
+        """
+        Applies lists of slugs to favorite and unfavorite and returns
+        the resulting favorites counts
+        """
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        favorite = serializer.validated_data.get('favorite', [])
+        unfavorite = serializer.validated_data.get('unfavorite', [])
+        ids = dict(Article.objects.filter(
+            slug__in=favorite + unfavorite).values_list('slug', 'id'))
+
+        with transaction.atomic():
+            Favorite.add(request.user.id, [
+                ids[slug] for slug in favorite if slug in ids])
+            Favorite.remove(request.user.id, [
+                ids[slug] for slug in unfavorite if slug in ids])
+
+        counts = dict(Article.objects.filter(
+            id__in=ids.values()).values_list('slug', 'favoritesCount'))
+        articles = [{
+            "slug": slug,
+            "favorited": slug in favorite,
+            "favoritesCount": counts[slug]
+        } for slug in favorite + unfavorite if slug in counts]
+        return Response({
+            "articles": articles,
+            "notFound": [slug for slug in favorite + unfavorite
+                         if slug not in ids]
+        }, status=status.HTTP_200_OK)
+
+
 class ListUserFavoriteArticlesView(GenericAPIView):
     """
     List all favorite articles by the user
@@ -421,14 +614,10 @@ class ListUserFavoriteArticlesView(GenericAPIView):
 
     def get(self, request):
         favorites = Favorite.objects.filter(
-            user_id=request.user.id)
-        user_favorites = []
-        for favorite in favorites:
-            article = Article.objects.get(id=favorite.article_id)
-            article = ArticleSerializer(
-                article,
-                context={'article': article.slug, 'request': request},).data
-            user_favorites.append(article)
+            user_id=request.user.id).select_related('article')
+        articles = [favorite.article for favorite in favorites]
+        user_favorites = ArticleSerializer(
+            articles, many=True, context={'request': request}).data
 
         return Response(
             data={"favorites": user_favorites},
@@ -445,6 +634,22 @@ class RateArticleAPIView(GenericAPIView):
     query_set = RatingModel.objects.all()
     serializer_class = RatingSerializer
 
+    def save_rating(self, request, article, rating_value):
+        """
+        Creates the user's rating of the article or changes it
+        """
+        with transaction.atomic():
+            try:
+                already_rated = RatingModel.objects.select_for_update().get(
+                    rated_by=request.user, article=article)
+                serializer = self.serializer_class(
+                    already_rated, data=rating_value)
+            except RatingModel.DoesNotExist:
+                serializer = self.serializer_class(data=rating_value)
+
+            serializer.is_valid(raise_exception=True)
+            serializer.save(article=article, rated_by=request.user)
+
     def post(self, request, slug):
         """
         Method to post a rating on an article
@@ -461,15 +666,10 @@ class RateArticleAPIView(GenericAPIView):
             )
 
         try:
-            already_rated = RatingModel.objects.get(
-                rated_by=request.user, article=article)
-            serializer = self.serializer_class(
-                already_rated, data=rating_value)
-        except RatingModel.DoesNotExist:
-            serializer = self.serializer_class(data=rating_value)
-
-        serializer.is_valid(raise_exception=True)
-        serializer.save(article=article, rated_by=request.user)
+            self.save_rating(request, article, rating_value)
+        except IntegrityError:
+            # a concurrent first rating by the user won; change it instead
+            self.save_rating(request, article, rating_value)
         serializer_article = ArticleSerializer(
             article,
             context={
@@ -779,28 +979,24 @@ class GetBookMarksAPIVIew(GenericAPIView):
         """
         Get all bookmarks for a user
         """
-        user = request.user
-        bookmarks = Bookmarks.objects.all().filter(user=user)
-        if not bookmarks:
+        bookmarks = Bookmarks.objects.filter(
+            user__pk=request.user.pk).select_related('article')
+        articles = [bookmark.article for bookmark in bookmarks]
+        if not articles:
             return Response({"message": "Bookmarks not found"},
                             status.HTTP_404_NOT_FOUND)
-        bookmarks = Bookmarks.objects.filter(user__pk=request.user.pk)
-        data = []
-        articles = [bookmark.article for bookmark in bookmarks]
-        for article in articles:
-            serializer = ArticleSerializer(
-                article,
-                remove_fields=[
-                    'like_info',
-                    'favorites',
-                    'ratings'
-                ],
-                context={'request': request},
-                many=False
-            )
-            data.append(serializer.data)
+        serializer = ArticleSerializer(
+            articles,
+            remove_fields=[
+                'like_info',
+                'favorites',
+                'ratings'
+            ],
+            context={'request': request},
+            many=True
+        )
         response = Response({
-            "articles": data,
+            "articles": serializer.data,
         }, status=status.HTTP_200_OK)
         return response
 
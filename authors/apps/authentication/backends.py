@@ -1,7 +1,8 @@
 import jwt
 from django.conf import settings
 from rest_framework import authentication, exceptions
-from .models import User
+
+from .cache import user_cache
 
 """Configure JWT Here"""
 
@@ -52,9 +53,8 @@ class JWTAuthentication(authentication.BaseAuthentication):
         username = payload['user_data']['username']
         email = payload['user_data']['email']
 
-        try:
-            user = User.objects.get(email=email, username=username)
-        except User.DoesNotExist:
+        user = user_cache.get(email, username)
+        if user is None:
             resp = 'No user was found from the provided token!'
             raise exceptions.AuthenticationFailed(resp)
 
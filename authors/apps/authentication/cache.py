@@ -0,0 +1,180 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+# The user fields kept in the cache. Any other field of a cached user
+# is deferred and loaded from the database on first access.
+USER_FIELDS = {'id', 'email', 'username', 'is_active', 'is_verified',
+               'is_staff', 'is_superuser'}
+
+
+def get_user_fields():
+    """
+    The cached user fields in model order, as from_db expects them
+    """
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname in USER_FIELDS
+    ]
+
+
+class UserCache:
+    """
+    Two tier cache of the users that JWTs authenticate as.
+
+    Lookups go through a small per process LRU first, then the shared
+    Django cache (CACHE_URL) and only then the database. Shared entries
+    are stored with the generation of their user current when the user
+    was read from the database, and saving or deleting the user starts
+    a new generation, so an entry read before the change is never used
+    after it. The process that made the change also drops its local
+    copy. Other processes keep theirs until JWT_USER_CACHE_LOCAL_TTL
+    runs out, which bounds how long they may accept a deactivated user.
+
+    Hit and miss counts are added to shared counters every
+    JWT_USER_CACHE_STATS_INTERVAL seconds (see
+    `manage.py jwt_user_cache_stats`).
+    """
+    STATS = ('local_hits', 'shared_hits', 'misses')
+
+    def __init__(self):
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.unflushed = Counter()
+        self.flushed_at = time.monotonic()
+
+    def key(self, email, username):
+        digest = hashlib.md5(
+            '{}:{}'.format(email, username).encode('utf-8')).hexdigest()
+        return 'jwt-user:{}'.format(digest)
+
+    def generation_key(self, key):
+        return '{}:generation'.format(key)
+
+    def start_generation(self, key, replace=True):
+        """
+        Starts a new generation of a user's shared entry, or with
+        `replace=False` one only if it has none
+        """
+        # outlives the entries of the generation; once it expires they
+        # are misses
+        store = cache.set if replace else cache.add
+        store(self.generation_key(key), uuid.uuid4().hex,
+              settings.JWT_USER_CACHE_TTL * 2)
+
+    def stats_key(self, counter):
+        return 'jwt-user-stats:{}'.format(counter)
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+            self.unflushed[counter] += 1
+            due = (time.monotonic() - self.flushed_at >=
+                   settings.JWT_USER_CACHE_STATS_INTERVAL)
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """
+        Adds the counts of this process since the last flush to the
+        shared counters
+        """
+        with self.lock:
+            unflushed, self.unflushed = self.unflushed, Counter()
+            self.flushed_at = time.monotonic()
+        for counter, number in unflushed.items():
+            key = self.stats_key(counter)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, number)
+            except ValueError:
+                cache.add(key, number, None)
+
+    def stats(self):
+        """
+        The shared hit and miss counts of all processes
+        """
+        counts = cache.get_many(
+            [self.stats_key(counter) for counter in self.STATS])
+        return {
+            counter: counts.get(self.stats_key(counter), 0)
+            for counter in self.STATS
+        }
+
+    def reset_stats(self):
+        cache.delete_many(
+            [self.stats_key(counter) for counter in self.STATS])
+
+    def get(self, email, username):
+        """
+        Gets the user with the email and username of a token, or None
+        """
+        key = self.key(email, username)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.local.get(key)
+            hit = entry is not None and entry[0] > now
+            if hit:
+                self.local.move_to_end(key)
+        if hit:
+            self.count('local_hits')
+            return self.build(entry[1])
+
+        generation_key = self.generation_key(key)
+        shared = cache.get_many([key, generation_key])
+        generation = shared.get(generation_key)
+        entry = shared.get(key)
+        if (entry is not None and generation is not None and
+                entry[0] == generation):
+            self.count('shared_hits')
+            state = entry[1]
+        else:
+            self.count('misses')
+            if generation is None:
+                self.start_generation(key, replace=False)
+                generation = cache.get(generation_key)
+            state = get_user_model().objects.filter(
+                email=email, username=username
+            ).values_list(*get_user_fields()).first()
+            if state is None:
+                return None
+            cache.set(key, (generation, state), settings.JWT_USER_CACHE_TTL)
+
+        with self.lock:
+            self.local[key] = (now + settings.JWT_USER_CACHE_LOCAL_TTL, state)
+            self.local.move_to_end(key)
+            while len(self.local) > settings.JWT_USER_CACHE_SIZE:
+                self.local.popitem(last=False)
+        return self.build(state)
+
+    def build(self, state):
+        """
+        Builds a user instance from its cached fields
+        """
+        User = get_user_model()
+        return User.from_db(User.objects.db, get_user_fields(), state)
+
+    def invalidate(self, email, username):
+        key = self.key(email, username)
+        self.start_generation(key)
+        with self.lock:
+            self.local.pop(key, None)
+
+    def clear(self):
+        """
+        Empties the local tier and resets the counters
+        """
+        with self.lock:
+            self.local.clear()
+            self.counters.clear()
+            self.unflushed.clear()
+
+
+user_cache = UserCache()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from authors.apps.authentication.cache import user_cache
+
+
+class Command(BaseCommand):
+    """
+    Shows the hit and miss counts of the authentication user cache,
+    summed over every process since the counts were last reset
+    """
+    help = 'Shows how often authenticated users are found in the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Start counting again after showing the counts')
+
+    def handle(self, *args, **options):
+        stats = user_cache.stats()
+        lookups = sum(stats.values())
+        hits = stats['local_hits'] + stats['shared_hits']
+        self.stdout.write(
+            '{} lookup(s): {} local hit(s), {} shared hit(s), {} miss(es), '
+            '{:.1%} hit rate'.format(
+                lookups, stats['local_hits'], stats['shared_hits'],
+                stats['misses'], hits / lookups if lookups else 0))
+        if options['reset']:
+            user_cache.reset_stats()
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        # serves the case insensitive username prefix search of the
+        # profiles list
+        migrations.RunSQL(
+            'CREATE INDEX user_username_lower_idx '
+            'ON authentication_user (lower(username) text_pattern_ops)',
+            'DROP INDEX user_username_lower_idx'),
+    ]
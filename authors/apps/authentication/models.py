@@ -4,10 +4,28 @@ from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
+from .cache import user_cache
 
-class UserManager(BaseUserManager):
+
+class UserQuerySet(models.QuerySet):
+    """
+    Users, whose bulk updates also drop them from the authentication
+    cache, as updates send no signals
+    """
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            identities = list(self.values_list('email', 'username'))
+            updated = super().update(**kwargs)
+            invalidate_cached_identities(identities)
+        return updated
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """
     Django requires that custom users define their own Manager class. By
     inheriting from `BaseUserManager`, we get a lot of the same code used by
@@ -118,6 +136,13 @@ class User(AbstractBaseUser, PermissionsMixin):
         """
         return self.username
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(User, cls).from_db(db, field_names, values)
+        instance._cached_identity = (
+            instance.__dict__.get('email'), instance.__dict__.get('username'))
+        return instance
+
     def token(self):
         """
         This method allows us to get the jwt token by calling the user.token
@@ -140,3 +165,35 @@ class User(AbstractBaseUser, PermissionsMixin):
             }, settings.SECRET_KEY, algorithm='HS256'
             )
         return token.decode('utf-8')
+
+
+def invalidate_cached_identities(identities):
+    """
+    Drops the users with the (email, username) identities from the
+    authentication cache now and again once the current transaction
+    commits, as lookups may cache the rows from before the commit in
+    between
+    """
+    identities = set(identities)
+
+    def invalidate():
+        for email, username in identities:
+            user_cache.invalidate(email, username)
+
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops a saved or deleted user from the authentication cache, under
+    both its current and its loaded email and username
+    """
+    identities = [(instance.email, instance.username)]
+    email, username = getattr(instance, '_cached_identity', (None, None))
+    if (email, username) != (None, None):
+        identities.append((email, username))
+    invalidate_cached_identities(identities)
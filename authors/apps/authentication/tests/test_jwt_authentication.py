@@ -1,6 +1,17 @@
-from authors.apps.authentication.tests.basetests import BaseTest
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
 from rest_framework import status
 
+from authors.apps.authentication.cache import (UserCache, get_user_fields,
+                                               user_cache)
+from authors.apps.authentication.models import User
+from authors.apps.authentication.tests.basetests import BaseTest
+
 
 class TestTokenAuthentication(BaseTest):
     """
@@ -89,3 +100,127 @@ class TestTokenAuthentication(BaseTest):
         response = self.client.patch(self.update_url)
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestUserCache(BaseTest):
+    """
+    This class handles the testing of the authenticated user cache
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            'cached', 'cached@gmail.com', 'HDello14#')
+        self.user.is_verified = True
+        self.user.save()
+        user_cache.clear()
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user.token())
+
+    def test_user_lookup_cached(self):
+        self.assertEqual(self.client.get(self.get_url).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(user_cache.counters['misses'], 1)
+        with self.assertNumQueries(0):
+            user = user_cache.get(self.user.email, self.user.username)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_verified)
+        self.assertEqual(user.created_at, self.user.created_at)
+        self.assertEqual(user_cache.counters['local_hits'], 1)
+
+    def test_shared_tier(self):
+        user_cache.get(self.user.email, self.user.username)
+        user_cache.local.clear()
+        with self.assertNumQueries(0):
+            user_cache.get(self.user.email, self.user.username)
+        self.assertEqual(user_cache.counters['shared_hits'], 1)
+
+    @override_settings(JWT_USER_CACHE_SIZE=1)
+    def test_local_tier_bounded(self):
+        user_cache.get(self.user.email, self.user.username)
+        user_cache.get('other@gmail.com', 'other')
+        user_cache.get('ian@gmail.com', 'ian')
+        self.assertEqual(len(user_cache.local), 1)
+
+    def test_deactivated_user_invalidated(self):
+        self.client.get(self.get_url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.get_url)
+        self.assertEqual(
+            response.data['detail'], 'Your account is not active!')
+
+    @override_settings(JWT_USER_CACHE_LOCAL_TTL=0)
+    def test_invalidation_reaches_other_processes(self):
+        # another process shares the Django cache but not the local tier
+        other = UserCache()
+        other.get(self.user.email, self.user.username)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = other.get(self.user.email, self.user.username)
+        self.assertFalse(user.is_active)
+        self.assertEqual(other.counters['misses'], 2)
+
+    def test_entry_read_before_change_not_used(self):
+        email, username = self.user.email, self.user.username
+        state = User.objects.filter(pk=self.user.pk).values_list(
+            *get_user_fields()).first()
+        user_cache.get(email, username)
+        generation = cache.get(
+            user_cache.generation_key(user_cache.key(email, username)))
+        self.user.is_active = False
+        self.user.save()
+        # a lookup that read the user before the change stores it after
+        cache.set(user_cache.key(email, username), (generation, state))
+        self.assertFalse(user_cache.get(email, username).is_active)
+
+    def test_entry_cached_before_commit_not_used(self):
+        email, username = self.user.email, self.user.username
+        state = User.objects.filter(pk=self.user.pk).values_list(
+            *get_user_fields()).first()
+        committed = []
+        with patch.object(transaction, 'on_commit', committed.append):
+            with transaction.atomic():
+                self.user.is_active = False
+                self.user.save()
+                # a lookup caching the user before the commit
+                key = user_cache.key(email, username)
+                cache.set(key, (cache.get(user_cache.generation_key(key)),
+                                state))
+        for callback in committed:
+            callback()
+        self.assertFalse(user_cache.get(email, username).is_active)
+
+    def test_bulk_update_invalidated(self):
+        self.client.get(self.get_url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(self.get_url)
+        self.assertEqual(
+            response.data['detail'], 'Your account is not active!')
+
+    @override_settings(JWT_USER_CACHE_STATS_INTERVAL=0)
+    def test_stats_shared(self):
+        user_cache.reset_stats()
+        user_cache.get(self.user.email, self.user.username)
+        user_cache.get(self.user.email, self.user.username)
+        self.assertEqual(user_cache.stats(), {
+            'local_hits': 1, 'shared_hits': 0, 'misses': 1})
+        output = StringIO()
+        call_command('jwt_user_cache_stats', reset=True, stdout=output)
+        self.assertEqual(
+            output.getvalue(), '2 lookup(s): 1 local hit(s), 0 shared '
+            'hit(s), 1 miss(es), 50.0% hit rate\n')
+        self.assertEqual(user_cache.stats()['misses'], 0)
+
+    def test_renamed_user_invalidated(self):
+        token = self.user.token()
+        self.client.get(self.get_url)
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        user.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+        response = self.client.get(self.get_url)
+        self.assertEqual(
+            response.data['detail'],
+            'No user was found from the provided token!')
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def profile_key(user_id):
+    return 'profile:{}'.format(user_id)
+
+
+def get_profile_fragment(user_id):
+    return cache.get(profile_key(user_id))
+
+
+def set_profile_fragment(user_id, representation):
+    cache.set(profile_key(user_id), representation,
+              settings.PROFILE_CACHE_TTL)
+
+
+def expire_profiles(*user_ids):
+    """
+    Drops the cached representations of the profiles of the users, and
+    inside a transaction again once it commits, as readers may cache
+    the rows from before the commit in between
+    """
+    keys = [profile_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
 
 from cloudinary.models import CloudinaryField
 from cloudinary import CloudinaryImage
 
+from .cache import expire_profiles
+
 User = get_user_model()
 
 
@@ -73,3 +75,29 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender=Profile)
+def expire_cached_profile(sender, instance, **kwargs):
+    expire_profiles(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def expire_cached_follow_profiles(sender, instance, action, reverse,
+                                  pk_set, **kwargs):
+    """
+    Drops the cached profiles whose follower or following counts a
+    follow or unfollow changed
+    """
+    if action == 'pre_clear':
+        # the profiles on the other side are gone after the clear
+        related = instance.w_following if reverse else instance.following
+        instance._cleared_profiles = set(
+            related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_profiles', None)
+    elif action not in ('post_add', 'post_remove'):
+        return
+    expire_profiles(instance.user_id, *Profile.objects.filter(
+        pk__in=pk_set or ()).values_list('user_id', flat=True))
@@ -1,6 +1,16 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
 
 from .models import Profile
+from authors.apps.articles.models import Article
 from authors.utils.baseserializer import BaseSerializer
 
 
@@ -26,6 +36,11 @@ class UserProfileSerializer(BaseSerializer):
             return None
         if request.user.is_anonymous:
             return False
+        # ids of the listed profiles the user follows, when looked up for
+        # the whole list at once
+        followed = self.context.get('followed', None)
+        if followed is not None:
+            return instance.pk in followed
 
         my_profile = request.user.profile
         follow_status = my_profile.if_following(instance)
@@ -43,6 +58,58 @@ class UserProfileSerializer(BaseSerializer):
         )
 
 
+class ProfileCursorPaginator(BasePagination):
+    """
+    Keyset pagination of profiles by username.
+
+    Each page is a range scan of the unique username index from the
+    username of the last profile of the page before. The pages only go
+    forwards.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 20
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            username, = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(username, str):
+            raise NotFound(self.invalid_cursor_message)
+        return username
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        queryset = queryset.order_by('user__username')
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(user__username__gt=position)
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [self.page[-1].user.username]).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return OrderedDict([
+            ("pageCount", len(self.page)),
+            ('next', self.get_next_link()),
+            ('profiles', data)
+        ])
+
+
 class UpdateUserProfileSerializer(serializers.ModelSerializer):
     """
     Serializer class for updating user profile
@@ -82,3 +149,90 @@ class UserListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = '__all__'
+
+
+class ProfileArticleSerializer(serializers.ModelSerializer):
+    """
+    Summary of an article listed on its author's profile, read from the
+    article's own row
+    """
+    image_url = serializers.ReadOnlyField(source='get_image')
+    tagList = serializers.ReadOnlyField(source='tag_names')
+
+    class Meta:
+        model = Article
+        fields = (
+            'slug', 'title', 'description', 'image_url', 'tagList',
+            'readtime', 'created_at', 'updated_at'
+        )
+
+
+class ProfileArticlesCursorPaginator(BasePagination):
+    """
+    Keyset pagination of an author's articles, newest first.
+
+    Each page is a range scan of the (author, created_at, id) index from
+    the last article of the page before. The pages only go forwards.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = 10
+
+    def encode_cursor(self, article):
+        return base64.urlsafe_b64encode(json.dumps(
+            [article.created_at.isoformat(), article.pk]
+        ).encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            created_at, pk = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        return self.get_page(queryset, self.decode_cursor(request))
+
+    def get_page(self, queryset, position=None):
+        """
+        Gets the page of articles after a (created_at, id) position, or
+        the first page
+        """
+        queryset = queryset.order_by('-created_at', '-id')
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=pk))
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_cursor(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return OrderedDict([
+            ("pageCount", len(self.page)),
+            ('next', self.get_next_link()),
+            ('results', data)
+        ])
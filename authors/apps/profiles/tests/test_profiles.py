@@ -1,5 +1,10 @@
+from django.core.cache import cache
+from django.test import override_settings
 from rest_framework import status
+from rest_framework.reverse import reverse
 
+from authors.apps.articles.models import Article
+from authors.apps.authentication.models import User
 from authors.apps.profiles.tests.basetests import BaseTest
 
 
@@ -75,3 +80,159 @@ class TestViewProfile(BaseTest):
         response = self.list_profiles()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIsInstance(response.data.get("profiles")[0], dict)
+
+
+@override_settings(PROFILE_ARTICLES_PAGE_SIZE=2)
+class TestProfileArticles(BaseTest):
+    """
+    Tests the profile's article summaries and their cache
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.articles = [
+            Article.objects.create(
+                title="Article {}".format(i), description="Summary",
+                body="Body", author=self.user)
+            for i in range(3)
+        ]
+        self.profile_url = reverse("profiles:profile", args=["adam"])
+        self.articles_url = reverse("profiles:articles", args=["adam"])
+
+    def test_profile_has_counts_and_first_page(self):
+        """
+        Test the profile carries counts and the newest articles only
+        """
+        self.user1.profile.follow(self.user.profile)
+        response = self.client.get(self.profile_url)
+        profile = response.data["profile"]
+        self.assertEqual(
+            (profile["articlesCount"], profile["followersCount"],
+             profile["followingCount"]), (3, 1, 0))
+        self.assertEqual([
+            article["title"] for article in profile["articles"]
+        ], ["Article 2", "Article 1"])
+        self.assertNotIn("body", profile["articles"][0])
+        self.assertFalse(profile["following"])
+
+        response = self.client.get(profile["articlesNext"])
+        self.assertEqual(response.data["next"], None)
+        self.assertEqual([
+            article["title"]
+            for article in response.data["results"]["articles"]
+        ], ["Article 0"])
+
+    def test_cached_profile_served_without_article_queries(self):
+        """
+        Test a cached profile only looks up the user and follow status
+        """
+        self.client.get(self.profile_url)
+        self.is_authenticated("eric@gmail.com", "@Us3r.com")
+        with self.assertNumQueries(3):
+            # the authenticated user, the profile and the follow status
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.data["profile"]["articlesCount"], 3)
+
+    def test_changes_expire_the_cache(self):
+        """
+        Test profile, article and follow changes show up straight away
+        """
+        self.client.get(self.profile_url)
+        self.articles[0].delete()
+        self.user.profile.bio = "Changed"
+        self.user.profile.save()
+        self.user1.profile.follow(self.user.profile)
+        profile = self.client.get(self.profile_url).data["profile"]
+        self.assertEqual(profile["bio"], "Changed")
+        self.assertEqual(
+            (profile["articlesCount"], profile["followersCount"]), (2, 1))
+        self.assertIsNone(profile["articlesNext"])
+
+        self.user1.profile.unfollow(self.user.profile)
+        profile = self.client.get(self.profile_url).data["profile"]
+        self.assertEqual(profile["followersCount"], 0)
+
+    @override_settings(PROFILE_ARTICLES_MAX_PAGE_SIZE=2)
+    def test_page_limit_capped(self):
+        """
+        Test a page never holds more than the maximum of articles
+        """
+        response = self.client.get(self.articles_url, {"page_limit": 1000})
+        self.assertEqual(response.data["pageCount"], 2)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_articles_of_unknown_user(self):
+        """
+        Test listing the articles of a user that does not exist
+        """
+        response = self.client.get(
+            reverse("profiles:articles", args=["nobody"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestProfileList(BaseTest):
+    """
+    Tests paging and searching the user directory
+    """
+
+    def setUp(self):
+        super().setUp()
+        for username in ("Bob", "ben", "carl"):
+            User.objects.create_user(
+                username=username, email="{}@gmail.com".format(username),
+                password="@Us3r.com")
+        self.list_url = reverse("profiles:list_users")
+
+    def usernames(self, response):
+        return [
+            profile["username"] for profile in response.data["profiles"]
+        ]
+
+    def test_profiles_paged_in_username_order(self):
+        """
+        Test the next links walk every profile once
+        """
+        response = self.client.get(self.list_url, {"page_limit": 2})
+        self.assertEqual(response.data["pageCount"], 2)
+        usernames = self.usernames(response)
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            usernames += self.usernames(response)
+        self.assertEqual(usernames, list(User.objects.order_by(
+            "username").values_list("username", flat=True)))
+
+    def test_invalid_page_limit_and_cursor(self):
+        """
+        Test bad page limits and cursors are rejected
+        """
+        response = self.client.get(self.list_url, {"page_limit": "none"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["detail"], "Invalid page limit")
+        response = self.client.get(self.list_url, {"cursor": "bad"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prefix_search_ignores_case(self):
+        """
+        Test only usernames starting with the prefix are listed
+        """
+        response = self.client.get(self.list_url, {"prefix": "B"})
+        self.assertEqual(self.usernames(response), ["Bob", "ben"])
+        response = self.client.get(self.list_url, {"prefix": "b%"})
+        self.assertEqual(self.usernames(response), [])
+
+    def test_follow_status_looked_up_once_per_page(self):
+        """
+        Test the following flags come from one query for the whole page
+        """
+        self.user.profile.follow(User.objects.get(username="ben").profile)
+        self.user.profile.follow(self.user1.profile)
+        self.is_authenticated("adam@gmail.com", "@Us3r.com")
+        # the user, the page of profiles and the followed ones
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        self.assertEqual({
+            profile["username"]: profile["following"]
+            for profile in response.data["profiles"]
+        }, {"Bob": False, "adam": False, "ben": True, "carl": False,
+            "eri": True})
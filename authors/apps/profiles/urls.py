@@ -3,7 +3,7 @@ from django.urls import include, path
 from django.conf.urls import url
 from authors.apps.profiles.views import (
     UserProfileView, UpdateUserProfileView,
-    UserListView, MyFollowersAPI, FollowAPI)
+    UserListView, MyFollowersAPI, FollowAPI, ProfileArticlesView)
 
 app_name = 'profiles'
 
@@ -11,6 +11,8 @@ urlpatterns = [
     path('profiles/<str:username>', UserProfileView.as_view(), name='profile'),
     path('profiles/<str:username>/',
          UpdateUserProfileView.as_view(), name='update_profile'),
+    path('profiles/<str:username>/articles/',
+         ProfileArticlesView.as_view(), name='articles'),
     path('profiles/<username>/followers/', MyFollowersAPI.as_view()),
     path('profiles/<username>/follow/', FollowAPI.as_view(), name='follow'),
     path('profiles/<str:username>/',
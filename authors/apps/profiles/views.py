@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
 from rest_framework.exceptions import APIException
 from rest_framework.generics import GenericAPIView, ListAPIView
 from rest_framework import permissions, status
@@ -7,12 +9,16 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from authors.apps.authentication.models import User
 from .exceptions import *
 import json
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
 from .serializers import (
     UserProfileSerializer, UpdateUserProfileSerializer,
-    FollowingSerializer, FollowersListSerializer, UserListSerializer)
+    FollowingSerializer, FollowersListSerializer, UserListSerializer,
+    ProfileArticleSerializer, ProfileArticlesCursorPaginator,
+    ProfileCursorPaginator)
 
-from authors.apps.articles.serializers import ArticleSerializer
 from authors.apps.articles.models import Article
+from .cache import get_profile_fragment, set_profile_fragment
 from .models import Profile
 from .renderers import FollowersJSONRenderer
 
@@ -24,38 +30,95 @@ class UserProfileView(GenericAPIView):
     permission_classes = (AllowAny,)
     serializer_class = UserProfileSerializer
 
+    def profile_representation(self, profile):
+        """
+        The part of the profile that is the same for every user: the
+        profile, its counts and the first page of its articles, with
+        the cursor of the next page. It is cached until they change.
+        """
+        representation = get_profile_fragment(profile.user_id)
+        if representation is None:
+            paginator = ProfileArticlesCursorPaginator()
+            paginator.page_size = settings.PROFILE_ARTICLES_PAGE_SIZE
+            articles = Article.objects.filter(author_id=profile.user_id)
+            page = paginator.get_page(articles)
+            representation = dict(UserProfileSerializer(
+                profile, remove_fields=['articles', 'following']).data)
+            representation.update({
+                'articles': ProfileArticleSerializer(page, many=True).data,
+                'articlesCount': articles.count(),
+                'articlesCursor': paginator.get_next_cursor(),
+                'followersCount': profile.w_following.count(),
+                'followingCount': profile.following.count(),
+            })
+            set_profile_fragment(profile.user_id, representation)
+        return representation
+
     def get(self, request, username):
         """
         Endpoint for fetching user data from Profile model
         """
         try:
-            profile = Profile.objects.get(user__username=username)
+            profile = Profile.objects.select_related('user').get(
+                user__username=username)
         except Exception:
             return Response({
                 'errors': {
                     'user': ['User does not exist']
                 }
             }, status=status.HTTP_404_NOT_FOUND)
-        articles = Article.objects.filter(author__username=username)
-        articles_serializer = ArticleSerializer(
-            articles, many=True, context={'request': request},
-            remove_fields=['like_info', 'comments', 'favorites', 'ratings']
-        )
-        articles = articles_serializer.data
-        if request.user.username == username:
-            serializer = UserProfileSerializer(
-                profile, context={'request': request, 'articles': articles},
-                remove_fields=['following']
-            )
-        else:
-            serializer = UserProfileSerializer(
-                profile, context={'request': request, 'articles': articles}
-            )
+        data = dict(self.profile_representation(profile))
+        cursor = data.pop('articlesCursor')
+        data['articlesNext'] = cursor and replace_query_param(
+            request.build_absolute_uri(
+                reverse('profiles:articles', args=[username])),
+            ProfileArticlesCursorPaginator.cursor_query_param, cursor)
+        if request.user.username != username:
+            data['following'] = (
+                request.user.is_authenticated and
+                Profile.following.through.objects.filter(
+                    from_profile__user_id=request.user.pk,
+                    to_profile_id=profile.pk).exists())
         return Response({
-            'profile': serializer.data
+            'profile': data
         }, status=status.HTTP_200_OK)
 
 
+class ProfileArticlesView(GenericAPIView):
+    """
+    Lists the summaries of a user's articles, newest first
+    """
+    permission_classes = (AllowAny,)
+    serializer_class = ProfileArticleSerializer
+
+    def get(self, request, username):
+        """
+        Gets a page of the user's articles
+        """
+        user_id = User.objects.filter(username=username).values_list(
+            'id', flat=True).first()
+        if user_id is None:
+            raise UserNotFound
+        page_limit = request.GET.get(
+            'page_limit', str(settings.PROFILE_ARTICLES_PAGE_SIZE))
+        if not page_limit.isdigit() or int(page_limit) < 1:
+            return Response(
+                data={
+                    "detail": "Invalid page limit"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        paginator = ProfileArticlesCursorPaginator()
+        paginator.page_size = min(
+            int(page_limit), settings.PROFILE_ARTICLES_MAX_PAGE_SIZE)
+        articles = paginator.paginate_queryset(
+            Article.objects.filter(author_id=user_id), request)
+        serializer = self.serializer_class(articles, many=True)
+        return Response(paginator.get_paginated_response({
+            "articles": serializer.data
+        }))
+
+
 class UpdateUserProfileView(GenericAPIView):
     """
     A class for updating user profile
@@ -180,15 +243,42 @@ class MyFollowersAPI(GenericAPIView):
 
 class UserListView(ListAPIView):
     """
-    A class for getting all user profiles
+    A class for getting all user profiles, a page at a time in username
+    order
     """
     permission_classes = (AllowAny,)
     serializer_class = UserProfileSerializer
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.select_related('user')
 
     def list(self, request):
-        queryset = self.queryset.filter()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'profiles': serializer.data
-        }, status=status.HTTP_200_OK)
+        page_limit = request.GET.get(
+            'page_limit', str(settings.PROFILE_LIST_PAGE_SIZE))
+        if not page_limit.isdigit() or int(page_limit) < 1:
+            return Response(
+                data={
+                    "detail": "Invalid page limit"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        queryset = self.queryset.all()
+        prefix = request.GET.get('prefix', '').strip()
+        if prefix:
+            # matches the lower(username) index of the users
+            queryset = queryset.annotate(
+                username_lower=Lower('user__username')
+            ).filter(username_lower__startswith=prefix.lower())
+        paginator = ProfileCursorPaginator()
+        paginator.page_size = min(
+            int(page_limit), settings.PROFILE_LIST_MAX_PAGE_SIZE)
+        profiles = paginator.paginate_queryset(queryset, request)
+        context = self.get_serializer_context()
+        if request.user.is_authenticated:
+            context['followed'] = set(
+                Profile.following.through.objects.filter(
+                    from_profile__user_id=request.user.pk,
+                    to_profile_id__in=[profile.pk for profile in profiles]
+                ).values_list('to_profile_id', flat=True))
+        serializer = self.serializer_class(
+            profiles, many=True, context=context)
+        return Response(paginator.get_paginated_response(serializer.data),
+                        status=status.HTTP_200_OK)
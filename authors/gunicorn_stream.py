@@ -0,0 +1,23 @@
+"""
+Gunicorn settings of the stream process, which only serves the
+notification streams (notifications/stream/):
+
+    gunicorn authors.wsgi --config authors/gunicorn_stream.py
+
+Each stream is a greenlet rather than a thread, so one worker holds
+STREAM_WORKER_CONNECTIONS open streams, apart from the web workers that
+serve the rest of the API. Streams close their database connection
+while they wait, so the database only sees the streams being woken.
+"""
+import os
+
+bind = '0.0.0.0:{}'.format(os.getenv('STREAM_PORT', os.getenv('PORT', 8001)))
+worker_class = 'gevent'
+workers = int(os.getenv('STREAM_WORKERS', 1))
+worker_connections = int(os.getenv('STREAM_WORKER_CONNECTIONS', 1000))
+
+
+def post_fork(server, worker):
+    # lets other streams run while one waits on the database
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -191,6 +191,8 @@ WSGI_APPLICATION = 'authors.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
+# PostgreSQL only: the articles and notifications use its array, full
+# text search and GIN index features
 
 DATABASES = {
     'default': {
@@ -289,3 +291,151 @@ DJANGO_NOTIFICATIONS_CONFIG = {
     'USE_JSONFIELD': True,
     'SOFT_DELETE': True
 }
+
+# Cache shared by every process: the web workers, the workers and the
+# management commands. It is set from CACHE_URL (or the REDIS_URL of a
+# Redis add-on), e.g. redis://host:6379/0, memcache://host:11211 or
+# dbcache://table_name. Changes to users, articles and profiles only
+# drop their cached copies in the other processes through it. Without
+# either, each process caches in its own memory, which only suits
+# development and tests.
+CACHE_URL = os.getenv('CACHE_URL', os.getenv('REDIS_URL'))
+CACHES = {
+    'default': environ.Env.cache_url_config(CACHE_URL or 'locmemcache://')
+}
+
+# Users authenticated by JWT are cached per process for
+# JWT_USER_CACHE_LOCAL_TTL seconds (at most JWT_USER_CACHE_SIZE of them)
+# and in the shared cache for JWT_USER_CACHE_TTL seconds. A change to a
+# user reaches the other processes' local copies only when they expire,
+# so a deactivated user may be accepted there for that long. Hit and
+# miss counts are shared every JWT_USER_CACHE_STATS_INTERVAL seconds.
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_LOCAL_TTL = 10
+JWT_USER_CACHE_TTL = 300
+JWT_USER_CACHE_STATS_INTERVAL = 60
+
+# Seconds that the user independent part of an article's representation
+# is cached for. Changes to the article replace it before then.
+ARTICLE_CACHE_TTL = 60 * 60
+
+# Seconds that the user independent part of a profile (its counts and
+# first page of articles) is cached for. Changes to the profile, its
+# articles and its follows drop it before then.
+PROFILE_CACHE_TTL = 60 * 10
+PROFILE_ARTICLES_PAGE_SIZE = 10
+PROFILE_ARTICLES_MAX_PAGE_SIZE = 100
+
+# Profiles per page of the user directory, unless asked for fewer
+PROFILE_LIST_PAGE_SIZE = 20
+PROFILE_LIST_MAX_PAGE_SIZE = 100
+
+# Seconds that the snapshot of tags and their article counts is cached
+# for. Tag changes drop it before then.
+TAG_DIRECTORY_CACHE_TTL = 60 * 10
+
+# Trending articles. Each event adds its weight to the article's
+# trending score (ratings scaled by stars / 5) and scores halve every
+# TRENDING_HALF_LIFE seconds. decay_trending_scores, run every few
+# minutes, decays all scores and drops those below TRENDING_MIN_SCORE.
+# Views are counted in the cache and added to the scores by that run.
+TRENDING_HALF_LIFE = 60 * 60 * 24
+TRENDING_WEIGHTS = {
+    'view': 0.1,
+    'like': 1.0,
+    'comment': 2.0,
+    'rating': 2.0,
+    'favorite': 3.0,
+}
+TRENDING_MIN_SCORE = 0.01
+
+# Home timelines. New articles are pushed to the timelines of their
+# author's followers, unless the author has more than
+# TIMELINE_PUSH_MAX_FOLLOWERS followers, in which case their articles
+# are merged in when timelines are read. Following an author adds
+# their latest TIMELINE_BACKFILL_SIZE articles.
+TIMELINE_PUSH_MAX_FOLLOWERS = 1000
+TIMELINE_BACKFILL_SIZE = 20
+
+# Backend of the article search (`?q=` on the article list). The
+# InvertedIndexBackend keeps its index in ARTICLE_SEARCH_INDEX_PATH.
+ARTICLE_SEARCH_BACKEND = os.getenv(
+    'ARTICLE_SEARCH_BACKEND',
+    'authors.apps.articles.search.postgres.PostgresSearchBackend')
+ARTICLE_SEARCH_INDEX_PATH = os.getenv(
+    'ARTICLE_SEARCH_INDEX_PATH', os.path.join(BASE_DIR, 'search_index.json'))
+
+# Notification fan-out jobs (see `manage.py run_notification_jobs`)
+NOTIFICATION_JOB_CHUNK_SIZE = 500
+NOTIFICATION_JOB_MAX_ATTEMPTS = 5
+NOTIFICATION_JOB_RETRY_DELAY = 60
+NOTIFICATION_JOB_LOCK_TIMEOUT = 600
+# Seconds over which edits to an article are coalesced into one
+# "article updated" notification to its author's followers. Unset to
+# only notify followers of new articles.
+ARTICLE_UPDATE_NOTIFICATION_WINDOW = os.getenv(
+    'ARTICLE_UPDATE_NOTIFICATION_WINDOW')
+if ARTICLE_UPDATE_NOTIFICATION_WINDOW:
+    ARTICLE_UPDATE_NOTIFICATION_WINDOW = int(
+        ARTICLE_UPDATE_NOTIFICATION_WINDOW)
+# Seconds over which comments on an article are coalesced into one
+# notification ("5 new comments on ...") to the users who favorited it
+COMMENT_NOTIFICATION_WINDOW = int(
+    os.getenv('COMMENT_NOTIFICATION_WINDOW', 60))
+# Seconds from the first comment notification of a user about an
+# article during which later ones update it ("jim and 4 others
+# commented on ...") instead of adding notifications, and the number of
+# actors named in it
+NOTIFICATION_GROUP_WINDOW = int(
+    os.getenv('NOTIFICATION_GROUP_WINDOW', 60 * 60))
+NOTIFICATION_GROUP_LATEST_ACTORS = 3
+
+# Notification streams (notifications/stream/), served by the stream
+# process (see authors/gunicorn_stream.py). The RedisBroker publishes
+# changes on NOTIFICATION_STREAM_CHANNEL and has one thread per process
+# wake the streams of that process, so idle streams make no queries and
+# see changes made by every process. Without Redis, the PollingBroker
+# reads the user's notification counter every
+# NOTIFICATION_STREAM_POLL_INTERVAL seconds, and the MemoryBroker only
+# sees the changes made in its own process.
+NOTIFICATION_STREAM_REDIS_URL = os.getenv(
+    'NOTIFICATION_STREAM_REDIS_URL', os.getenv('REDIS_URL'))
+NOTIFICATION_STREAM_BROKER = os.getenv(
+    'NOTIFICATION_STREAM_BROKER',
+    'authors.apps.appnotifications.stream.RedisBroker'
+    if NOTIFICATION_STREAM_REDIS_URL else
+    'authors.apps.appnotifications.stream.PollingBroker')
+NOTIFICATION_STREAM_CHANNEL = 'notification-streams'
+NOTIFICATION_STREAM_POLL_INTERVAL = 5
+NOTIFICATION_STREAM_HEARTBEAT = 15
+NOTIFICATION_STREAM_TIMEOUT = 60 * 5
+NOTIFICATION_STREAM_BATCH_SIZE = 50
+# milliseconds clients wait before reconnecting
+NOTIFICATION_STREAM_RETRY = 3000
+# seconds a token from notifications/stream/token/ opens a stream for
+NOTIFICATION_STREAM_TOKEN_MAX_AGE = 60
+
+# Email outbox (see `manage.py send_queued_emails`). Each batch of due
+# emails is sent over one connection; failed emails are retried with a
+# backoff of EMAIL_OUTBOX_RETRY_DELAY * 2 ** attempts seconds.
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_LOCK_TIMEOUT = 600
+# Sent and dead emails are deleted EMAIL_OUTBOX_RETENTION_DAYS after
+# being sent or queued (see `manage.py prune_outbox`).
+EMAIL_OUTBOX_RETENTION_DAYS = int(
+    os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+EMAIL_OUTBOX_RETENTION_BATCH_SIZE = 1000
+# Notification digests (see `manage.py send_notification_digests`) for
+# users who chose hourly or daily emails. A digest lists at most
+# NOTIFICATION_DIGEST_MAX_ITEMS notifications.
+NOTIFICATION_DIGEST_BATCH_SIZE = 100
+NOTIFICATION_DIGEST_MAX_ITEMS = 50
+# Notification retention (see `manage.py prune_notifications`). Read
+# and deleted notifications older than NOTIFICATION_RETENTION_DAYS are
+# moved to the archive table, which the notification list only reads
+# with ?archived=true.
+NOTIFICATION_RETENTION_DAYS = int(
+    os.getenv('NOTIFICATION_RETENTION_DAYS', 90))
+NOTIFICATION_RETENTION_BATCH_SIZE = 1000
@@ -6,4 +6,6 @@ USER_FOLLOWING = "user_following"
 
 ARTICLE_CREATION = "article_created"
 
+ARTICLE_UPDATED = "article_updated"
+
 COMMENT_CREATED = "comment_created"
@@ -1,3 +1,17 @@
+import re
+
+WORD_PATTERN = re.compile(r'\S+')
+
+
+def count_words(*texts):
+    """
+    Counts whitespace separated words in texts without building
+    word lists
+    """
+    return sum(
+        1 for text in texts for word in WORD_PATTERN.finditer(text or ''))
+
+
 class ArticleTimer:
     """
     Read timer class for articles
@@ -26,33 +40,25 @@ class ArticleTimer:
         """
         return self.article.description
 
-    def get_tags(self):
+    def count_text_words(self):
         """
-        Gets all words on a tag
+        Counts the words in the title, body and description
         """
-        tag_words = []
-        [tag_words.extend(tagword.split()) for tagword in self.article.tagList]
-        return tag_words
+        return count_words(
+            self.get_title(), self.get_body(), self.get_description())
 
-    def get_article_info(self):
+    def get_word_count(self):
         """
-        Gets the whole informnation of an article
+        Gets the stored number of words in the article and its tags
         """
-        info = []
-        info.extend(self.get_title().split())
-        info.extend(self.get_body().split())
-        info.extend(self.get_description().split())
-        info.extend(self.get_tags())
-        return info
+        return self.article.word_count + self.article.tag_word_count
 
     def check_image(self):
         """
         Checks whether an article has an image or not
         """
-        has_image = True
-        if (self.article.get_image() ==
-                "No image uploaded") or not self.article.get_image():
-            has_image = False
+        has_image = bool(self.article.image)
+        if not has_image:
             self.image_adjustment_time = 0
         return has_image
 
@@ -60,11 +66,8 @@ class ArticleTimer:
         """
         Gets the read time of the article
         """
-        word_length = len(self.get_article_info())
-        read_time = 0
+        timer = self.get_word_count()/self.words_per_minute
         self.check_image()
-        if word_length:
-            timer = word_length/self.words_per_minute
         if timer < 1:
             read_time = str(
                 round((timer+self.image_adjustment_time)*60))+" second(s)"
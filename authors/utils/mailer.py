@@ -1,8 +1,19 @@
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 
 
+def queue_emails(messages):
+    """
+    Adds email messages to the outbox in one insert, to be sent by the
+    send_queued_emails command
+    """
+    from authors.apps.appnotifications.models import OutboxEmail
+
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail.from_message(message) for message in messages])
+
+
 class VerificationMail:
     """
     Email class for sending verification mail
@@ -34,10 +45,10 @@ class VerificationMail:
 
     def send_mail(self):
         """
-        Sends the composed email
+        Queues the composed email
         """
         self.compose_mail()
-        self.message.send()
+        queue_emails([self.message])
 
 
 class ConfirmationMail:
@@ -71,7 +82,96 @@ class ConfirmationMail:
 
     def send_mail(self):
         """
-        Sends the composed email
+        Queues the composed email
+        """
+        self.compose_mail()
+        queue_emails([self.message])
+
+
+class NotificationMail:
+    """
+    Email class for sending one notification to many users
+    """
+
+    def __init__(self, description, resource_url, recipients):
+        self.description = description
+        self.resource_url = resource_url
+        self.recipients = recipients
+        self.messages = []
+
+    def compose_mail(self):
+        """
+        Composes one email per (username, email, opt_out_link) recipient
+        """
+        self.messages = []
+        for username, email, opt_out_link in self.recipients:
+            html_body = render_to_string(
+                'notification_template.html', context={
+                    "opt_out_link": opt_out_link,
+                    "username": username,
+                    "description": self.description,
+                    "resource_url": self.resource_url
+                })
+            message = EmailMultiAlternatives(
+                subject="User Notification",
+                body='',
+                from_email=settings.DEFAULT_EMAIL,
+                to=[email]
+            )
+            message.attach_alternative(html_body, "text/html")
+            self.messages.append(message)
+
+    def send_mail(self):
+        """
+        Queues the composed emails
+        """
+        self.compose_mail()
+        if self.messages:
+            queue_emails(self.messages)
+
+
+class DigestMail:
+    """
+    Email class for sending users digests of their notifications
+    """
+
+    def __init__(self, recipients):
+        self.recipients = recipients
+        self.messages = []
+
+    def compose_mail(self):
+        """
+        Composes one email per (username, email, opt_out_link,
+        notifications) recipient, where notifications are the
+        (description, resource_url) pairs of the digest
+        """
+        self.messages = []
+        limit = settings.NOTIFICATION_DIGEST_MAX_ITEMS
+        for username, email, opt_out_link, notifications in self.recipients:
+            html_body = render_to_string(
+                'notification_template.html', context={
+                    "opt_out_link": opt_out_link,
+                    "username": username,
+                    "notifications": [
+                        {"description": description, "resource_url": url}
+                        for description, url in notifications[:limit]
+                    ],
+                    "more": max(len(notifications) - limit, 0)
+                })
+            message = EmailMultiAlternatives(
+                subject="You have {} new notification(s)".format(
+                    len(notifications)),
+                body='',
+                from_email=settings.DEFAULT_EMAIL,
+                to=[email]
+            )
+            message.attach_alternative(html_body, "text/html")
+            self.messages.append(message)
+
+    def send_mail(self):
+        """
+        Queues the composed emails
         """
         self.compose_mail()
-        self.message.send()
+        if self.messages:
+            queue_emails(self.messages)
@@ -1,103 +1,352 @@
 from django.conf import settings
-from django.core.mail import send_mail
+from django.contrib.contenttypes.models import ContentType
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Greatest
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from notifications.models import Notification
-from notifications.signals import notify
-from rest_framework.authtoken.models import Token
 
 from authors.apps.articles.models import Article, Comment, Favorite
 from authors.apps.authentication.models import User
+from authors.apps.profiles.models import Profile
+from authors.utils.mailer import NotificationMail
 
 from . import actions as verbs
 
 
 def create_article_handler(sender, instance, created, **kwargs):
     """
-    notification handler for articles
+    notification handler for articles, queues the fan-out to the
+    author's followers for run_notification_jobs.
+
+    New articles are fanned out straight away. When
+    ARTICLE_UPDATE_NOTIFICATION_WINDOW is set, edits to the content of
+    an article are coalesced into one job that runs once the window
+    has passed.
+    """
+    from authors.apps.appnotifications.models import NotificationJob
+
+    if created:
+        NotificationJob.objects.create(
+            kind=NotificationJob.ARTICLE_CREATED, article=instance)
+        return
+    window = settings.ARTICLE_UPDATE_NOTIFICATION_WINDOW
+    if not window or not getattr(instance, 'content_changed', False):
+        return
+    NotificationJob.objects.get_or_create(
+        kind=NotificationJob.ARTICLE_UPDATED, article=instance,
+        status=NotificationJob.PENDING, attempts=0,
+        defaults={
+            'run_after': timezone.now() + timezone.timedelta(seconds=window)
+        })
+
+
+OPT_OUT_SALT = 'authors.apps.appnotifications.opt_out'
+
+
+def get_opt_out_link(user_id):
+    """
+    Builds the email opt out link of a user. The link carries the
+    user's id signed with the secret key, so it is the same every time
+    and nothing is written to build it.
+    """
+    token = signing.Signer(salt=OPT_OUT_SALT).sign(str(user_id))
+    return '{}{}'.format(settings.DOMAIN, reverse(
+        "notifications:opt_out_link", args=[token]))
+
+
+def get_opt_out_user_id(token):
+    """
+    Reads the user id out of an opt out link's token, or returns None
+    when the token was not signed by us
+    """
+    try:
+        return int(signing.Signer(salt=OPT_OUT_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def group_notifications(user_ids, description, group, timestamp,
+                        **fields):
+    """
+    Folds an event into the open notification groups of its verb and
+    target of the users, updating the groups and their notifications in
+    place, and returns the ids of the users who have no open group.
+    `group` holds the action and the (id, username) actors, newest
+    first, of the event.
+    """
+    from authors.apps.appnotifications.models import (NotificationCounter,
+                                                      NotificationGroup)
+
+    groups = {
+        group.recipient_id: group
+        for group in NotificationGroup.objects.select_for_update(
+            of=('self',)
+        ).select_related('notification').filter(
+            recipient_id__in=user_ids,
+            verb=fields['verb'],
+            target_content_type=fields.get('target_content_type'),
+            target_object_id=fields.get('target_object_id'),
+            closes_at__gt=timestamp,
+            notification__deleted=False)
+    }
+    for recipient_id, open_group in groups.items():
+        open_group.add_actors([
+            actor for actor in group['actors'] if actor[0] != recipient_id])
+    NotificationGroup.objects.bulk_update(
+        groups.values(), ['actor_ids', 'latest_actors'])
+    Notification.objects.filter(
+        id__in=[open_group.pk for open_group in groups.values()]
+    ).update(description=description, timestamp=timestamp, unread=True,
+             **fields)
+    NotificationCounter.record({
+        open_group.recipient_id: 1 for open_group in groups.values()
+        if not open_group.notification.unread})
+    NotificationCounter.touch(
+        open_group.recipient_id for open_group in groups.values()
+        if open_group.notification.unread)
+    return [user_id for user_id in user_ids if user_id not in groups]
+
+
+def deliver(chunk, description, url, group=None, **fields):
+    """
+    Bulk inserts the in-app notifications and queues the emails of a
+    chunk of (cursor, user id, username, email, in app, by email, email
+    digest) recipient rows. Recipients on an hourly or daily digest get
+    a digest entry instead of an email. `fields` are the actor, verb,
+    target and action object of the notifications.
+
+    With a `group` (see group_notifications) the event updates the
+    recipients' open groups instead of adding notifications, and opens
+    groups for the others.
+    """
+    from authors.apps.appnotifications.models import (DigestEntry,
+                                                      NotificationCounter,
+                                                      NotificationGroup,
+                                                      UserNotification)
+
+    timestamp = timezone.now()
+    in_app = [user_id for _, user_id, _, _, in_app, _, _ in chunk if in_app]
+    if group is not None:
+        in_app = group_notifications(
+            in_app, description, group, timestamp, **fields)
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id,
+            description=description,
+            timestamp=timestamp,
+            data={'resource_url': url},
+            **fields
+        )
+        for user_id in in_app
+    ])
+    NotificationCounter.record({
+        notification.recipient_id: 1 for notification in notifications})
+    if group is not None:
+        closes_at = timestamp + timezone.timedelta(
+            seconds=settings.NOTIFICATION_GROUP_WINDOW)
+        groups = []
+        for notification in notifications:
+            new_group = NotificationGroup(
+                notification=notification,
+                recipient_id=notification.recipient_id,
+                verb=notification.verb,
+                target_content_type_id=notification.target_content_type_id,
+                target_object_id=notification.target_object_id,
+                action=group['action'], actor_ids=[], latest_actors=[],
+                closes_at=closes_at)
+            new_group.add_actors([
+                actor for actor in group['actors']
+                if actor[0] != notification.recipient_id])
+            groups.append(new_group)
+        NotificationGroup.objects.bulk_create(groups)
+    DigestEntry.objects.bulk_create([
+        DigestEntry(user_id=user_id, description=description,
+                    resource_url=url)
+        for _, user_id, _, _, _, by_email, digest in chunk
+        if by_email and digest != UserNotification.IMMEDIATE
+    ])
+    emailed = [
+        (username, email, get_opt_out_link(user_id))
+        for _, user_id, username, email, _, by_email, digest in chunk
+        if by_email and digest == UserNotification.IMMEDIATE
+    ]
+    if emailed:
+        NotificationMail(description, url, emailed).send_mail()
+
+
+def article_fan_out(job):
+    """
+    Notifies the followers of an article's author that it was posted
+    or updated, in chunks of
+    NOTIFICATION_JOB_CHUNK_SIZE, resuming after the job's cursor.
+
+    Each chunk loads the followers with their preferences in one query,
+    bulk inserts the in-app notifications and queues the emails before
+    recording its progress.
     """
-    title = instance.title
+    instance = Article.objects.select_related(
+        'author__profile').get(pk=job.article_id)
     article_author = instance.author.profile
-    followers = article_author.followers_list()
-    description = "{} posted an article '{}' on {}".format(
-        article_author,
-        title.upper(),
-        instance.created_at.strftime('%d-%B-%Y %H:%M'))
+    if job.kind == job.ARTICLE_UPDATED:
+        verb = verbs.ARTICLE_UPDATED
+        description = "{} updated the article '{}' on {}".format(
+            article_author,
+            instance.title.upper(),
+            instance.updated_at.strftime('%d-%B-%Y %H:%M'))
+    else:
+        verb = instance.slug
+        description = "{} posted an article '{}' on {}".format(
+            article_author,
+            instance.title.upper(),
+            instance.created_at.strftime('%d-%B-%Y %H:%M'))
     url = f"/post/{instance.slug}"
     url = f"{settings.DOMAIN}{url}"
-    if not followers:
-        return
-    for user in followers:
-        if user.user.notification_preferences.in_app_notifications:
-            notify.send(
-                article_author,
-                recipient=user.user,
-                description=description,
-                verb=instance.slug,
-                action_object=instance,
-                resource_url=url
-            )
-        if user.user.notification_preferences.email_notifications:
-            email_notification_handler(user, description, url)
+
+    followers = Profile.following.through.objects.filter(
+        to_profile_id=article_author.pk).order_by('from_profile_id')
+    if job.total is None:
+        job.total = followers.count()
+        job.save(update_fields=['total', 'updated_at'])
+    actor_type = ContentType.objects.get_for_model(Profile)
+    article_type = ContentType.objects.get_for_model(Article)
+
+    while True:
+        chunk = list(followers.filter(
+            from_profile_id__gt=job.cursor
+        ).values_list(
+            'from_profile_id',
+            'from_profile__user_id',
+            'from_profile__user__username',
+            'from_profile__user__email',
+            'from_profile__user__notification_preferences'
+            '__in_app_notifications',
+            'from_profile__user__notification_preferences'
+            '__email_notifications',
+            'from_profile__user__notification_preferences__email_digest',
+        )[:settings.NOTIFICATION_JOB_CHUNK_SIZE])
+        if not chunk:
+            return
+        with transaction.atomic():
+            deliver(
+                chunk, description, url,
+                actor_content_type=actor_type,
+                actor_object_id=article_author.pk,
+                verb=verb,
+                action_object_content_type=article_type,
+                action_object_object_id=instance.pk)
+            job.record_progress(chunk[-1][0], len(chunk))
 
 
 def comment_handler(sender, instance, created, **kwargs):
     """
-    notification handler for comments
-    """
-    recipients = []
-    comment_author = instance.author
-    article = instance.article
-    favourited = Favorite.objects.filter(article=article)
-    description = "{} posted a comment to {} on {}".format(
-        comment_author.username,
-        article.title,
-        instance.created_at.strftime('%d-%B-%Y %H:%M'))
-    url = reverse(
-        "articles:articles", args=[article.slug])
-    resource_url = f"{settings.DOMAIN}{url}"
-    for user in favourited:
-        email = user.user
-        recipients.append(email)
-
-        if email.notification_preferences.in_app_notifications:
-            notify.send(comment_author,
-                        recipient=recipients,
-                        description=description,
-                        target=article or instance,
-                        verb=verbs.COMMENT_CREATED,
-                        action_object=instance,
-                        resource_url=resource_url
-                        )
-        if email.notification_preferences.email_notifications:
-            email_notification_handler(user, description, resource_url)
-
-
-def email_notification_handler(user, description, resource_url):
-    token, created = Token.objects.get_or_create(user=user.user)
+    notification handler for comments, queues the notification of the
+    users who favorited the article for run_notification_jobs.
+
+    Comments posted on an article before its job runs, which is at
+    least COMMENT_NOTIFICATION_WINDOW seconds after the first of them,
+    are coalesced into the same job.
+    """
+    from authors.apps.appnotifications.models import NotificationJob
+
     if not created:
-        token.created = timezone.now()
-        token.save()
-    url = reverse(
-        "notifications:opt_out_link", args=[token])
-    opt_out_link = f'{settings.DOMAIN}{url}'
-
-    html_content = render_to_string(
-        'notification_template.html', context={
-            "opt_out_link": opt_out_link,
-            "username": user.user.username,
-            "description": description,
-            "resource_url": resource_url
-        })
-    send_mail(
-        "User Notification",
-        '',
-        settings.DEFAULT_EMAIL,
-        [user.user.email],
-        html_message=html_content)
+        return
+    waiting = NotificationJob.objects.filter(
+        kind=NotificationJob.COMMENT_CREATED, article_id=instance.article_id,
+        status=NotificationJob.PENDING, attempts=0)
+    while not waiting.update(
+            comments_to=Greatest('comments_to', instance.pk)):
+        try:
+            with transaction.atomic():
+                NotificationJob.objects.create(
+                    kind=NotificationJob.COMMENT_CREATED,
+                    article_id=instance.article_id,
+                    comments_from=instance.pk, comments_to=instance.pk,
+                    run_after=timezone.now() + timezone.timedelta(
+                        seconds=settings.COMMENT_NOTIFICATION_WINDOW))
+            return
+        except IntegrityError:
+            # another comment queued the job first; join it
+            continue
+
+
+def comment_fan_out(job):
+    """
+    Notifies the users who favorited an article of the burst of
+    comments posted on it, once each whatever the number of comments,
+    in chunks of NOTIFICATION_JOB_CHUNK_SIZE resuming after the job's
+    cursor. Users are not notified of bursts made of their own
+    comments only. Users notified of comments on the article in the
+    last NOTIFICATION_GROUP_WINDOW seconds have that notification
+    updated instead ("jim and 2 others commented on ...").
+    """
+    article = Article.objects.get(pk=job.article_id)
+    comments = list(Comment.objects.filter(
+        article_id=job.article_id,
+        pk__range=(job.comments_from, job.comments_to)
+    ).select_related('author').order_by('pk'))
+    if not comments:
+        return
+    last = comments[-1]
+    if len(comments) == 1:
+        description = "{} posted a comment to {} on {}".format(
+            last.author.username,
+            article.title,
+            last.created_at.strftime('%d-%B-%Y %H:%M'))
+    else:
+        description = "{} new comments on {}".format(
+            len(comments), article.title)
+    url = reverse("articles:articles", args=[article.slug])
+    resource_url = f"{settings.DOMAIN}{url}"
+    authors = {comment.author_id for comment in comments}
+    actors = []
+    for comment in reversed(comments):
+        if (comment.author_id, comment.author.username) not in actors:
+            actors.append((comment.author_id, comment.author.username))
+
+    favorited = Favorite.objects.filter(
+        article_id=job.article_id).order_by('user_id')
+    if len(authors) == 1:
+        favorited = favorited.exclude(user_id__in=authors)
+    if job.total is None:
+        job.total = favorited.count()
+        job.save(update_fields=['total', 'updated_at'])
+    user_type = ContentType.objects.get_for_model(User)
+    article_type = ContentType.objects.get_for_model(Article)
+    comment_type = ContentType.objects.get_for_model(Comment)
+
+    while True:
+        chunk = list(favorited.filter(
+            user_id__gt=job.cursor
+        ).values_list(
+            'user_id',
+            'user_id',
+            'user__username',
+            'user__email',
+            'user__notification_preferences__in_app_notifications',
+            'user__notification_preferences__email_notifications',
+            'user__notification_preferences__email_digest',
+        )[:settings.NOTIFICATION_JOB_CHUNK_SIZE])
+        if not chunk:
+            return
+        with transaction.atomic():
+            deliver(
+                chunk, description, resource_url,
+                group={
+                    'action': "commented on {}".format(article.title),
+                    'actors': actors,
+                },
+                actor_content_type=user_type,
+                actor_object_id=last.author_id,
+                verb=verbs.COMMENT_CREATED,
+                target_content_type=article_type,
+                target_object_id=article.pk,
+                action_object_content_type=comment_type,
+                action_object_object_id=last.pk)
+            job.record_progress(chunk[-1][0], len(chunk))
 
 
 post_save.connect(create_article_handler, sender=Article)